@@ -1,36 +1,34 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog
-import serial
-import threading
-import csv
 from datetime import datetime
 import os
 
-def parse_serial_line(line: str):
-    """Parses serial line into (sensor, stress, time)"""
-    try:
-        fields = dict(part.split('=') for part in line.split(';') if '=' in part)
-        sensor = fields.get("SENSOR", "N/A")
-        stress = fields.get("STRESS", "N/A")
-        timestamp = fields.get("TIME", "N/A")
-        return sensor, stress, timestamp
-    except Exception:
-        return "N/A", "N/A", "N/A"
+from forward_buffer import POLICIES, format_snapshot
+from forward_filters import format_snapshot as format_filters
+from forward_filters import parse_pipeline
+from latency import format_summary
+from log_sink import LogSink, SAMPLE_CHOICES
+from port_supervisor import format_snapshot as format_link
+from profiling import SamplingProfiler
+from profiling import format_snapshot as format_counters
+from profiling import snapshot as counter_snapshot
+from proxy_engine import LATENCY_STAGES, ProxyEngine
+from segment_log import COMPRESSIONS, RotationPolicy, parse_interval, parse_size
+from seq_tracker import format_snapshot as format_seq
+from sensor_stats import SensorStats
+from stats_view import StatsWindow
 
 class SerialProxyGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Serial Proxy Receiver + Forwarder")
-        self.root.geometry("900x600")
+        self.root.geometry("900x760")
 
-        self.input_ser = None
-        self.output_ser = None
-        self.running = False
-
-        self.input_csv_file = None
-        self.forwarded_csv_file = None
-        self.input_csv_writer = None
-        self.forwarded_csv_writer = None
+        self.engine = ProxyEngine(on_input=self.show_input, on_forward=self.show_output, on_error=self.log_input)
+        self.engine.stats = SensorStats()
+        self.stats_window = None
+        self.profiler = SamplingProfiler()
+        self._after_id = None
 
         layout_frame = ttk.Frame(root)
         layout_frame.pack(pady=10, fill='x')  # Add fill for better stretching
@@ -61,7 +59,7 @@ class SerialProxyGUI:
         output_frame = ttk.LabelFrame(layout_frame, text="Forwarding Configuration")
         output_frame.grid(row=0, column=1, padx=(255, 40), sticky="n")  # Increased left and right padding
 
-        ttk.Label(output_frame, text="Output COM Port: (e.g., COM9)").grid(row=0, column=0, sticky="w")
+        ttk.Label(output_frame, text="Output Port: (e.g., COM9, tcp-server://:5000)").grid(row=0, column=0, sticky="w")
         self.output_port_entry = ttk.Entry(output_frame)
         self.output_port_entry.grid(row=1, column=0, pady=2)
 
@@ -93,6 +91,9 @@ class SerialProxyGUI:
         self.output_log = scrolledtext.ScrolledText(output_log_frame, width=50, height=15, state="disabled")
         self.output_log.pack()
 
+        self.input_sink = LogSink(self.input_log)
+        self.output_sink = LogSink(self.output_log)
+
         # === Controls ===
         control_frame = ttk.Frame(root)
         control_frame.pack(pady=5)
@@ -103,28 +104,126 @@ class SerialProxyGUI:
         self.stop_button = ttk.Button(control_frame, text="Stop Proxy", command=self.stop_proxy, state="disabled")
         self.stop_button.pack(side=tk.LEFT, padx=10)
 
+        self.transparent_var = tk.BooleanVar(value=False)
+        self.transparent_chk = ttk.Checkbutton(control_frame, text="Transparent (raw bytes)", variable=self.transparent_var)
+        self.transparent_chk.pack(side=tk.LEFT, padx=10)
+
+        self.single_csv_var = tk.BooleanVar(value=False)
+        self.single_csv_chk = ttk.Checkbutton(control_frame, text="Single CSV", variable=self.single_csv_var)
+        self.single_csv_chk.pack(side=tk.LEFT, padx=10)
+
+        self.binary_rec_var = tk.BooleanVar(value=False)
+        self.binary_rec_chk = ttk.Checkbutton(control_frame, text="Binary recording", variable=self.binary_rec_var)
+        self.binary_rec_chk.pack(side=tk.LEFT, padx=10)
+
+        ttk.Label(control_frame, text="Show 1 in:").pack(side=tk.LEFT)
+        self.sample_cb = ttk.Combobox(control_frame, values=SAMPLE_CHOICES, width=6, state="readonly")
+        self.sample_cb.pack(side=tk.LEFT, padx=(2, 10))
+        self.sample_cb.set(1)
+        self.sample_cb.bind("<<ComboboxSelected>>", self.set_sampling)
+
+        framing_frame = ttk.Frame(root)
+        framing_frame.pack()
+        self.binary_var = tk.BooleanVar(value=False)
+        self.binary_chk = ttk.Checkbutton(framing_frame, text="Binary frames (COBS+CRC)", variable=self.binary_var)
+        self.binary_chk.pack(side=tk.LEFT, padx=10)
+        self.translate_var = tk.BooleanVar(value=False)
+        self.translate_chk = ttk.Checkbutton(framing_frame, text="Translate to ASCII", variable=self.translate_var)
+        self.translate_chk.pack(side=tk.LEFT, padx=10)
+        ttk.Label(framing_frame, text="On overflow:").pack(side=tk.LEFT)
+        self.overflow_cb = ttk.Combobox(framing_frame, values=POLICIES, width=12, state="readonly")
+        self.overflow_cb.pack(side=tk.LEFT, padx=(2, 10))
+        self.overflow_cb.set(self.engine.overflow)
+        self.reconnect_var = tk.BooleanVar(value=True)
+        self.reconnect_chk = ttk.Checkbutton(framing_frame, text="Auto-reconnect", variable=self.reconnect_var)
+        self.reconnect_chk.pack(side=tk.LEFT, padx=10)
+        self.text_log_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(framing_frame, text="Text log", variable=self.text_log_var,
+                        command=self.set_text_log).pack(side=tk.LEFT, padx=10)
+        ttk.Button(framing_frame, text="Statistics", command=self.open_stats).pack(side=tk.LEFT, padx=10)
+        self.profile_button = ttk.Button(framing_frame, text="Profile", command=self.toggle_profile)
+        self.profile_button.pack(side=tk.LEFT, padx=10)
+
+        filter_frame = ttk.Frame(root)
+        filter_frame.pack(pady=2)
+        ttk.Label(filter_frame, text="Filters:").pack(side=tk.LEFT)
+        self.filter_entry = ttk.Entry(filter_frame, width=60)
+        self.filter_entry.pack(side=tk.LEFT, padx=(2, 10))
+        ttk.Label(filter_frame, text="e.g. sensors:1,2 | deadband:0.5 | decimate:4").pack(side=tk.LEFT)
+
+        roll_frame = ttk.Frame(root)
+        roll_frame.pack(pady=2)
+        ttk.Label(roll_frame, text="Roll CSV at size:").pack(side=tk.LEFT)
+        self.roll_size_entry = ttk.Entry(roll_frame, width=8)
+        self.roll_size_entry.pack(side=tk.LEFT, padx=(2, 10))
+        ttk.Label(roll_frame, text="or every:").pack(side=tk.LEFT)
+        self.roll_interval_entry = ttk.Entry(roll_frame, width=6)
+        self.roll_interval_entry.pack(side=tk.LEFT, padx=(2, 10))
+        ttk.Label(roll_frame, text="Compress:").pack(side=tk.LEFT)
+        self.compress_cb = ttk.Combobox(roll_frame, values=list(COMPRESSIONS), width=6, state="readonly")
+        self.compress_cb.pack(side=tk.LEFT, padx=(2, 10))
+        self.compress_cb.set("gzip")
+        ttk.Label(roll_frame, text="e.g. 100M, 1h (empty = one file)").pack(side=tk.LEFT)
+
+        # === Latency ===
+        self.latency_label = ttk.Label(root, text="Latency p50/p99/max (µs): -")
+        self.latency_label.pack(pady=2)
+        self.buffer_label = ttk.Label(root, text="Forward buffer: -")
+        self.buffer_label.pack(pady=2)
+        self.link_label = ttk.Label(root, text="Ports: -")
+        self.link_label.pack(pady=2)
+        self.filter_label = ttk.Label(root, text="Filters: -")
+        self.filter_label.pack(pady=2)
+        self.seq_label = ttk.Label(root, text="Sequence: -")
+        self.seq_label.pack(pady=2)
+        self.counter_label = ttk.Label(root, text="Hot path: -")
+        self.counter_label.pack(pady=2)
+
     def log_input(self, msg):
         timestamp = datetime.now().strftime("%H:%M:%S")
-        self.input_log.config(state='normal')
-        self.input_log.insert(tk.END, f"[{timestamp}] {msg}\n")
-        self.input_log.yview(tk.END)
-        self.input_log.config(state='disabled')
+        self.input_sink.write(f"[{timestamp}] {msg}", sample=False)
 
     def log_output(self, msg):
         timestamp = datetime.now().strftime("%H:%M:%S")
-        self.output_log.config(state='normal')
-        self.output_log.insert(tk.END, f"[{timestamp}] {msg}\n")
-        self.output_log.yview(tk.END)
-        self.output_log.config(state='disabled')
+        self.output_sink.write(f"[{timestamp}] {msg}", sample=False)
+
+    def show_input(self, msg):
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self.input_sink.write(f"[{timestamp}] {msg}")
+
+    def show_output(self, msg):
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self.output_sink.write(f"[{timestamp}] {msg}")
+
+    def set_sampling(self, event=None):
+        k = int(self.sample_cb.get())
+        self.input_sink.sample_every = k
+        self.output_sink.sample_every = k
+
+    def set_text_log(self):
+        """Per-line log output is the GUI's biggest cost at high rates; with it off only status lines are shown."""
+        on = self.text_log_var.get()
+        self.engine.on_input = self.show_input if on else None
+        self.engine.on_forward = self.show_output if on else None
+
+    def open_stats(self):
+        if self.stats_window:
+            self.stats_window.lift()
+            return
+        self.stats_window = StatsWindow(self.root, self.engine.stats, title="Proxy Sensor Statistics",
+                                        on_close=self.stats_closed)
+
+    def stats_closed(self):
+        self.stats_window = None
 
     def connect_input_serial(self):
-        if self.input_ser and self.input_ser.is_open:
+        if self.engine.input_connected():
             self.log_input("[WARN] Input already connected.")
             return
         try:
             port = self.input_port_entry.get().strip()
             baud = int(self.input_baud_cb.get())
-            self.input_ser = serial.Serial(port, baudrate=baud, timeout=1)
+            self.engine.connect_input(port, baud)
             self.input_status_label.config(text=f"Connected to {port}", foreground="green")
             self.connect_input_btn.config(state="disabled")
             self.disconnect_input_btn.config(state="normal")
@@ -135,8 +234,7 @@ class SerialProxyGUI:
 
     def disconnect_input_serial(self):
         try:
-            if self.input_ser and self.input_ser.is_open:
-                self.input_ser.close()
+            self.engine.disconnect_input()
             self.input_status_label.config(text="Disconnected", foreground="orange")
             self.connect_input_btn.config(state="normal")
             self.disconnect_input_btn.config(state="disabled")
@@ -145,13 +243,13 @@ class SerialProxyGUI:
             self.log_input(f"[ERROR] Input disconnect failed: {e}")
 
     def connect_output_serial(self):
-        if self.output_ser and self.output_ser.is_open:
+        if self.engine.output_connected():
             self.log_output("[WARN] Output already connected.")
             return
         try:
             port = self.output_port_entry.get().strip()
             baud = int(self.output_baud_cb.get())
-            self.output_ser = serial.Serial(port, baudrate=baud, timeout=1)
+            self.engine.connect_output(port, baud)
             self.output_status_label.config(text=f"Connected to {port}", foreground="green")
             self.connect_output_btn.config(state="disabled")
             self.disconnect_output_btn.config(state="normal")
@@ -162,8 +260,7 @@ class SerialProxyGUI:
 
     def disconnect_output_serial(self):
         try:
-            if self.output_ser and self.output_ser.is_open:
-                self.output_ser.close()
+            self.engine.disconnect_output()
             self.output_status_label.config(text="Disconnected", foreground="orange")
             self.connect_output_btn.config(state="normal")
             self.disconnect_output_btn.config(state="disabled")
@@ -172,69 +269,180 @@ class SerialProxyGUI:
             self.log_output(f"[ERROR] Output disconnect failed: {e}")
 
     def start_proxy(self):
-        if not (self.input_ser and self.input_ser.is_open):
+        if not self.engine.input_connected():
             self.log_input("[ERROR] Input not connected.")
             return
-        if not (self.output_ser and self.output_ser.is_open):
+        if not self.engine.output_connected():
             self.log_output("[ERROR] Output not connected.")
             return
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-        input_path = filedialog.asksaveasfilename(title="Save Input CSV", defaultextension=".csv", initialfile=f"input_{timestamp}.csv")
-        forwarded_path = filedialog.asksaveasfilename(title="Save Forwarded CSV", defaultextension=".csv", initialfile=f"forwarded_{timestamp}.csv")
-
-        if not input_path or not forwarded_path:
-            self.log_input("[WARN] File selection cancelled.")
+        try:
+            pipeline = parse_pipeline(self.filter_entry.get())
+        except ValueError as e:
+            self.log_output(f"[ERROR] {e}")
+            return
+        if pipeline and (self.transparent_var.get() or self.binary_var.get()) and not self.translate_var.get():
+            self.log_output("[ERROR] Filters need line mode or translated binary frames.")
             return
 
         try:
-            self.input_csv_file = open(input_path, mode='w', newline='', encoding='utf-8')
-            self.input_csv_writer = csv.writer(self.input_csv_file)
-            self.input_csv_writer.writerow(["Local Timestamp", "Sensor", "Stress", "Raw Time"])
+            rotation = RotationPolicy(parse_size(self.roll_size_entry.get()),
+                                      parse_interval(self.roll_interval_entry.get()), self.compress_cb.get())
+        except ValueError as e:
+            self.log_output(f"[ERROR] {e}")
+            return
+        if rotation and self.binary_rec_var.get():
+            self.log_output("[ERROR] Rolling logs apply to CSV recording, not binary recording.")
+            return
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Segments of a rolling log carry their own time in the name
+        stamp = "" if rotation else f"_{timestamp}"
+
+        if self.binary_rec_var.get():
+            record_path = filedialog.asksaveasfilename(title="Save Proxy Recording", defaultextension=".rspb",
+                                                       initialfile=f"proxy_{timestamp}.rspb",
+                                                       filetypes=[("Binary recording", "*.rspb")])
+            if not record_path:
+                self.log_input("[WARN] File selection cancelled.")
+                return
+            csv_paths = None
+            csv_dir = os.path.dirname(record_path)
+        elif self.single_csv_var.get():
+            combined_path = filedialog.asksaveasfilename(title="Save Proxy CSV", defaultextension=".csv", initialfile=f"proxy{stamp}.csv")
+            if not combined_path:
+                self.log_input("[WARN] File selection cancelled.")
+                return
+            csv_paths = dict(combined_path=combined_path)
+            csv_dir = os.path.dirname(combined_path)
+        else:
+            input_path = filedialog.asksaveasfilename(title="Save Input CSV", defaultextension=".csv", initialfile=f"input{stamp}.csv")
+            forwarded_path = filedialog.asksaveasfilename(title="Save Forwarded CSV", defaultextension=".csv", initialfile=f"forwarded{stamp}.csv")
+            if not input_path or not forwarded_path:
+                self.log_input("[WARN] File selection cancelled.")
+                return
+            csv_paths = dict(input_path=input_path, forwarded_path=forwarded_path)
+            csv_dir = os.path.dirname(input_path)
 
-            self.forwarded_csv_file = open(forwarded_path, mode='w', newline='', encoding='utf-8')
-            self.forwarded_csv_writer = csv.writer(self.forwarded_csv_file)
-            self.forwarded_csv_writer.writerow(["Local Timestamp", "Sensor", "Stress", "Raw Time"])
+        try:
+            if csv_paths is None:
+                self.engine.open_binary(record_path)
+            else:
+                self.engine.open_csv(**csv_paths, rotation=rotation)
         except Exception as e:
-            self.log_input(f"[ERROR] Failed to open CSV files: {e}")
+            self.engine.close_csv()
+            self.log_input(f"[ERROR] Failed to open recording files: {e}")
             return
 
-        self.running = True
-        threading.Thread(target=self.proxy_loop, daemon=True).start()
+        self.engine.transparent = self.transparent_var.get()
+        self.engine.binary = self.binary_var.get()
+        self.engine.translate = self.engine.binary and self.translate_var.get()
+        self.engine.overflow = self.overflow_cb.get()
+        self.engine.pipeline = pipeline
+        self.engine.input_link.auto = self.engine.output_link.auto = self.reconnect_var.get()
+        self.engine.input_link.reset_stats()
+        self.engine.output_link.reset_stats()
+        self.engine.latency.reset()
+        self.engine.latency.start_dump(os.path.join(csv_dir, f"latency_{timestamp}.json"))
+        self.engine.start()
+        self._after_id = self.root.after(1000, self.update_latency)
         self.start_button.config(state="disabled")
         self.stop_button.config(state="normal")
+        self.transparent_chk.config(state="disabled")
+        self.single_csv_chk.config(state="disabled")
+        self.binary_rec_chk.config(state="disabled")
+        self.binary_chk.config(state="disabled")
+        self.translate_chk.config(state="disabled")
+        self.overflow_cb.config(state="disabled")
+        self.filter_entry.config(state="disabled")
+        self.roll_size_entry.config(state="disabled")
+        self.roll_interval_entry.config(state="disabled")
+        self.compress_cb.config(state="disabled")
+        self.reconnect_chk.config(state="disabled")
 
     def stop_proxy(self):
-        self.running = False
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self.engine.stop()
+        self.engine.latency.stop_dump()
         self.start_button.config(state="normal")
         self.stop_button.config(state="disabled")
-        if self.input_csv_file:
-            self.input_csv_file.close()
-        if self.forwarded_csv_file:
-            self.forwarded_csv_file.close()
+        self.transparent_chk.config(state="normal")
+        self.single_csv_chk.config(state="normal")
+        self.binary_rec_chk.config(state="normal")
+        self.binary_chk.config(state="normal")
+        self.translate_chk.config(state="normal")
+        self.overflow_cb.config(state="readonly")
+        self.filter_entry.config(state="normal")
+        self.roll_size_entry.config(state="normal")
+        self.roll_interval_entry.config(state="normal")
+        self.compress_cb.config(state="readonly")
+        self.reconnect_chk.config(state="normal")
         self.log_input("[INFO] Proxy stopped.")
         self.log_output("[INFO] Proxy stopped.")
 
-    def proxy_loop(self):
-        while self.running:
-            try:
-                if self.input_ser.in_waiting:
-                    raw_line = self.input_ser.readline().decode(errors='ignore').strip()
-                    sensor, stress, time_raw = parse_serial_line(raw_line)
-                    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-                    self.log_input(f"Received: {raw_line}")
-                    if self.input_csv_writer:
-                        self.input_csv_writer.writerow([now, sensor, stress, time_raw])
-
-                    if self.output_ser and self.output_ser.is_open:
-                        self.output_ser.write((raw_line + "\n").encode())
-                        self.log_output(f"Forwarded: {raw_line}")
-                        if self.forwarded_csv_writer:
-                            self.forwarded_csv_writer.writerow([now, sensor, stress, time_raw])
-            except Exception as e:
-                self.log_input(f"[ERROR] Proxy error: {e}")
+    def toggle_profile(self):
+        if not self.profiler.running:
+            self.profiler.reset()
+            self.profiler.start()
+            self.profile_button.config(text="Stop Profiling")
+            self.log_input("[INFO] Profiler started.")
+            return
+        self.profiler.stop()
+        self.profile_button.config(text="Profile")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = filedialog.asksaveasfilename(title="Save Profile (collapsed stacks)", defaultextension=".folded",
+                                            initialfile=f"proxy_profile_{timestamp}.folded",
+                                            filetypes=[("Collapsed stacks", "*.folded")])
+        if not path:
+            self.log_input("[WARN] Profile discarded.")
+            return
+        try:
+            self.profiler.write(path)
+        except OSError as e:
+            self.log_input(f"[ERROR] Could not write profile: {e}")
+            return
+        self.log_input(f"[INFO] Profile ({self.profiler.status()}) written to {path}")
+
+    def show_link_status(self, link, label, connect_btn, disconnect_btn):
+        if link.down:
+            label.config(text=f"Reconnecting to {link.spec}...", foreground="orange")
+        elif link.wanted:
+            label.config(text=f"Connected to {link.device}", foreground="green")
+        else:
+            # Closed by the user, or by the engine after losing it without reconnect
+            label.config(text="Disconnected", foreground="orange")
+            connect_btn.config(state="normal")
+            disconnect_btn.config(state="disabled")
+
+    def update_latency(self):
+        snapshot = self.engine.latency.snapshot()
+        parts = [f"{stage}: {format_summary(snapshot[stage])}" for stage in LATENCY_STAGES]
+        self.latency_label.config(text="Latency p50/p99/max (µs)  " + "  |  ".join(parts))
+        self.buffer_label.config(text=f"Forward buffer: {format_snapshot(self.engine.forward_buffer.snapshot())}")
+        input_link, output_link = self.engine.input_link, self.engine.output_link
+        text = (f"Input: {format_link(input_link.snapshot())}  |  "
+                f"Output: {format_link(output_link.snapshot())}, {self.engine.held_lines} held")
+        status = getattr(self.engine.output_ser, "status", None)
+        if status:
+            text += f"  |  {status()}"
+        self.link_label.config(text=text)
+        if self.engine.pipeline:
+            self.filter_label.config(text=f"Filters: {format_filters(self.engine.pipeline.snapshot())}")
+        self.seq_label.config(text=f"Sequence: {format_seq(self.engine.sequence.snapshot())}")
+        text = f"Hot path: {format_counters(counter_snapshot())}"
+        if self.profiler.running:
+            text += f"  |  Profiler {self.profiler.status()}"
+        self.counter_label.config(text=text)
+        self.show_link_status(input_link, self.input_status_label, self.connect_input_btn, self.disconnect_input_btn)
+        self.show_link_status(output_link, self.output_status_label, self.connect_output_btn, self.disconnect_output_btn)
+        if self.engine.running:
+            self._after_id = self.root.after(1000, self.update_latency)
+        else:
+            # The engine stopped by itself (input lost without reconnect)
+            self._after_id = None
+            self.stop_proxy()
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -1,19 +1,34 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog
-import serial
-import threading
 from datetime import datetime
-import csv
-import re
+import threading
 import time
 
+from frame_codec import batch_lines
+from line_parser import parse_chunk
+from log_sink import LogSink, SAMPLE_CHOICES
+from port_supervisor import format_snapshot as format_link
+from profiling import SamplingProfiler
+from profiling import format_snapshot as format_counters
+from profiling import snapshot as counter_snapshot
+from receive_engine import ReceiveEngine
+from sample_store import SampleStore
+from sensor_stats import SensorStats
+from seq_tracker import SeqTracker
+from seq_tracker import format_snapshot as format_seq
+from stats_view import StatsWindow
+
 class ReceiverGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Serial Receiver Only")
 
-        self.input_ser = None
-        self.running = False
+        self.engine = ReceiveEngine(on_lines=self.show_lines, on_error=self.update_log, on_batch=self.show_batch)
+        self.store = SampleStore()
+        self.stats = SensorStats()
+        self.sequence = SeqTracker()
+        self.profiler = SamplingProfiler()
+        self.stats_window = None
 
         # --- Input Port Config ---
         ttk.Label(root, text="Input COM Port (e.g., COM10):").pack()
@@ -25,6 +40,11 @@ class ReceiverGUI:
         self.baudrate_cb.pack()
         self.baudrate_cb.set(9600)
 
+        self.binary_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(root, text="Binary frames (COBS+CRC)", variable=self.binary_var).pack()
+        self.reconnect_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(root, text="Auto-reconnect", variable=self.reconnect_var).pack()
+
         # --- Input Buttons ---
         button_frame = ttk.Frame(root)
         button_frame.pack(pady=5)
@@ -36,87 +56,165 @@ class ReceiverGUI:
         # --- Status
         self.status_label = ttk.Label(root, text="Status: Not Connected", foreground="red")
         self.status_label.pack()
+        self.rate_label = ttk.Label(root, text="Rate: -")
+        self.rate_label.pack()
+        self.seq_label = ttk.Label(root, text="Sequence: -")
+        self.seq_label.pack()
+        self.counter_label = ttk.Label(root, text="Hot path: -")
+        self.counter_label.pack()
 
         # --- Log Display
         ttk.Label(root, text="📥 Received Data").pack()
         self.recv_log = scrolledtext.ScrolledText(root, width=80, height=15, state='disabled')
         self.recv_log.pack(pady=5)
+        self.log_sink = LogSink(self.recv_log)
 
         # --- Log Controls
         control_frame = ttk.Frame(root)
         control_frame.pack(pady=5)
         ttk.Button(control_frame, text="Clear Log", command=self.clear_log).pack(side=tk.LEFT, padx=5)
+        ttk.Button(control_frame, text="Clear Data", command=self.clear_data).pack(side=tk.LEFT, padx=5)
         ttk.Button(control_frame, text="Export Log to CSV", command=self.export_recv_csv).pack(side=tk.LEFT, padx=5)
+        ttk.Label(control_frame, text="Show 1 in:").pack(side=tk.LEFT)
+        self.sample_cb = ttk.Combobox(control_frame, values=SAMPLE_CHOICES, width=6, state="readonly")
+        self.sample_cb.pack(side=tk.LEFT, padx=(2, 5))
+        self.sample_cb.set(1)
+        self.sample_cb.bind("<<ComboboxSelected>>", self.set_sampling)
+        # Read by the engine thread, so kept in a plain attribute rather than the Tk variable
+        self.text_log = True
+        self.text_log_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(control_frame, text="Text log", variable=self.text_log_var,
+                        command=self.set_text_log).pack(side=tk.LEFT, padx=5)
+        ttk.Button(control_frame, text="Statistics", command=self.open_stats).pack(side=tk.LEFT, padx=5)
+        self.profile_button = ttk.Button(control_frame, text="Profile", command=self.toggle_profile)
+        self.profile_button.pack(side=tk.LEFT, padx=5)
 
     def connect_input(self):
         try:
-            if self.input_ser and self.input_ser.is_open:
+            if self.engine.connected():
                 self.update_log("[INFO] Input already connected")
                 return
             in_port = self.port_entry.get().strip().upper()
             in_baud = int(self.baudrate_cb.get())
-            self.input_ser = serial.Serial(in_port, in_baud, timeout=1)
-            self.running = True
+            self.engine.binary = self.binary_var.get()
+            self.engine.link.auto = self.reconnect_var.get()
+            self.engine.link.reset_stats()
+            self.sequence.reset()
+            self.engine.connect(in_port, in_baud)
+            self.engine.start()
             self.status_label.config(text=f"Input Connected: {in_port}", foreground="green")
             self.disconnect_button.config(state="normal")
-            threading.Thread(target=self.read_loop, daemon=True).start()
+            self.engine.rates()
+            self.root.after(1000, self.update_rate)
         except Exception as e:
             self.status_label.config(text=f"Input Connection Failed: {e}", foreground="red")
 
     def disconnect_input(self):
         try:
-            self.running = False
-            if self.input_ser and self.input_ser.is_open:
-                self.input_ser.close()
+            self.engine.stop()
+            self.engine.disconnect()
             self.status_label.config(text="Input Disconnected", foreground="orange")
             self.disconnect_button.config(state="disabled")
         except Exception as e:
             self.status_label.config(text=f"Disconnection Error: {e}", foreground="red")
 
-    def read_loop(self):
-        while self.running:
-            try:
-                line = self.input_ser.readline().decode(errors='ignore').strip()
-                if line:
-                    timestamp = datetime.now().strftime("%H:%M:%S")
-                    msg = f"[{timestamp}] {line}"
-                    self.update_log(msg)
-            except Exception as e:
-                self.update_log(f"[ERROR] {e}")
-            time.sleep(0.1)
-
-    def update_log(self, message):
-        self.recv_log.config(state='normal')
-        self.recv_log.insert(tk.END, message + "\n")
-        self.recv_log.yview(tk.END)
-        self.recv_log.config(state='disabled')
+    def show_lines(self, lines):
+        self.store_batch(parse_chunk(b"\n".join(lines)), lines)
+
+    def show_batch(self, batch):
+        self.store_batch(batch)
+
+    def store_batch(self, batch, lines=None):
+        self.store.append_batch(int(time.time() * 1000), batch)
+        self.stats.add_batch(batch)
+        self.sequence.add_batch(batch)
+        if not self.text_log:
+            return
+        if lines is None:
+            lines = batch_lines(batch)
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        for line in lines:
+            self.update_log(f"[{timestamp}] {line.decode(errors='ignore')}", sample=True)
+
+    def set_text_log(self):
+        self.text_log = self.text_log_var.get()
+
+    def open_stats(self):
+        if self.stats_window:
+            self.stats_window.lift()
+            return
+        self.stats_window = StatsWindow(self.root, self.stats, title="Receiver Sensor Statistics",
+                                        on_close=self.stats_closed)
+
+    def stats_closed(self):
+        self.stats_window = None
+
+    def toggle_profile(self):
+        if not self.profiler.running:
+            self.profiler.reset()
+            self.profiler.start()
+            self.profile_button.config(text="Stop Profiling")
+            self.update_log("[INFO] Profiler started.")
+            return
+        self.profiler.stop()
+        self.profile_button.config(text="Profile")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = filedialog.asksaveasfilename(title="Save Profile (collapsed stacks)", defaultextension=".folded",
+                                            initialfile=f"receiver_profile_{timestamp}.folded",
+                                            filetypes=[("Collapsed stacks", "*.folded")])
+        if not path:
+            self.update_log("[WARN] Profile discarded.")
+            return
+        try:
+            self.profiler.write(path)
+        except OSError as e:
+            self.update_log(f"[ERROR] Could not write profile: {e}")
+            return
+        self.update_log(f"[INFO] Profile ({self.profiler.status()}) written to {path}")
+
+    def update_rate(self):
+        if not self.engine.running:
+            return
+        lines_per_s, bytes_per_s = self.engine.rates()
+        self.rate_label.config(text=f"Rate: {lines_per_s:,.0f} lines/s, {bytes_per_s:,.0f} B/s  |  "
+                                    f"Port: {format_link(self.engine.link.snapshot())}")
+        self.seq_label.config(text=f"Sequence: {format_seq(self.sequence.snapshot())}")
+        text = f"Hot path: {format_counters(counter_snapshot())}"
+        if self.profiler.running:
+            text += f"  |  Profiler {self.profiler.status()}"
+        self.counter_label.config(text=text)
+        if self.engine.link.down:
+            self.status_label.config(text=f"Reconnecting to {self.engine.link.spec}...", foreground="orange")
+        else:
+            self.status_label.config(text=f"Input Connected: {self.engine.link.device}", foreground="green")
+        self.root.after(1000, self.update_rate)
+
+    def update_log(self, message, sample=False):
+        self.log_sink.write(message, sample=sample)
 
     def clear_log(self):
-        self.recv_log.config(state='normal')
-        self.recv_log.delete(1.0, tk.END)
-        self.recv_log.config(state='disabled')
+        self.log_sink.clear()
+
+    def set_sampling(self, event=None):
+        self.log_sink.sample_every = int(self.sample_cb.get())
+
+    def clear_data(self):
+        self.store.clear()
+        self.update_log("[INFO] Stored samples cleared.")
 
     def export_recv_csv(self):
-        lines = self.recv_log.get(1.0, tk.END).strip().splitlines()
-        if not lines:
+        if not len(self.store):
+            self.update_log("[WARN] No samples to export.")
             return
         path = filedialog.asksaveasfilename(defaultextension=".csv", title="Save Log", filetypes=[("CSV Files", "*.csv")])
         if not path:
             return
+        threading.Thread(target=self.export_worker, args=(path,), daemon=True).start()
+
+    def export_worker(self, path):
         try:
-            with open(path, mode='w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(["Time", "Sensor", "Stress", "ESP32_Timestamp"])
-                for line in lines:
-                    try:
-                        time_label = re.search(r"\[(.*?)\]", line).group(1)
-                        sensor = re.search(r"SENSOR=([^;]+)", line).group(1)
-                        stress = re.search(r"STRESS=([^;\n]+)", line).group(1)
-                        esp_time = re.search(r"TIME=([^;]+)", line).group(1)
-                        writer.writerow([time_label, sensor, stress, esp_time])
-                    except:
-                        continue
-            self.update_log(f"[INFO] Exported to {path}")
+            rows = self.store.export_csv(path)
+            self.update_log(f"[INFO] Exported {rows} samples to {path}")
         except Exception as e:
             self.update_log(f"[ERROR] Export failed: {e}")
 
@@ -1,23 +1,40 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog
-import serial
-import threading
-import random
-import time
-import csv
 from datetime import datetime
-import os
+import serial
+
+from csv_recorder import CsvRecorder
+from latency import format_summary
+from log_sink import LogSink, SAMPLE_CHOICES
+from profiling import SamplingProfiler
+from profiling import format_snapshot as format_counters
+from profiling import snapshot as counter_snapshot
+from sample_sources import PROFILES, SOURCES, BlockSource, CsvReplaySource, RandomSource
+from segment_log import COMPRESSIONS, RotationPolicy, parse_interval, parse_size
+from sender_engine import SenderEngine, SensorConfig
+
+CSV_HEADER = ["Timestamp(ms)", "Human Time", "Sensor", "Stress"]
 
 class SenderGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Raw Serial Sender GUI")
         self.ser = None
-        self.running = False
         self.log_filename = ""
+        self.log_started = False
+        self.recorder = None
+        self.replay_filename = ""
+        self.profiler = SamplingProfiler()
+
+        self.engine = SenderEngine(on_sent=self.log_sent, on_error=self.update_log, on_done=self.update_log)
 
         self.sensor_limits = [(tk.StringVar(value="0"), tk.StringVar(value="100")) for _ in range(4)]
         self.sensor_enabled = [tk.BooleanVar(value=True) for _ in range(4)]
+        self.sensor_rates = [tk.StringVar(value="1") for _ in range(4)]
+        self.sensor_profiles = [tk.StringVar(value=PROFILES[0]) for _ in range(4)]
+        for i in range(4):
+            for var in (self.sensor_enabled[i], self.sensor_rates[i], self.sensor_profiles[i], *self.sensor_limits[i]):
+                var.trace_add("write", self.on_settings_changed)
 
         # Serial Configuration Frame with 3 items per row
         serial_frame = ttk.Frame(root)
@@ -50,7 +67,7 @@ class SenderGUI:
         self.stopbits_cb.set(1)
 
         # Sensor Range Configuration
-        ttk.Label(root, text="Sensor Ranges (Min-Max) & Enable:").pack(pady=5)
+        ttk.Label(root, text="Sensor Ranges (Min-Max), Rate & Enable:").pack(pady=5)
         for i in range(4):
             frame = ttk.Frame(root)
             frame.pack()
@@ -59,10 +76,42 @@ class SenderGUI:
             ttk.Entry(frame, textvariable=self.sensor_limits[i][0], width=5).pack(side=tk.LEFT)
             ttk.Label(frame, text="-").pack(side=tk.LEFT)
             ttk.Entry(frame, textvariable=self.sensor_limits[i][1], width=5).pack(side=tk.LEFT)
+            ttk.Label(frame, text="  Rate (Hz):").pack(side=tk.LEFT)
+            ttk.Entry(frame, textvariable=self.sensor_rates[i], width=7).pack(side=tk.LEFT)
+            ttk.Label(frame, text="  Profile:").pack(side=tk.LEFT)
+            ttk.Combobox(frame, textvariable=self.sensor_profiles[i], values=PROFILES, width=9, state="readonly").pack(side=tk.LEFT)
+
+        # Data Source
+        source_frame = ttk.Frame(root)
+        source_frame.pack(pady=5)
+        ttk.Label(source_frame, text="Data Source:").pack(side=tk.LEFT)
+        self.source_cb = ttk.Combobox(source_frame, values=SOURCES, width=14, state="readonly")
+        self.source_cb.pack(side=tk.LEFT, padx=5)
+        self.source_cb.set(SOURCES[0])
+        ttk.Button(source_frame, text="Replay File", command=self.choose_replay_file).pack(side=tk.LEFT, padx=5)
+        ttk.Label(source_frame, text="Speed (x or max):").pack(side=tk.LEFT)
+        self.speed_entry = ttk.Entry(source_frame, width=6)
+        self.speed_entry.pack(side=tk.LEFT)
+        self.speed_entry.insert(0, "1")
+        self.binary_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(source_frame, text="Binary frames", variable=self.binary_var).pack(side=tk.LEFT, padx=5)
+        self.seq_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(source_frame, text="SEQ field", variable=self.seq_var).pack(side=tk.LEFT, padx=5)
 
         # File Selection
         self.file_btn = ttk.Button(root, text="Choose CSV Save Location", command=self.choose_csv_file)
         self.file_btn.pack(pady=5)
+        roll_frame = ttk.Frame(root)
+        roll_frame.pack()
+        ttk.Label(roll_frame, text="Roll at size:").pack(side=tk.LEFT)
+        self.roll_size_entry = ttk.Entry(roll_frame, width=8)
+        self.roll_size_entry.pack(side=tk.LEFT, padx=(2, 5))
+        ttk.Label(roll_frame, text="or every:").pack(side=tk.LEFT)
+        self.roll_interval_entry = ttk.Entry(roll_frame, width=6)
+        self.roll_interval_entry.pack(side=tk.LEFT, padx=(2, 5))
+        self.compress_cb = ttk.Combobox(roll_frame, values=list(COMPRESSIONS), width=6, state="readonly")
+        self.compress_cb.pack(side=tk.LEFT, padx=5)
+        self.compress_cb.set("gzip")
 
         # Connect / Disconnect Buttons
         button_frame = ttk.Frame(root)
@@ -81,9 +130,15 @@ class SenderGUI:
         self.protocol_label = ttk.Label(root, text="Protocol: Raw Serial", foreground="blue")
         self.protocol_label.pack()
 
+        self.rate_label = ttk.Label(root, text="Achieved: -")
+        self.rate_label.pack()
+        self.counter_label = ttk.Label(root, text="Hot path: -")
+        self.counter_label.pack()
+
         # Log Output
         self.log = scrolledtext.ScrolledText(root, width=60, height=15, state='disabled')
         self.log.pack(pady=5)
+        self.log_sink = LogSink(self.log)
 
         # Control Buttons in a single horizontal row
         control_frame = ttk.Frame(root)
@@ -98,17 +153,31 @@ class SenderGUI:
         self.stop_button = ttk.Button(control_frame, text="Stop", command=self.stop_sending, state="disabled")
         self.stop_button.pack(side=tk.LEFT, padx=5)
 
+        ttk.Label(control_frame, text="Show 1 in:").pack(side=tk.LEFT)
+        self.sample_cb = ttk.Combobox(control_frame, values=SAMPLE_CHOICES, width=6, state="readonly")
+        self.sample_cb.pack(side=tk.LEFT, padx=(2, 5))
+        self.sample_cb.set(1)
+        self.sample_cb.bind("<<ComboboxSelected>>", self.set_sampling)
+
+        self.profile_button = ttk.Button(control_frame, text="Profile", command=self.toggle_profile)
+        self.profile_button.pack(side=tk.LEFT, padx=5)
+
     def choose_csv_file(self):
         file_path = filedialog.asksaveasfilename(defaultextension=".csv",
                                                  filetypes=[("CSV files", "*.csv")],
                                                  title="Select CSV file to save")
         if file_path:
             self.log_filename = file_path
-            with open(self.log_filename, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(["Timestamp(ms)", "Human Time", "Sensor", "Stress"])
+            self.log_started = False
             self.update_log(f"[INFO] CSV Log File Set: {self.log_filename}")
 
+    def choose_replay_file(self):
+        file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")],
+                                               title="Select recording to replay")
+        if file_path:
+            self.replay_filename = file_path
+            self.update_log(f"[INFO] Replay File Set: {self.replay_filename}")
+
     def connect_serial(self):
         port_input = self.port_entry.get().strip().upper()
         port = f"COM{port_input}" if port_input.isdigit() else port_input
@@ -158,63 +227,162 @@ class SenderGUI:
         except Exception as e:
             self.status_label.config(text=f"Error disconnecting: {e}", foreground="red")
 
+    def snapshot_sensors(self, strict=False):
+        """Reads the sensor settings from the Tk variables (GUI thread only).
+
+        Invalid fields fall back to 0, or with strict=True make it return None.
+        """
+        sensors = []
+        for i in range(4):
+            try:
+                min_val = int(self.sensor_limits[i][0].get())
+                max_val = int(self.sensor_limits[i][1].get())
+            except ValueError:
+                if strict:
+                    return None
+                min_val = max_val = 0  # fallback
+            if min_val > max_val:
+                if strict:
+                    return None
+                min_val = max_val = 0
+            try:
+                rate = float(self.sensor_rates[i].get())
+            except ValueError:
+                if strict:
+                    return None
+                rate = 0.0
+            sensors.append(SensorConfig(i + 1, self.sensor_enabled[i].get(), min_val, max_val, rate))
+        return sensors
+
+    def build_source(self):
+        """Creates the data source selected in the GUI; raises ValueError/RuntimeError with a readable message."""
+        choice = self.source_cb.get()
+        if choice == "Block (NumPy)":
+            return BlockSource(self.sensor_profile_map())
+        if choice == "Replay CSV":
+            if not self.replay_filename:
+                raise ValueError("Please select a replay file first.")
+            speed_text = self.speed_entry.get().strip().lower()
+            speed = None if speed_text == "max" else float(speed_text.rstrip("x"))
+            if speed is not None and speed <= 0:
+                raise ValueError("Replay speed must be positive or 'max'.")
+            return CsvReplaySource(self.replay_filename, speed=speed)
+        return RandomSource()
+
+    def sensor_profile_map(self):
+        return {i + 1: self.sensor_profiles[i].get() for i in range(4)}
+
+    def on_settings_changed(self, *args):
+        if self.engine.running:
+            if isinstance(self.engine.source, BlockSource):
+                self.engine.source.profiles = self.sensor_profile_map()
+            # Called on every keystroke: a half-typed value keeps the running settings
+            sensors = self.snapshot_sensors(strict=True)
+            if sensors is not None:
+                self.engine.configure(sensors)
+
     def start_sending(self):
         if not self.log_filename:
             self.update_log("[ERROR] Please select a CSV file before starting.")
             return
 
-        self.running = True
-        self.thread = threading.Thread(target=self.send_loop, daemon=True)
-        self.thread.start()
+        try:
+            source = self.build_source()
+        except (ValueError, RuntimeError) as e:
+            self.update_log(f"[ERROR] {e}")
+            return
+
+        try:
+            rotation = RotationPolicy(parse_size(self.roll_size_entry.get()),
+                                      parse_interval(self.roll_interval_entry.get()), self.compress_cb.get())
+        except ValueError as e:
+            self.update_log(f"[ERROR] {e}")
+            return
+
+        # The first run overwrites the chosen file and later runs append; every rolled segment gets the header
+        header = CSV_HEADER if rotation or not self.log_started else None
+        try:
+            self.recorder = CsvRecorder(self.log_filename, header, mode='a' if self.log_started else 'w',
+                                        rotation=rotation)
+        except Exception as e:
+            self.update_log(f"[ERROR] Could not open CSV file: {e}")
+            return
+        self.log_started = True
+
+        self.engine.ser = self.ser
+        self.engine.recorder = self.recorder
+        self.engine.source = source
+        self.engine.binary = self.binary_var.get()
+        self.engine.seq = self.seq_var.get()
+        self.protocol_label.config(text="Protocol: Binary frames (COBS+CRC)" if self.engine.binary else "Protocol: Raw Serial")
+        self.engine.configure(self.snapshot_sensors())
+        self.engine.start()
+        self.engine.rates()
+        self.root.after(1000, self.update_rate)
         self.start_button.config(state="disabled")
         self.stop_button.config(state="normal")
 
     def stop_sending(self):
-        self.running = False
+        self.engine.stop()
+        self.engine.recorder = None
         self.start_button.config(state="normal")
         self.stop_button.config(state="disabled")
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+
+    def toggle_profile(self):
+        if not self.profiler.running:
+            self.profiler.reset()
+            self.profiler.start()
+            self.profile_button.config(text="Stop Profiling")
+            self.update_log("[INFO] Profiler started.")
+            return
+        self.profiler.stop()
+        self.profile_button.config(text="Profile")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = filedialog.asksaveasfilename(title="Save Profile (collapsed stacks)", defaultextension=".folded",
+                                            initialfile=f"sender_profile_{timestamp}.folded",
+                                            filetypes=[("Collapsed stacks", "*.folded")])
+        if not path:
+            self.update_log("[WARN] Profile discarded.")
+            return
+        try:
+            self.profiler.write(path)
+        except OSError as e:
+            self.update_log(f"[ERROR] Could not write profile: {e}")
+            return
+        self.update_log(f"[INFO] Profile ({self.profiler.status()}) written to {path}")
 
-    def send_loop(self):
-        while self.running:
-            timestamp = int(time.time() * 1000)
-            human_time = datetime.now().strftime("%A, %B %d, %Y %H:%M:%S.%f")[:-3]
-            for i in range(4):
-                if not self.sensor_enabled[i].get():
-                    continue
-                try:
-                    min_val = int(self.sensor_limits[i][0].get())
-                    max_val = int(self.sensor_limits[i][1].get())
-                    stress = random.randint(min_val, max_val)
-                except ValueError:
-                    stress = 0  # fallback
-
-                packet = f"TIME={timestamp};SENSOR={i+1};STRESS={stress}"
-                try:
-                    if self.ser and self.ser.is_open:
-                        self.ser.write((packet + "\n").encode())
-                    self.update_log(f"Sent: {packet}")
-
-                    # Write to CSV
-                    with open(self.log_filename, 'a', newline='') as csvfile:
-                        writer = csv.writer(csvfile)
-                        writer.writerow([timestamp, human_time, i + 1, stress])
-                except Exception as e:
-                    self.update_log(f"Error sending: {e}")
-            time.sleep(1)
-
-    def update_log(self, message):
-        self.log.config(state='normal')
-        self.log.insert(tk.END, message + "\n")
-        self.log.yview(tk.END)
-        self.log.config(state='disabled')
+    def log_sent(self, packet):
+        self.update_log(f"Sent: {packet}", sample=True)
+
+    def update_rate(self):
+        if not self.engine.running:
+            if self.recorder:  # replay reached the end of the file
+                self.stop_sending()
+            return
+        rates = self.engine.rates()
+        achieved = "  ".join(f"S{sensor}: {rate:,.1f} Hz" for sensor, rate in sorted(rates.items()))
+        jitter = format_summary(self.engine.jitter.summary())
+        self.rate_label.config(text=f"Achieved: {achieved}  |  Jitter p50/p99/max (µs): {jitter}  |  Skipped: {self.engine.missed}")
+        text = f"Hot path: {format_counters(counter_snapshot())}"
+        if self.profiler.running:
+            text += f"  |  Profiler {self.profiler.status()}"
+        self.counter_label.config(text=text)
+        self.root.after(1000, self.update_rate)
+
+    def update_log(self, message, sample=False):
+        self.log_sink.write(message, sample=sample)
 
     def clear_log(self):
-        self.log.config(state='normal')
-        self.log.delete(1.0, tk.END)
-        self.log.config(state='disabled')
+        self.log_sink.clear()
+
+    def set_sampling(self, event=None):
+        self.log_sink.sample_every = int(self.sample_cb.get())
 
 if __name__ == "__main__":
     root = tk.Tk()
-    root.geometry("600x650")  # 👈 Add this line to make the window square
+    root.geometry("650x700")  # 👈 Add this line to make the window square
     app = SenderGUI(root)
     root.mainloop()
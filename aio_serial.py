@@ -0,0 +1,413 @@
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+
+try:
+    import termios
+except ImportError:  # Windows: ports have no file descriptor there, see ThreadPort
+    termios = None
+
+from frame_codec import FrameDecoder, FrameEncoder, batch_lines, to_ascii
+from line_parser import parse_chunk, split_lines
+from proxy_engine import open_serial
+from routing_proxy import PortCounters
+from sample_sources import RandomSource
+from sender_engine import Schedule, SensorConfig, encode_packets
+
+CHUNK_SIZE = 4096
+
+
+# === Ports ===
+class FdPort:
+    """Non-blocking port on a POSIX file descriptor, woken by the event loop's add_reader/add_writer.
+
+    owner is the object that owns the descriptor (a pyserial port); it is closed
+    by close(). Without an owner the descriptor itself is closed.
+    """
+
+    def __init__(self, fd, owner=None, name=None):
+        self.fd = fd
+        self.owner = owner
+        self.name = name or f"fd{fd}"
+        self.closed = False
+        os.set_blocking(fd, False)
+        if termios is not None and os.isatty(fd):
+            # pyserial sets VMIN=0, which makes an empty tty read return b"" instead of EAGAIN
+            attrs = termios.tcgetattr(fd)
+            attrs[6][termios.VMIN] = 1
+            attrs[6][termios.VTIME] = 0
+            termios.tcsetattr(fd, termios.TCSANOW, attrs)
+
+    async def _wait(self, add, remove):
+        fut = asyncio.get_running_loop().create_future()
+        add(self.fd, lambda: fut.done() or fut.set_result(None))
+        try:
+            await fut
+        finally:
+            remove(self.fd)
+
+    async def read(self, size=CHUNK_SIZE):
+        """Waits for data and returns what is available (up to size); b"" at end of stream."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                return os.read(self.fd, size)
+            except BlockingIOError:
+                await self._wait(loop.add_reader, loop.remove_reader)
+
+    async def write(self, data):
+        loop = asyncio.get_running_loop()
+        view = memoryview(data)
+        while view:
+            try:
+                view = view[os.write(self.fd, view):]
+            except BlockingIOError:
+                await self._wait(loop.add_writer, loop.remove_writer)
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.owner is not None:
+            self.owner.close()
+        else:
+            os.close(self.fd)
+
+
+class ThreadPort:
+    """Port without a file descriptor (Windows COM ports, loop://): blocking calls run in worker threads.
+
+    Reads are bounded by the port timeout, and close() cancels a pending read,
+    so a cancelled task never leaves a thread blocked for long.
+    """
+
+    def __init__(self, ser, name=None):
+        self.ser = ser
+        self.name = name or getattr(ser, "portstr", None) or "port"
+        self.closed = False
+
+    def _read(self, size):
+        waiting = self.ser.in_waiting
+        return self.ser.read(min(waiting, size) if waiting else 1)
+
+    async def read(self, size=CHUNK_SIZE):
+        while True:
+            if self.closed:
+                return b""
+            data = await asyncio.to_thread(self._read, size)
+            if data:
+                return data
+
+    async def write(self, data):
+        await asyncio.to_thread(self.ser.write, bytes(data))
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        cancel_read = getattr(self.ser, "cancel_read", None)
+        if cancel_read:
+            try:
+                cancel_read()
+            except Exception:
+                pass
+        self.ser.close()
+
+
+class StreamPort:
+    """TCP stand-in for a serial port (tcp://host:port or socket://host:port) on asyncio streams."""
+
+    def __init__(self, reader, writer, name=None):
+        self.reader = reader
+        self.writer = writer
+        self.name = name or "tcp"
+        self.closed = False
+
+    async def read(self, size=CHUNK_SIZE):
+        return await self.reader.read(size)
+
+    async def write(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+async def open_port(url, baud=9600):
+    """Opens a serial port, pty path or pyserial URL for async use; tcp:// and socket:// use asyncio streams."""
+    if url.startswith(("tcp://", "socket://")):
+        host, _, port = url.split("://", 1)[1].rpartition(":")
+        reader, writer = await asyncio.open_connection(host, int(port))
+        return StreamPort(reader, writer, name=url)
+    ser = await asyncio.to_thread(open_serial, url, baud)
+    try:
+        fd = ser.fileno()
+    except (AttributeError, NotImplementedError, OSError):
+        fd = None
+    if fd is None:
+        ser.timeout = 0.2
+        return ThreadPort(ser, name=url)
+    return FdPort(fd, owner=ser, name=url)
+
+
+# === Streams ===
+async def iter_lines(port):
+    """Yields lists of complete, stripped lines (bytes), one list per read."""
+    pending = bytearray()
+    while True:
+        data = await port.read()
+        if not data:
+            return
+        pending += data
+        end = pending.rfind(b"\n") + 1
+        if not end:
+            continue
+        lines = split_lines(bytes(pending[:end]))
+        del pending[:end]
+        if lines:
+            yield lines
+
+
+async def iter_frames(port, decoder=None):
+    """Yields a ParsedBatch per read for binary frame_codec streams."""
+    decoder = decoder or FrameDecoder()
+    while True:
+        data = await port.read()
+        if not data:
+            return
+        batch = decoder.feed(data)
+        if len(batch):
+            yield batch
+
+
+# === Sinks ===
+class PortSink:
+    """Writes rows to a port as ASCII lines, or as binary frames with binary=True."""
+
+    def __init__(self, port, binary=False):
+        self.port = port
+        self.encoder = FrameEncoder() if binary else None
+
+    async def send(self, batch, lines):
+        if self.encoder:
+            by_time = {}
+            for t, sensor, stress in zip(batch.times, batch.sensors, batch.stresses):
+                by_time.setdefault(t, []).append((sensor, int(stress)))
+            data = b"".join(self.encoder.encode(t, samples) for t, samples in by_time.items())
+        else:
+            data = b"\n".join(lines) + b"\n"
+        await self.port.write(data)
+
+
+class RecorderSink:
+    """Feeds a CsvRecorder (proxy CSV layout) or BinaryRecorder; both only queue, so send() never blocks."""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    async def send(self, batch, lines):
+        if hasattr(self.recorder, "record_batch"):
+            self.recorder.record_batch(time.time_ns() // 1_000_000, batch, True)
+            return
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for i in range(len(batch)):
+            self.recorder.record([now, *batch.csv_fields(i)])
+
+
+class CallbackSink:
+    """Calls fn(batch, lines) for every batch, e.g. to update a display."""
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    async def send(self, batch, lines):
+        self.fn(batch, lines)
+
+
+async def _deliver(sinks, batch, lines):
+    for sink in sinks:
+        await sink.send(batch, lines)
+
+
+# === Pipelines ===
+async def run_proxy(input_port, output_port, sinks=(), binary=False, translate=False, counters=None):
+    """Forwards input to output byte-for-byte (or, for binary input with translate=True, as ASCII lines).
+
+    Complete lines or frames are parsed and passed to the sinks. Returns at end
+    of input; cancel the task to stop it.
+    """
+    counters = counters or PortCounters()
+    decoder = FrameDecoder()
+    pending = bytearray()
+    while True:
+        data = await input_port.read()
+        if not data:
+            return counters
+        counters.bytes_in += len(data)
+        if binary:
+            batch = decoder.feed(data)
+            out = to_ascii(batch) if translate else data
+        else:
+            out = data
+            pending += data
+            end = pending.rfind(b"\n") + 1
+            complete = bytes(pending[:end])
+            del pending[:end]
+            batch = parse_chunk(complete)
+        if out:
+            await output_port.write(out)
+            counters.bytes_out += len(out)
+        n = len(batch)
+        counters.lines_in += n
+        counters.lines_out += n
+        counters.errors = decoder.dropped()
+        if n and sinks:
+            await _deliver(sinks, batch, batch_lines(batch) if binary else split_lines(complete))
+
+
+async def run_receiver(port, sinks=(), binary=False, counters=None):
+    """Decodes lines or frames from port and passes them to the sinks until end of input or cancellation."""
+    counters = counters or PortCounters()
+    if binary:
+        decoder = FrameDecoder()
+        async for batch in iter_frames(port, decoder):
+            counters.lines_in += len(batch)
+            counters.errors = decoder.dropped()
+            await _deliver(sinks, batch, batch_lines(batch))
+    else:
+        async for lines in iter_lines(port):
+            counters.lines_in += len(lines)
+            await _deliver(sinks, parse_chunk(b"\n".join(lines)), lines)
+    return counters
+
+
+async def run_sender(port, sensors, source=None, binary=False, counters=None):
+    """Sends packets for each SensorConfig on SenderEngine's schedule, until cancelled.
+
+    Packets due at the same wakeup go out in one write, as ASCII lines or
+    binary frames.
+    """
+    counters = counters or PortCounters()
+    source = source or RandomSource()
+    encoder = FrameEncoder() if binary else None
+    loop = asyncio.get_running_loop()
+    schedule = Schedule(sensors, loop.time())
+    while True:
+        now = loop.time()
+        due, next_wake, _ = schedule.due(now)
+        if due:
+            values = [(deadline, s.sensor, *source.take(s)) for deadline, s in due]
+            data = encode_packets(int(time.time() * 1000), values, encoder)
+            await port.write(data)
+            counters.lines_out += len(due)
+            counters.bytes_out += len(data)
+        next_wake = now + 0.5 if next_wake is None else min(next_wake, now + 0.5)
+        await asyncio.sleep(max(0.0, next_wake - loop.time()))
+
+
+class AsyncRunner:
+    """Owns ports and pipeline tasks in one event loop.
+
+    stop() cancels every task, waits for them to finish and then closes every
+    port it opened, so shutdown is deterministic. A task that fails is
+    reported through on_error.
+    """
+
+    def __init__(self, on_error=None):
+        self.on_error = on_error
+        self.ports = []
+        self.tasks = {}
+        self.counters = {}
+
+    async def open(self, url, baud=9600):
+        port = await open_port(url, baud)
+        self.ports.append(port)
+        return port
+
+    def spawn(self, name, coro_fn, *args, **kwargs):
+        """Starts coro_fn(*args, counters=..., **kwargs) as a task; its PortCounters appear in counters[name]."""
+        counters = self.counters[name] = PortCounters()
+        task = asyncio.create_task(coro_fn(*args, counters=counters, **kwargs), name=name)
+        task.add_done_callback(self._task_done)
+        self.tasks[name] = task
+        return task
+
+    def _task_done(self, task):
+        if not task.cancelled() and task.exception() and self.on_error:
+            self.on_error(f"[ERROR] {task.get_name()} failed: {task.exception()}")
+
+    async def wait(self):
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+    async def stop(self):
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        for port in self.ports:
+            await port.close()
+        self.ports = []
+
+
+def split_pair(spec):
+    """IN,OUT -> (in, out); commas are used because ports may contain ':'."""
+    src, sep, dst = spec.partition(",")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected IN,OUT, got {spec!r}")
+    return src, dst
+
+
+async def run_cli(args):
+    runner = AsyncRunner(on_error=print)
+    try:
+        for src, dst in args.proxy:
+            runner.spawn(f"proxy {src}->{dst}", run_proxy, await runner.open(src, args.baud), await runner.open(dst, args.baud),
+                         binary=args.binary, translate=args.translate)
+        for port in args.receive:
+            runner.spawn(f"receive {port}", run_receiver, await runner.open(port, args.baud), binary=args.binary)
+        for port in args.send:
+            sensors = [SensorConfig(i + 1, True, 0, 100, args.rate) for i in range(4)]
+            runner.spawn(f"send {port}", run_sender, await runner.open(port, args.baud), sensors, binary=args.binary)
+
+        print(f"[INFO] {len(runner.tasks)} pipeline(s) running in one event loop. Ctrl+C to stop.")
+        while any(not t.done() for t in runner.tasks.values()):
+            await asyncio.wait(runner.tasks.values(), timeout=args.interval)
+            for name, c in runner.counters.items():
+                print(f"[STATS] {name}: in {c.lines_in} lines/{c.bytes_in} B, out {c.lines_out} lines/{c.bytes_out} B, "
+                      f"errors {c.errors}")
+    finally:
+        await runner.stop()
+        print("[INFO] All pipelines stopped.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run proxy/receiver/sender pipelines for many ports in one asyncio event loop")
+    parser.add_argument("--proxy", action="append", default=[], type=split_pair, metavar="IN,OUT", help="Proxy pipeline (repeatable)")
+    parser.add_argument("--receive", action="append", default=[], metavar="PORT", help="Receiver pipeline (repeatable)")
+    parser.add_argument("--send", action="append", default=[], metavar="PORT", help="Sender pipeline, 4 sensors (repeatable)")
+    parser.add_argument("--baud", type=int, default=9600)
+    parser.add_argument("--rate", type=float, default=1.0, help="Sender rate per sensor (Hz)")
+    parser.add_argument("--binary", action="store_true", help="Use binary frames (COBS + CRC) instead of ASCII lines")
+    parser.add_argument("--translate", action="store_true", help="With --binary, proxies forward ASCII lines")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between counter reports")
+    args = parser.parse_args(argv)
+
+    if not (args.proxy or args.receive or args.send):
+        parser.error("at least one --proxy, --receive or --send is required")
+    try:
+        asyncio.run(run_cli(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
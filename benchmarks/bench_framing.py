@@ -0,0 +1,157 @@
+"""Samples/sec per baud rate: ASCII lines vs binary frames (frame_codec).
+
+    python benchmarks/bench_framing.py --bauds 9600,115200,921600 --sensors 1,4
+
+For each sensor count the sender's real output is generated: one timestamp
+per write with that many sensors, ASCII as TIME=..;SENSOR=..;STRESS=..\\n
+lines and binary as COBS+CRC frames. The wire carries 10 bits per byte (8N1),
+so the capacity of a baud rate is baud / 10 / bytes-per-sample.
+
+With --measure every case is also pushed through a Linux pty pair, paced at
+that wire time, into ReceiveEngine, and the decoded samples/s are reported
+next to the computed capacity. The codec section shows encode/decode CPU
+throughput and how much of a corrupted stream the decoder recovers.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_codec import FrameDecoder, FrameEncoder
+from receive_engine import ReceiveEngine
+
+
+def make_writes(count, sensors, seed=1):
+    """(timestamp, [(sensor, stress), ...]) per write, as the sender produces them."""
+    rng = random.Random(seed)
+    t = 1751923268968
+    writes = []
+    for _ in range(count):
+        t += rng.randint(1, 20)
+        writes.append((t, [(s + 1, rng.randint(0, 100)) for s in range(sensors)]))
+    return writes
+
+
+def encode_ascii(writes):
+    return [b"".join(b"TIME=%d;SENSOR=%d;STRESS=%d\n" % (t, s, v) for s, v in samples) for t, samples in writes]
+
+
+def encode_binary(writes):
+    encoder = FrameEncoder()
+    return [encoder.encode(t, samples) for t, samples in writes]
+
+
+def measure(payloads, baud, duration, binary):
+    """Streams payloads over a pty at wire speed for duration seconds; returns received samples/s."""
+    from bench_pipeline import PtyEndpoint, make_pty  # POSIX-only (fcntl/termios)
+
+    master, slave, _ = make_pty()
+    received = [0]
+
+    def count_lines(lines):
+        received[0] += len(lines)
+
+    def count_batch(batch):
+        received[0] += len(batch)
+
+    engine = ReceiveEngine(on_lines=count_lines, on_batch=count_batch, binary=binary)
+    engine.ser = PtyEndpoint(slave)
+    engine.start()
+
+    out = PtyEndpoint(master)
+    wire_s_per_byte = 10.0 / baud
+    t0 = time.monotonic()
+    wire_free = t0
+    i = 0
+    while True:
+        now = time.monotonic()
+        if now - t0 >= duration:
+            break
+        batch = []
+        while wire_free <= now:
+            data = payloads[i % len(payloads)]
+            batch.append(data)
+            wire_free += len(data) * wire_s_per_byte
+            i += 1
+        if batch:
+            out.write(b"".join(batch))
+        time.sleep(max(0.0, min(wire_free, t0 + duration) - time.monotonic()))
+    time.sleep(0.3)
+    engine.stop()
+    for fd in (master, slave):
+        os.close(fd)
+    return received[0] / duration
+
+
+def bench_codec(writes, corrupt):
+    samples = sum(len(s) for _, s in writes)
+    start = time.perf_counter()
+    frames = encode_binary(writes)
+    encode_s = time.perf_counter() - start
+    stream = b"".join(frames)
+
+    start = time.perf_counter()
+    decoder = FrameDecoder()
+    batch = decoder.feed(stream)
+    decode_s = time.perf_counter() - start
+    assert len(batch) == samples
+
+    rng = random.Random(2)
+    damaged = bytearray(stream)
+    for _ in range(corrupt):
+        damaged[rng.randrange(len(damaged))] = rng.randrange(256)
+    decoder = FrameDecoder()
+    recovered = len(decoder.feed(bytes(damaged)))
+    return samples, encode_s, decode_s, recovered, decoder
+
+
+def int_list(text):
+    return [int(x) for x in text.split(",") if x]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bauds", type=int_list, default=[9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600])
+    parser.add_argument("--sensors", type=int_list, default=[1, 4], help="Sensors per write (samples sharing a timestamp)")
+    parser.add_argument("--writes", type=int, default=50_000, help="Writes generated per case")
+    parser.add_argument("--measure", action="store_true", help="Also stream every case through a pty (Linux)")
+    parser.add_argument("--duration", type=float, default=2.0, help="Seconds per measured case")
+    parser.add_argument("--corrupt", type=int, default=200, help="Random bytes overwritten in the codec resync test")
+    args = parser.parse_args(argv)
+
+    if args.measure and not sys.platform.startswith("linux"):
+        parser.error("--measure needs Linux pty pairs")
+
+    for sensors in args.sensors:
+        writes = make_writes(args.writes, sensors)
+        samples = args.writes * sensors
+        ascii_payloads = encode_ascii(writes)
+        binary_payloads = encode_binary(writes)
+        ascii_bps = sum(map(len, ascii_payloads)) / samples
+        binary_bps = sum(map(len, binary_payloads)) / samples
+
+        print(f"\n{sensors} sensor(s) per write: ASCII {ascii_bps:.1f} B/sample, binary {binary_bps:.1f} B/sample "
+              f"({ascii_bps / binary_bps:.1f}x smaller)")
+        header = f"{'baud':>8} {'ASCII samples/s':>16} {'binary samples/s':>17}"
+        if args.measure:
+            header += f" {'measured ASCII':>15} {'measured binary':>16}"
+        print(header)
+        for baud in args.bauds:
+            line = f"{baud:>8} {baud / 10 / ascii_bps:>16,.0f} {baud / 10 / binary_bps:>17,.0f}"
+            if args.measure:
+                ascii_rate = measure(ascii_payloads, baud, args.duration, binary=False)
+                binary_rate = measure(binary_payloads, baud, args.duration, binary=True)
+                line += f" {ascii_rate:>15,.0f} {binary_rate:>16,.0f}"
+            print(line)
+
+        total, encode_s, decode_s, recovered, decoder = bench_codec(writes, args.corrupt)
+        print(f"codec: encode {total / encode_s:,.0f} samples/s, decode {total / decode_s:,.0f} samples/s; "
+              f"{args.corrupt} corrupted bytes -> {recovered:,}/{total:,} samples recovered "
+              f"(CRC {decoder.crc_errors}, bad {decoder.bad_frames}, unsynced {decoder.unsynced})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Micro-benchmark: parse_serial_line (per line, str) vs parse_chunk (per chunk, bytes).
+
+    python benchmarks/bench_parser.py --lines 2000000
+
+parse_chunk converts columns with NumPy when it is installed and falls back
+to the standard library otherwise.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from line_parser import parse_chunk
+from proxy_engine import parse_serial_line
+
+
+def make_lines(count, seed=1):
+    rng = random.Random(seed)
+    t = 1751923268968
+    lines = []
+    for i in range(count):
+        if i % 4 == 0:
+            t += rng.randint(1, 20)
+        lines.append(f"TIME={t};SENSOR={i % 4 + 1};STRESS={rng.randint(0, 100)}\n".encode())
+    return lines
+
+
+def make_chunks(lines, chunk_lines):
+    return [b"".join(lines[i:i + chunk_lines]) for i in range(0, len(lines), chunk_lines)]
+
+
+def bench_legacy(lines):
+    start = time.perf_counter()
+    for raw in lines:
+        parse_serial_line(raw.decode(errors='ignore').strip())
+    return time.perf_counter() - start
+
+
+def bench_chunked(chunks):
+    start = time.perf_counter()
+    rows = 0
+    for chunk in chunks:
+        rows += len(parse_chunk(chunk))
+    return time.perf_counter() - start, rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=2_000_000)
+    parser.add_argument("--chunk-lines", type=int, default=1000, help="Lines per chunk for parse_chunk")
+    args = parser.parse_args(argv)
+
+    lines = make_lines(args.lines)
+    chunks = make_chunks(lines, args.chunk_lines)
+
+    legacy = bench_legacy(lines)
+    chunked, rows = bench_chunked(chunks)
+    assert rows == args.lines
+
+    print(f"lines: {args.lines}, chunk: {args.chunk_lines} lines")
+    print(f"parse_serial_line: {legacy:8.3f} s  {args.lines / legacy:12,.0f} lines/s")
+    print(f"parse_chunk:       {chunked:8.3f} s  {args.lines / chunked:12,.0f} lines/s")
+    print(f"speedup:           {legacy / chunked:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
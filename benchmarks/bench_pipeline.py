@@ -0,0 +1,417 @@
+"""End-to-end throughput/latency benchmark: sender -> proxy -> receiver over Linux pty pairs.
+
+Each component runs in its own process:
+
+    sender  --pty A-->  ProxyEngine  --pty B-->  ReceiveEngine
+
+For every combination of --bauds, --rates and --payloads the sender process
+runs the sender's own SenderEngine for --duration seconds: one sensor at the
+target rate, with SEQ numbers so the harness can match every received line
+to its send time, and a ;PAD=... field to reach the payload size. ptys do not
+enforce a baud rate, so the sender's port models a UART: writes go into a
+4 KiB transmit buffer that is clocked out at 10 bits per byte, and a line's
+send time is when it entered that buffer. The proxy opens its ports at the
+same baud, but only the sender side is paced; the proxy -> receiver hop runs
+at pty speed.
+
+Reported per case: lines/s and bytes/s at the receiver, measured between the
+first and the last line it got, CPU% per process, dropped lines and
+p50/p99/max end-to-end latency. Results are written as JSON;
+--compare prints the change against an earlier results file.
+
+    python benchmarks/bench_pipeline.py --bauds 9600,115200,921600 --rates 100,1000 --out results.json
+"""
+import argparse
+import fcntl
+import json
+import multiprocessing
+import os
+import platform
+import re
+import select
+import struct
+import sys
+import termios
+import threading
+import time
+import tty
+from array import array
+from datetime import datetime
+
+import serial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from proxy_engine import ProxyEngine
+from receive_engine import ReceiveEngine
+from sample_sources import RandomSource
+from sender_engine import SensorConfig, SenderEngine
+
+_SEQ = re.compile(rb";SEQ=(\d+)")
+
+
+class PtyEndpoint:
+    """Minimal serial-like wrapper around a pty master fd (the far end of a pyserial port)."""
+
+    def __init__(self, fd, timeout=0.5):
+        self.fd = fd
+        self.timeout = timeout
+        self.is_open = True
+
+    @property
+    def in_waiting(self):
+        buf = fcntl.ioctl(self.fd, termios.FIONREAD, struct.pack("I", 0))
+        return struct.unpack("I", buf)[0]
+
+    def read(self, size=1):
+        ready, _, _ = select.select([self.fd], [], [], self.timeout)
+        return os.read(self.fd, size) if ready else b""
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            n = os.write(self.fd, view)
+            view = view[n:]
+        return len(data)
+
+    def fileno(self):
+        return self.fd
+
+    def close(self):
+        self.is_open = False
+
+
+class WireEndpoint(PtyEndpoint):
+    """PtyEndpoint that sends like a UART: write() fills a bounded transmit buffer
+    with whole lines (blocking while it is full) and a thread clocks the bytes out
+    at baud, 10 bits per byte. send_ns gets the time each line entered the buffer.
+    After cut_off() writes fail as with a pyserial write timeout."""
+
+    def __init__(self, fd, baud, tx_buffer=4096):
+        super().__init__(fd)
+        self.s_per_byte = 10.0 / baud
+        self.tx_buffer = tx_buffer
+        self.pending = bytearray()
+        self.cond = threading.Condition()
+        self.send_ns = array('q')
+        self.bytes = 0
+        self.cut = False
+        self.thread = threading.Thread(target=self._clock_out, daemon=True)
+        self.thread.start()
+
+    def write(self, data):
+        data = bytes(data)
+        pos = 0
+        with self.cond:
+            while pos < len(data):
+                if self.cut:
+                    raise serial.SerialTimeoutException("Write timeout")
+                room = self.tx_buffer - len(self.pending)
+                end = data.rfind(b"\n", pos, pos + room) + 1
+                if end <= pos:
+                    if self.pending:
+                        self.cond.wait()
+                        continue
+                    end = min(len(data), pos + room)  # a line longer than the buffer
+                self.pending += data[pos:end]
+                self.send_ns.extend([time.monotonic_ns()] * data.count(b"\n", pos, end))
+                self.bytes += end - pos
+                pos = end
+                self.cond.notify_all()
+        return len(data)
+
+    def cut_off(self):
+        with self.cond:
+            self.cut = True
+            self.cond.notify_all()
+
+    def flush(self):
+        with self.cond:
+            while self.pending:
+                self.cond.wait()
+
+    def _clock_out(self):
+        # About 1 ms of wire time per write to the pty
+        step = max(1, int(0.001 / self.s_per_byte))
+        wire_free = time.monotonic()
+        while True:
+            with self.cond:
+                while not self.pending and self.is_open:
+                    self.cond.wait()
+                if not self.is_open:
+                    return
+                piece = bytes(self.pending[:step])
+            delay = wire_free - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            super().write(piece)
+            wire_free = max(time.monotonic(), wire_free) + len(piece) * self.s_per_byte
+            with self.cond:
+                del self.pending[:len(piece)]
+                self.cond.notify_all()
+
+    def close(self):
+        with self.cond:
+            self.is_open = False
+            self.cond.notify_all()
+
+
+class PaddedSource(RandomSource):
+    """RandomSource whose packets end in a ;PAD=xxx field of pad characters."""
+
+    def __init__(self, pad):
+        self.suffix = (b";PAD=" + b"x" * pad if pad else b"") + b"\n"
+
+    def take(self, s):
+        stress, fields = super().take(s)
+        return stress, fields[:-1] + self.suffix
+
+
+def make_pty():
+    master, slave = os.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    return master, slave, os.ttyname(slave)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+# === Processes ===
+def sender_proc(fd, baud, rate, payload, duration, results):
+    # TIME=<13 digits>;SENSOR=1;STRESS=<up to 3>;SEQ=<about 6> and the newline
+    base = len(b"TIME=1700000000000;SENSOR=1;STRESS=100;SEQ=000000\n")
+    pad = max(0, payload - base - len(";PAD="))
+    engine = SenderEngine(source=PaddedSource(pad), seq=True)
+    engine.ser = out = WireEndpoint(fd, baud)
+    engine.configure([SensorConfig(1, rate_hz=rate)])
+    cpu0 = time.process_time()
+    t0 = time.monotonic()
+    engine.start()
+    time.sleep(duration)
+    # A sender behind schedule may be blocked in a long write; what is buffered by now still goes out
+    out.cut_off()
+    engine.stop()
+    wall = time.monotonic() - t0
+    cpu = time.process_time() - cpu0
+    out.flush()
+    out.close()
+    sent = len(out.send_ns)
+    results.put(("sender", {
+        "sent": sent,
+        "bytes": out.bytes,
+        "line_bytes": round(out.bytes / sent) if sent else 0,
+        "missed": engine.missed,
+        "cpu_percent": 100.0 * cpu / wall,
+        "send_ns": out.send_ns.tobytes(),
+    }))
+
+
+def proxy_proc(in_path, out_path, baud, mode, stop_event, ready_event, results):
+    engine = ProxyEngine(transparent=(mode == "transparent"))
+    engine.connect_input(in_path, baud)
+    engine.connect_output(out_path, baud)
+    cpu0 = time.process_time()
+    t0 = time.monotonic()
+    engine.start()
+    ready_event.set()
+    stop_event.wait()
+    engine.stop()
+    wall = time.monotonic() - t0
+    engine.disconnect_input()
+    engine.disconnect_output()
+    results.put(("proxy", {"cpu_percent": 100.0 * (time.process_time() - cpu0) / wall}))
+
+
+def receiver_proc(fd, stop_event, ready_event, results):
+    recv_seq = array('q')
+    recv_ns = array('q')
+    # Lines/bytes delivered after the first delivery, and its time and the last one's
+    span = {"first_ns": None, "last_ns": None, "lines": 0, "bytes": 0}
+
+    def on_lines(lines):
+        stamp = time.monotonic_ns()
+        for line in lines:
+            m = _SEQ.search(line)
+            if m:
+                recv_seq.append(int(m.group(1)))
+                recv_ns.append(stamp)
+        if span["first_ns"] is None:
+            span["first_ns"] = stamp
+        else:
+            span["lines"] += len(lines)
+            span["bytes"] += sum(map(len, lines)) + len(lines)
+        span["last_ns"] = stamp
+
+    engine = ReceiveEngine(on_lines=on_lines)
+    engine.ser = PtyEndpoint(fd)
+    cpu0 = time.process_time()
+    t0 = time.monotonic()
+    engine.start()
+    ready_event.set()
+    stop_event.wait()
+    engine.stop()
+    wall = time.monotonic() - t0
+    results.put(("receiver", {
+        "lines": engine.total_lines,
+        "bytes": engine.total_bytes,
+        "span_s": (span["last_ns"] - span["first_ns"]) / 1e9 if span["first_ns"] is not None else 0.0,
+        "span_lines": span["lines"],
+        "span_bytes": span["bytes"],
+        "cpu_percent": 100.0 * (time.process_time() - cpu0) / wall,
+        "recv_seq": recv_seq.tobytes(),
+        "recv_ns": recv_ns.tobytes(),
+    }))
+
+
+def run_case(baud, rate, payload, duration, mode, drain):
+    ctx = multiprocessing.get_context("fork")
+    a_master, a_slave, a_path = make_pty()
+    b_master, b_slave, b_path = make_pty()
+    results = ctx.Queue()
+    stop = ctx.Event()
+    proxy_ready = ctx.Event()
+    recv_ready = ctx.Event()
+
+    procs = [
+        ctx.Process(target=receiver_proc, args=(b_master, stop, recv_ready, results)),
+        ctx.Process(target=proxy_proc, args=(a_path, b_path, baud, mode, stop, proxy_ready, results)),
+    ]
+    for p in procs:
+        p.start()
+    recv_ready.wait(5)
+    proxy_ready.wait(5)
+
+    sender = ctx.Process(target=sender_proc, args=(a_master, baud, rate, payload, duration, results))
+    sender.start()
+    collected = dict([results.get()])
+    time.sleep(drain)
+    stop.set()
+    for _ in procs:
+        name, data = results.get()
+        collected[name] = data
+    for p in procs + [sender]:
+        p.join(5)
+    for fd in (a_master, a_slave, b_master, b_slave):
+        os.close(fd)
+    return summarize(baud, rate, payload, duration, mode, collected)
+
+
+def summarize(baud, rate, payload, duration, mode, r):
+    snd, rcv, prx = r["sender"], r["receiver"], r["proxy"]
+    send_ns = array('q')
+    send_ns.frombytes(snd["send_ns"])
+    recv_seq = array('q')
+    recv_seq.frombytes(rcv["recv_seq"])
+    recv_ns = array('q')
+    recv_ns.frombytes(rcv["recv_ns"])
+
+    latencies = sorted(
+        (t - send_ns[s]) / 1000.0 for s, t in zip(recv_seq, recv_ns) if 0 <= s < len(send_ns)
+    )
+    received = len(set(recv_seq))
+    return {
+        "baud": baud,
+        "target_rate": rate,
+        "payload_bytes": payload,
+        "line_bytes": snd["line_bytes"],
+        "proxy_mode": mode,
+        "duration_s": duration,
+        "sent": snd["sent"],
+        "received": received,
+        "dropped": snd["sent"] - received,
+        "sender_missed": snd["missed"],
+        "lines_per_s": rcv["span_lines"] / rcv["span_s"] if rcv["span_s"] else 0.0,
+        "bytes_per_s": rcv["span_bytes"] / rcv["span_s"] if rcv["span_s"] else 0.0,
+        "cpu_percent": {
+            "sender": round(snd["cpu_percent"], 2),
+            "proxy": round(prx["cpu_percent"], 2),
+            "receiver": round(rcv["cpu_percent"], 2),
+        },
+        "latency_us": {
+            "p50": percentile(latencies, 50),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None,
+        },
+    }
+
+
+def case_key(case):
+    return (case["baud"], case["target_rate"], case["payload_bytes"], case["proxy_mode"])
+
+
+def compare(cases, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {case_key(c): c for c in json.load(f)["cases"]}
+    print(f"\nChange vs {baseline_path}:")
+    for case in cases:
+        old = baseline.get(case_key(case))
+        if not old:
+            continue
+
+        def delta(new, prev):
+            if not prev or new is None:
+                return "   n/a"
+            return f"{100.0 * (new - prev) / prev:+6.1f}%"
+
+        print(f"  baud={case['baud']:>6} rate={case['target_rate']:>6} payload={case['payload_bytes']:>4} {case['proxy_mode']:<11}"
+              f" lines/s {delta(case['lines_per_s'], old['lines_per_s'])}"
+              f"  p99 {delta(case['latency_us']['p99'], old['latency_us']['p99'])}"
+              f"  dropped {case['dropped'] - old['dropped']:+d}")
+
+
+def int_list(text):
+    return [int(x) for x in text.split(",") if x]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bauds", type=int_list, default=[9600, 115200, 921600])
+    parser.add_argument("--rates", type=int_list, default=[100, 1000, 10000], help="Target lines/s")
+    parser.add_argument("--payloads", type=int_list, default=[40, 128], help="Target line length in bytes (lines are never shorter than the base fields)")
+    parser.add_argument("--modes", default="line,transparent", help="Proxy modes to run")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds of sending per case")
+    parser.add_argument("--drain", type=float, default=1.0, help="Seconds to wait for in-flight lines")
+    parser.add_argument("--out", default="bench_pipeline.json")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    if not sys.platform.startswith("linux"):
+        parser.error("this benchmark needs Linux pty pairs")
+
+    cases = []
+    for mode in [m for m in args.modes.split(",") if m]:
+        for baud in args.bauds:
+            for rate in args.rates:
+                for payload in args.payloads:
+                    case = run_case(baud, rate, payload, args.duration, mode, args.drain)
+                    cases.append(case)
+                    lat = case["latency_us"]
+                    cpu = case["cpu_percent"]
+                    p50 = f"{lat['p50']:.0f}" if lat["p50"] is not None else "-"
+                    p99 = f"{lat['p99']:.0f}" if lat["p99"] is not None else "-"
+                    print(f"{mode:<11} baud={baud:>6} rate={rate:>6} payload={payload:>4}: "
+                          f"{case['lines_per_s']:9,.0f} lines/s {case['bytes_per_s']:11,.0f} B/s "
+                          f"dropped={case['dropped']:<6} p50={p50}us p99={p99}us "
+                          f"cpu s/p/r={cpu['sender']:.0f}/{cpu['proxy']:.0f}/{cpu['receiver']:.0f}%")
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cases": cases,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] Results written to {args.out}")
+
+    if args.compare:
+        compare(cases, args.compare)
+
+
+if __name__ == "__main__":
+    main()
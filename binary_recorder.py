@@ -0,0 +1,359 @@
+import argparse
+import csv
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from array import array
+from datetime import datetime
+
+from line_parser import SENSOR_OK, STRESS_FLOAT, STRESS_OK, TIME_OK
+from profiling import counter
+
+# File layout (all little-endian):
+#
+#   file header   magic "RSPBIN\r\n", version u16, reserved u16 + u32
+#   chunk*        chunk header + columns
+#   chunk header  magic "CHNK", rows u32, local min/max i64, time min/max i64, crc32 u32
+#   columns       local_ms i64[rows] time i64[rows] sensor i32[rows] stress f64[rows] flags u8[rows]
+#
+# local_ms is the proxy's read time (epoch ms), time the sender's TIME field.
+# flags holds the line_parser bits plus FORWARDED. Chunks are only ever
+# appended. PATH.idx repeats every chunk header with its offset so a reader can
+# find a time range without touching the columns; a missing or short index is
+# rebuilt from the chunk headers, and a torn last chunk is ignored.
+MAGIC = b"RSPBIN\r\n"
+VERSION = 1
+FORWARDED = 0x80
+EXPORT_HEADER = ["Local Timestamp", "Sensor", "Stress", "Raw Time"]
+
+_FILE_HEADER = struct.Struct("<8sHHI")
+_CHUNK_HEADER = struct.Struct("<4sIqqqqI")
+_INDEX_ENTRY = struct.Struct("<QIqqqq")
+_CHUNK_MAGIC = b"CHNK"
+_ROW_BYTES = 8 + 8 + 4 + 8 + 1
+_NO_MIN = 2 ** 63 - 1
+_NO_MAX = -2 ** 63
+_STOP = object()
+_WRITE = counter("binary_write")
+
+
+class _Columns:
+    __slots__ = ("local_ms", "times", "sensors", "stresses", "flags")
+
+    def __init__(self):
+        self.local_ms = array('q')
+        self.times = array('q')
+        self.sensors = array('i')
+        self.stresses = array('d')
+        self.flags = array('B')
+
+    def __len__(self):
+        return len(self.flags)
+
+    def arrays(self):
+        return (self.local_ms, self.times, self.sensors, self.stresses, self.flags)
+
+
+class ChunkInfo:
+    """Location and time ranges of one chunk, as stored in the index."""
+
+    __slots__ = ("offset", "rows", "local_min", "local_max", "time_min", "time_max")
+
+    def __init__(self, offset, rows, local_min, local_max, time_min, time_max):
+        self.offset = offset
+        self.rows = rows
+        self.local_min = local_min
+        self.local_max = local_max
+        self.time_min = time_min
+        self.time_max = time_max
+
+    def span(self, by):
+        return (self.local_min, self.local_max) if by == "local" else (self.time_min, self.time_max)
+
+
+class BinaryRecorder:
+    """Append-only columnar recorder, a drop-in alternative to CsvRecorder for the proxy.
+
+    record_batch() queues a whole ParsedBatch; a writer thread collects rows and
+    appends them as one chunk whenever chunk_rows rows are pending or
+    flush_interval seconds have passed. No text is formatted on the way in.
+    """
+
+    def __init__(self, path, chunk_rows=8192, flush_interval=1.0, fsync=False):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self.rows_written = 0
+        self.chunks_written = 0
+        self.error = None
+
+        self.queue = queue.SimpleQueue()
+        self.file = open(path, "wb")
+        self.index_file = open(path + ".idx", "wb")
+        self.file.write(_FILE_HEADER.pack(MAGIC, VERSION, 0, 0))
+        self.file.flush()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def record_batch(self, local_ms, batch, forwarded):
+        """Queues every row of batch, stamped with local_ms; never blocks.
+
+        forwarded is one bool for all rows, or a list with one per row.
+        """
+        if self.error is None and len(batch):
+            self.queue.put((local_ms, batch, forwarded))
+
+    def close(self, timeout=5.0):
+        if self.thread is None:
+            return
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def _write_chunk(self, cols):
+        t0 = time.perf_counter_ns()
+        n = len(cols)
+        payload = b"".join(column.tobytes() for column in cols.arrays())
+        time_min, time_max = _NO_MIN, _NO_MAX
+        for t, f in zip(cols.times, cols.flags):
+            if f & TIME_OK:
+                if t < time_min:
+                    time_min = t
+                if t > time_max:
+                    time_max = t
+        ranges = (min(cols.local_ms), max(cols.local_ms), time_min, time_max)
+
+        offset = self.file.tell()
+        self.file.write(_CHUNK_HEADER.pack(_CHUNK_MAGIC, n, *ranges, zlib.crc32(payload)))
+        self.file.write(payload)
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        # The index is written after the data, so it never points past it
+        self.index_file.write(_INDEX_ENTRY.pack(offset, n, *ranges))
+        self.index_file.flush()
+        self.rows_written += n
+        self.chunks_written += 1
+        _WRITE.add(len(payload), t0)
+
+    def _append(self, cols, item):
+        local_ms, batch, forwarded = item
+        n = len(batch)
+        cols.local_ms.extend(array('q', [local_ms]) * n)
+        cols.times.extend(batch.times)
+        cols.sensors.extend(batch.sensors)
+        cols.stresses.extend(batch.stresses)
+        if isinstance(forwarded, list):
+            cols.flags.frombytes(bytes(f | FORWARDED if fwd else f for f, fwd in zip(batch.flags, forwarded)))
+        elif forwarded:
+            cols.flags.frombytes(bytes(f | FORWARDED for f in batch.flags))
+        else:
+            cols.flags.extend(batch.flags)
+
+    def _run(self):
+        cols = _Columns()
+        try:
+            last_write = time.monotonic()
+            stopping = False
+            while not stopping:
+                wait = max(0.0, self.flush_interval - (time.monotonic() - last_write))
+                try:
+                    item = self.queue.get(timeout=wait if len(cols) else None)
+                except queue.Empty:
+                    item = None
+                while item is not None:
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    self._append(cols, item)
+                    if len(cols) >= self.chunk_rows:
+                        self._write_chunk(cols)
+                        cols = _Columns()
+                        last_write = time.monotonic()
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        item = None
+                if len(cols) and (stopping or time.monotonic() - last_write >= self.flush_interval):
+                    self._write_chunk(cols)
+                    cols = _Columns()
+                    last_write = time.monotonic()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.file.close()
+            self.index_file.close()
+
+
+class BinaryRecording:
+    """Memory-mapped reader for BinaryRecorder files.
+
+    The chunk list comes from the index (or the chunk headers), so select()
+    and export_csv() only read the columns of chunks whose time range overlaps
+    the requested one. by="local" filters on the proxy read time, by="sender"
+    on the sender's TIME field. Times are epoch milliseconds.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < _FILE_HEADER.size:
+            self.file.close()
+            raise ValueError(f"{path}: not a binary recording (file too short)")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, _ = _FILE_HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path}: not a binary recording (version {version})")
+        self.chunks = self._load_index()
+
+    def __len__(self):
+        return sum(c.rows for c in self.chunks)
+
+    def close(self):
+        self.mm.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _chunk_fits(self, offset, rows):
+        return offset + _CHUNK_HEADER.size + rows * _ROW_BYTES <= len(self.mm)
+
+    def _load_index(self):
+        chunks = []
+        try:
+            with open(self.path + ".idx", "rb") as f:
+                data = f.read()
+        except OSError:
+            data = b""
+        for entry in _INDEX_ENTRY.iter_unpack(data[:len(data) - len(data) % _INDEX_ENTRY.size]):
+            info = ChunkInfo(*entry)
+            if not self._chunk_fits(info.offset, info.rows) or self.mm[info.offset:info.offset + 4] != _CHUNK_MAGIC:
+                break
+            chunks.append(info)
+
+        # Walk the headers of any chunks appended after the last indexed one
+        offset = chunks[-1].offset + _CHUNK_HEADER.size + chunks[-1].rows * _ROW_BYTES if chunks else _FILE_HEADER.size
+        while offset + _CHUNK_HEADER.size <= len(self.mm):
+            magic, rows, *ranges, _ = _CHUNK_HEADER.unpack_from(self.mm, offset)
+            if magic != _CHUNK_MAGIC or not self._chunk_fits(offset, rows):
+                break
+            chunks.append(ChunkInfo(offset, rows, *ranges))
+            offset += _CHUNK_HEADER.size + rows * _ROW_BYTES
+        return chunks
+
+    def read_chunk(self, info, verify=False):
+        """Columns of one chunk; verify=True also checks the chunk CRC."""
+        start = info.offset + _CHUNK_HEADER.size
+        if verify:
+            crc = _CHUNK_HEADER.unpack_from(self.mm, info.offset)[-1]
+            if zlib.crc32(self.mm[start:start + info.rows * _ROW_BYTES]) != crc:
+                raise ValueError(f"{self.path}: CRC mismatch in chunk at offset {info.offset}")
+        cols = _Columns()
+        pos = start
+        for column in cols.arrays():
+            end = pos + info.rows * column.itemsize
+            column.frombytes(self.mm[pos:end])
+            pos = end
+        return cols
+
+    def select(self, start=None, end=None, by="local"):
+        """Yields _Columns per chunk holding only the rows with start <= time <= end."""
+        lo_limit = _NO_MAX if start is None else start
+        hi_limit = _NO_MIN if end is None else end
+        for info in self.chunks:
+            lo, hi = info.span(by)
+            if hi < lo_limit or lo > hi_limit:
+                continue
+            cols = self.read_chunk(info)
+            if lo_limit <= lo and hi <= hi_limit and (by == "local" or all(f & TIME_OK for f in cols.flags)):
+                yield cols
+                continue
+            key = cols.local_ms if by == "local" else cols.times
+            keep = [i for i, t in enumerate(key)
+                    if lo_limit <= t <= hi_limit and (by == "local" or cols.flags[i] & TIME_OK)]
+            if keep:
+                part = _Columns()
+                for src, dst in zip(cols.arrays(), part.arrays()):
+                    dst.fromlist([src[i] for i in keep])
+                yield part
+
+    def export_csv(self, path, start=None, end=None, by="local", forwarded_column=False):
+        """Writes the selected rows in the proxy CSV layout; returns rows written."""
+        written = 0
+        last_second = None
+        label = ""
+        with open(path, mode='w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_HEADER + (["Forwarded"] if forwarded_column else []))
+            for cols in self.select(start, end, by):
+                rows = []
+                for local_ms, t, sensor, stress, flags in zip(*cols.arrays()):
+                    second = local_ms // 1000
+                    if second != last_second:
+                        last_second = second
+                        label = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+                    row = [
+                        label,
+                        sensor if flags & SENSOR_OK else "N/A",
+                        (stress if flags & STRESS_FLOAT else int(stress)) if flags & STRESS_OK else "N/A",
+                        t if flags & TIME_OK else "N/A",
+                    ]
+                    if forwarded_column:
+                        row.append(1 if flags & FORWARDED else 0)
+                    rows.append(row)
+                writer.writerows(rows)
+                written += len(rows)
+        return written
+
+
+def parse_time(text):
+    """Epoch milliseconds, or a local 'YYYY-MM-DD HH:MM:SS[.fff]' time, as epoch ms."""
+    if text is None:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        return int(datetime.fromisoformat(text).timestamp() * 1000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect a binary proxy recording or convert it to CSV")
+    parser.add_argument("recording", help="Binary recording written by the proxy")
+    parser.add_argument("--csv", help="Write the (selected) rows to this CSV file")
+    parser.add_argument("--start", help="Start of the time range (epoch ms or 'YYYY-MM-DD HH:MM:SS')")
+    parser.add_argument("--end", help="End of the time range (epoch ms or 'YYYY-MM-DD HH:MM:SS')")
+    parser.add_argument("--by", choices=["local", "sender"], default="local",
+                        help="Filter on the proxy read time (local) or the sender TIME field")
+    parser.add_argument("--forwarded-column", action="store_true", help="Add the Forwarded column to the CSV")
+    parser.add_argument("--verify", action="store_true", help="Check the CRC of every chunk")
+    args = parser.parse_args(argv)
+
+    with BinaryRecording(args.recording) as rec:
+        first = min((c.local_min for c in rec.chunks), default=None)
+        last = max((c.local_max for c in rec.chunks), default=None)
+        print(f"[INFO] {args.recording}: {len(rec):,} rows in {len(rec.chunks)} chunks"
+              + (f", {datetime.fromtimestamp(first / 1000)} .. {datetime.fromtimestamp(last / 1000)}" if rec.chunks else ""))
+        if args.verify:
+            for info in rec.chunks:
+                rec.read_chunk(info, verify=True)
+            print("[INFO] All chunk CRCs OK.")
+        if args.csv:
+            started = time.perf_counter()
+            rows = rec.export_csv(args.csv, parse_time(args.start), parse_time(args.end), args.by, args.forwarded_column)
+            print(f"[INFO] Wrote {rows:,} rows to {args.csv} in {time.perf_counter() - started:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
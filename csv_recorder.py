@@ -0,0 +1,146 @@
+import csv
+import os
+import queue
+import threading
+import time
+
+from profiling import counter
+from segment_log import SegmentLog
+
+_STOP = object()
+_WRITE = counter("csv_write")
+
+
+class CsvRecorder:
+    """Writes CSV rows from a dedicated thread so callers never wait on disk I/O.
+
+    record() only puts the row on a queue. The writer thread collects rows and
+    writes them in one writerows() call whenever flush_every rows are pending or
+    flush_interval seconds have passed since the last write. With fsync=True each
+    batch is also forced to disk.
+
+    With a segment_log.RotationPolicy as rotation, path only names the log:
+    rows go to time-named segment files that start by size or wall-clock
+    interval, each with the header, and are listed in a manifest (see
+    segment_log.SegmentLog). Rotation happens on the writer thread between
+    batches, or when the interval ends while no rows come in; a segment that
+    is still empty then stays open. mode is ignored.
+    """
+
+    def __init__(self, path, header=None, mode='w', flush_every=500, flush_interval=1.0, fsync=False,
+                 rotation=None):
+        self.path = path
+        self.header = header
+        self.mode = mode
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self.rows_written = 0
+        self.batches_written = 0
+        self.error = None
+
+        self.queue = queue.SimpleQueue()
+        self.segments = SegmentLog(path, rotation) if rotation else None
+        if self.segments:
+            self.file = self.segments.open()
+        else:
+            self.file = open(path, mode=mode, newline='', encoding='utf-8')
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def record(self, row):
+        """Queues one row; never blocks. Rows are discarded once the writer has failed."""
+        if self.error is None:
+            self.queue.put(row)
+
+    def close(self, timeout=5.0):
+        if self.thread is None:
+            return
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def _writer(self):
+        writer = csv.writer(self.file)
+        if self.header:
+            writer.writerow(self.header)
+        return writer
+
+    def _write(self, writer, batch):
+        """Writes batch; returns the writer to use next, which changes when a new segment started."""
+        t0 = time.perf_counter_ns()
+        start = self.file.tell()
+        writer.writerows(batch)
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        _WRITE.add(self.file.tell() - start, t0)
+        self.rows_written += len(batch)
+        self.batches_written += 1
+        segments = self.segments
+        if segments:
+            segments.written(len(batch))
+            if segments.due(self.file.tell()):
+                self.file = segments.roll(self.file)
+                writer = self._writer()
+        batch.clear()
+        return writer
+
+    def _wait(self, batch, last_write):
+        """How long the writer may block for a row: until the flush interval ends, or the segment's interval."""
+        wait = max(0.0, self.flush_interval - (time.monotonic() - last_write)) if batch else None
+        deadline = self.segments.deadline if self.segments else None
+        if deadline is not None:
+            until = max(0.0, deadline - time.time())
+            wait = until if wait is None else min(wait, until)
+        return wait
+
+    def _roll_idle(self, writer):
+        """Closes a segment whose interval ended while nothing was written; returns the writer to use next."""
+        segments = self.segments
+        if segments and segments.due(self.file.tell()):
+            if not segments.entry["rows"]:
+                segments.postpone()
+                return writer
+            self.file = segments.roll(self.file)
+            return self._writer()
+        return writer
+
+    def _run(self):
+        batch = []
+        try:
+            writer = self._writer()
+            last_write = time.monotonic()
+            stopping = False
+            while not stopping:
+                try:
+                    row = self.queue.get(timeout=self._wait(batch, last_write))
+                except queue.Empty:
+                    row = None
+                    if not batch:
+                        writer = self._roll_idle(writer)
+                # Drain whatever else is queued without waiting
+                while row is not None:
+                    if row is _STOP:
+                        stopping = True
+                        break
+                    batch.append(row)
+                    if len(batch) >= self.flush_every:
+                        writer = self._write(writer, batch)
+                        last_write = time.monotonic()
+                    try:
+                        row = self.queue.get_nowait()
+                    except queue.Empty:
+                        row = None
+                if batch and (stopping or time.monotonic() - last_write >= self.flush_interval):
+                    writer = self._write(writer, batch)
+                    last_write = time.monotonic()
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.segments:
+                self.segments.finish(self.file)
+                self.segments.close()
+            else:
+                self.file.close()
@@ -0,0 +1,139 @@
+import collections
+import threading
+import time
+
+BLOCK = "block"
+DROP_OLDEST = "drop-oldest"
+DROP_NEWEST = "drop-newest"
+DECIMATE = "decimate"
+POLICIES = [BLOCK, DROP_OLDEST, DROP_NEWEST, DECIMATE]
+
+
+class ForwardBuffer:
+    """Bounded FIFO between the proxy's reader and writer threads.
+
+    put() applies the overflow policy once capacity items are queued:
+      block        wait for the writer to make room (the input backs up instead)
+      drop-oldest  discard the oldest queued item to make room
+      drop-newest  discard the incoming item
+      decimate     once the buffer is half full, pass only 1 in `decimate`
+                   items per sensor, so every sensor keeps a reduced rate;
+                   when it is full, the incoming item is discarded
+    Capacity and the counters are in lines: a raw chunk counts as the number
+    of lines (or frames) it holds, given as weight. Items without a sensor
+    (raw chunks) are never decimated. depth, high_water and dropped are live
+    counters for display.
+    """
+
+    def __init__(self, capacity=10000, policy=BLOCK, decimate=4):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown overflow policy {policy!r} (expected one of {', '.join(POLICIES)})")
+        self.capacity = max(1, capacity)
+        self.policy = policy
+        self.decimate = max(1, decimate)
+
+        self.items = collections.deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.depth = 0
+
+        self.high_water = 0
+        self.dropped = 0
+        self.dropped_bytes = 0
+        self.blocked_s = 0.0
+        self._seen = {}
+
+    def _drop(self, data, weight):
+        self.dropped += weight
+        self.dropped_bytes += len(data)
+
+    def _full(self, weight):
+        # An item larger than the whole buffer still goes through once it is empty
+        return self.depth and self.depth + weight > self.capacity
+
+    def put(self, data, sensor=None, read_ns=0, weight=1):
+        """Queues data for the writer; returns False if it was discarded or the buffer is closed."""
+        with self.cond:
+            if self.closed:
+                return False
+            items = self.items
+            if self.policy == DECIMATE and sensor is not None and self.depth * 2 >= self.capacity:
+                n = self._seen.get(sensor, 0)
+                self._seen[sensor] = n + 1
+                if n % self.decimate:
+                    self._drop(data, weight)
+                    return False
+
+            if self._full(weight):
+                if self.policy == BLOCK:
+                    start = time.monotonic()
+                    while self._full(weight) and not self.closed:
+                        self.cond.wait(0.5)
+                    self.blocked_s += time.monotonic() - start
+                    if self.closed:
+                        return False
+                elif self.policy == DROP_OLDEST:
+                    while self._full(weight):
+                        old, _, old_weight = items.popleft()
+                        self.depth -= old_weight
+                        self._drop(old, old_weight)
+                else:
+                    self._drop(data, weight)
+                    return False
+
+            items.append((data, read_ns, weight))
+            self.depth += weight
+            if self.depth > self.high_water:
+                self.high_water = self.depth
+            self.cond.notify_all()
+            return True
+
+    def get_batch(self, max_items=512, timeout=0.5):
+        """Removes and returns up to max_items queued (data, read_ns, weight); waits up to timeout while empty."""
+        with self.cond:
+            items = self.items
+            if not items and not self.closed:
+                self.cond.wait(timeout)
+            if len(items) <= max_items:
+                batch = list(items)
+                items.clear()
+                self.depth = 0
+            else:
+                batch = [items.popleft() for _ in range(max_items)]
+                self.depth -= sum(item[2] for item in batch)
+            self.cond.notify_all()
+            return batch
+
+    def close(self):
+        """Rejects further put()s and wakes blocked callers; queued items can still be drained."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def reset(self):
+        with self.cond:
+            self.items.clear()
+            self.closed = False
+            self.depth = 0
+            self.high_water = 0
+            self.dropped = 0
+            self.dropped_bytes = 0
+            self.blocked_s = 0.0
+            self._seen = {}
+
+    def snapshot(self):
+        return {
+            "policy": self.policy,
+            "capacity": self.capacity,
+            "depth": self.depth,
+            "high_water": self.high_water,
+            "dropped": self.dropped,
+            "dropped_bytes": self.dropped_bytes,
+            "blocked_s": round(self.blocked_s, 3),
+        }
+
+
+def format_snapshot(snapshot):
+    """One-line display form of ForwardBuffer.snapshot()."""
+    return (f"{snapshot['depth']}/{snapshot['capacity']} queued, high-water {snapshot['high_water']}, "
+            f"dropped {snapshot['dropped']} ({snapshot['policy']})")
@@ -0,0 +1,311 @@
+import time
+
+from line_parser import SENSOR_OK, STRESS_FLOAT, STRESS_OK, TIME_OK
+
+# Rows passed between stages: (time, sensor, stress, flags, raw, index) with
+# the line_parser flag bits; raw is the original line (bytes, no newline), or
+# None once a stage changed a field and the line has to be formatted again.
+# index is the input row the output row came from (for an average, the row
+# that closed the window), so Pipeline.apply() can tell which rows got through.
+_VALID = SENSOR_OK | STRESS_OK
+
+
+class Stage:
+    """One pipeline step: process(rows) returns the rows to pass on.
+
+    lines_in/lines_out/ns are maintained by Pipeline.
+    """
+
+    name = "stage"
+
+    def __init__(self):
+        self.lines_in = 0
+        self.lines_out = 0
+        self.ns = 0
+
+    def describe(self):
+        return self.name
+
+    def process(self, rows):
+        return rows
+
+    def reset(self):
+        self.lines_in = 0
+        self.lines_out = 0
+        self.ns = 0
+
+
+class Decimate(Stage):
+    """Keeps 1 in n lines per sensor."""
+
+    name = "decimate"
+
+    def __init__(self, n):
+        super().__init__()
+        if n < 1:
+            raise ValueError("decimate needs N >= 1")
+        self.n = n
+        self.seen = {}
+
+    def describe(self):
+        return f"decimate:{self.n}"
+
+    def process(self, rows):
+        seen = self.seen
+        n = self.n
+        out = []
+        for row in rows:
+            sensor = row[1] if row[3] & SENSOR_OK else None
+            k = seen.get(sensor, 0)
+            seen[sensor] = k + 1
+            if not k % n:
+                out.append(row)
+        return out
+
+
+class Deadband(Stage):
+    """Forwards a sensor's line only when STRESS moved more than threshold from the last one forwarded.
+
+    Lines without a valid sensor and stress pass unchanged.
+    """
+
+    name = "deadband"
+
+    def __init__(self, threshold):
+        super().__init__()
+        self.threshold = threshold
+        self.last = {}
+
+    def describe(self):
+        return f"deadband:{self.threshold:g}"
+
+    def process(self, rows):
+        last = self.last
+        threshold = self.threshold
+        out = []
+        for row in rows:
+            if row[3] & _VALID != _VALID:
+                out.append(row)
+                continue
+            previous = last.get(row[1])
+            if previous is None or abs(row[2] - previous) > threshold:
+                last[row[1]] = row[2]
+                out.append(row)
+        return out
+
+
+class Whitelist(Stage):
+    """Keeps only lines from the listed sensors."""
+
+    name = "sensors"
+
+    def __init__(self, sensors):
+        super().__init__()
+        self.sensors = frozenset(sensors)
+
+    def describe(self):
+        return "sensors:" + ",".join(str(s) for s in sorted(self.sensors))
+
+    def process(self, rows):
+        keep = self.sensors
+        return [row for row in rows if row[3] & SENSOR_OK and row[1] in keep]
+
+
+class Rewrite(Stage):
+    """Rewrites fields: STRESS*scale+offset, SENSOR ids through sensor_map, TIME dropped with drop_time."""
+
+    name = "rewrite"
+
+    def __init__(self, scale=1.0, offset=0.0, sensor_map=None, drop_time=False):
+        super().__init__()
+        self.scale = scale
+        self.offset = offset
+        self.sensor_map = dict(sensor_map or {})
+        self.drop_time = drop_time
+        # Integral scale/offset keep integer stresses integral
+        self.to_float = not (float(scale).is_integer() and float(offset).is_integer())
+
+    def describe(self):
+        return "rewrite"
+
+    def process(self, rows):
+        scale, offset, sensor_map = self.scale, self.offset, self.sensor_map
+        float_bit = STRESS_FLOAT if self.to_float else 0
+        time_mask = ~TIME_OK if self.drop_time else -1
+        out = []
+        for t, sensor, stress, flags, _, index in rows:
+            if flags & STRESS_OK:
+                stress = stress * scale + offset
+                flags |= float_bit
+            if flags & SENSOR_OK:
+                sensor = sensor_map.get(sensor, sensor)
+            out.append((t, sensor, stress, flags & time_mask, None, index))
+        return out
+
+
+class WindowAverage(Stage):
+    """Replaces each sensor's lines by one average per window_ms of TIME.
+
+    A window's average is emitted, stamped with the window start, when the
+    sensor's first line of a later window arrives. Lines without a valid TIME
+    use the local clock; lines without a valid sensor and stress are dropped.
+    """
+
+    name = "average"
+
+    def __init__(self, window_ms):
+        super().__init__()
+        if window_ms < 1:
+            raise ValueError("average needs a window of at least 1 ms")
+        self.window_ms = window_ms
+        self.windows = {}  # sensor -> [window, total, count]
+
+    def describe(self):
+        return f"average:{self.window_ms}"
+
+    def process(self, rows):
+        windows = self.windows
+        window_ms = self.window_ms
+        now_ms = None
+        out = []
+        for t, sensor, stress, flags, _, index in rows:
+            if flags & _VALID != _VALID:
+                continue
+            if not flags & TIME_OK:
+                if now_ms is None:
+                    now_ms = time.time_ns() // 1_000_000
+                t = now_ms
+            w = t // window_ms
+            acc = windows.get(sensor)
+            if acc is None:
+                windows[sensor] = [w, stress, 1]
+                continue
+            if acc[0] != w:
+                out.append((acc[0] * window_ms, sensor, acc[1] / acc[2], TIME_OK | _VALID | STRESS_FLOAT, None, index))
+                acc[0], acc[1], acc[2] = w, stress, 1
+            else:
+                acc[1] += stress
+                acc[2] += 1
+        return out
+
+
+def _sensor_list(arg):
+    return [int(s) for s in arg.replace(";", ",").split(",") if s.strip()]
+
+
+def _rewrite(arg):
+    options = {}
+    for part in arg.split(","):
+        if not part.strip():
+            continue
+        key, _, value = part.partition("=")
+        key = key.strip()
+        if key in ("scale", "offset"):
+            options[key] = float(value)
+        elif key == "sensor":
+            options["sensor_map"] = {int(a): int(b) for a, b in (pair.split(">") for pair in value.split(";") if pair)}
+        elif key == "time" and value.strip() in ("drop", "keep"):
+            options["drop_time"] = value.strip() == "drop"
+        else:
+            raise ValueError(f"unknown rewrite option {part!r} (expected scale=, offset=, sensor=A>B;.., time=drop)")
+    return Rewrite(**options)
+
+
+STAGES = {
+    "decimate": lambda arg: Decimate(int(arg)),
+    "deadband": lambda arg: Deadband(float(arg)),
+    "sensors": lambda arg: Whitelist(_sensor_list(arg)),
+    "rewrite": _rewrite,
+    "average": lambda arg: WindowAverage(int(arg)),
+}
+
+
+def format_row(t, sensor, stress, flags):
+    fields = []
+    if flags & TIME_OK:
+        fields.append(b"TIME=%d" % t)
+    if flags & SENSOR_OK:
+        fields.append(b"SENSOR=%d" % sensor)
+    if flags & STRESS_OK:
+        fields.append(b"STRESS=" + (b"%.6g" % stress if flags & STRESS_FLOAT else b"%d" % stress))
+    return b";".join(fields)
+
+
+class Pipeline:
+    """Chain of filter/transform stages between parsing and forwarding.
+
+    Stages run once per parsed batch, each over the rows the previous one
+    kept, and count lines in/out and the nanoseconds they took. apply()
+    returns the bytes to forward: unchanged lines as received, rewritten or
+    averaged ones formatted as TIME=..;SENSOR=..;STRESS=.. lines, together
+    with one bool per input row telling whether it produced output.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self._chain = [(stage, stage.process) for stage in self.stages]
+
+    def __bool__(self):
+        return bool(self.stages)
+
+    def run(self, rows):
+        for stage, process in self._chain:
+            if not rows:
+                break
+            start = time.perf_counter_ns()
+            stage.lines_in += len(rows)
+            rows = process(rows)
+            stage.lines_out += len(rows)
+            stage.ns += time.perf_counter_ns() - start
+        return rows
+
+    def apply(self, batch, raw_lines):
+        """Runs a line_parser.ParsedBatch with its raw lines (bytes) through the stages.
+
+        Returns (output bytes, passed), passed[i] being True if row i produced output.
+        """
+        n = len(raw_lines)
+        rows = self.run(list(zip(batch.times, batch.sensors, batch.stresses, batch.flags, raw_lines, range(n))))
+        passed = [False] * n
+        if not rows:
+            return b"", passed
+        for row in rows:
+            passed[row[5]] = True
+        data = b"\n".join(raw if raw is not None else format_row(t, s, v, f) for t, s, v, f, raw, _ in rows)
+        return data + b"\n", passed
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+
+    def snapshot(self):
+        return [{
+            "stage": stage.describe(),
+            "lines_in": stage.lines_in,
+            "lines_out": stage.lines_out,
+            "us_per_line": stage.ns / 1000 / stage.lines_in if stage.lines_in else 0.0,
+        } for stage in self.stages]
+
+
+def parse_pipeline(spec):
+    """Builds a Pipeline from e.g. "sensors:1,2 | deadband:0.5 | decimate:4"; raises ValueError on a bad spec."""
+    stages = []
+    for part in spec.split("|"):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, arg = part.partition(":")
+        factory = STAGES.get(name.strip().lower())
+        if factory is None:
+            raise ValueError(f"unknown filter stage {name!r} (expected one of {', '.join(STAGES)})")
+        try:
+            stages.append(factory(arg.strip()))
+        except ValueError as e:
+            raise ValueError(f"bad filter stage {part!r}: {e}") from None
+    return Pipeline(stages)
+
+
+def format_snapshot(snapshot):
+    """One-line display form of Pipeline.snapshot()."""
+    return "  |  ".join(f"{s['stage']} {s['lines_in']}->{s['lines_out']} ({s['us_per_line']:.1f} µs/line)"
+                        for s in snapshot) or "-"
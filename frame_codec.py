@@ -0,0 +1,259 @@
+import struct
+from binascii import crc_hqx
+
+from line_parser import SENSOR_OK, SEQ_OK, STRESS_OK, TIME_OK, ParsedBatch
+
+# Wire format (optional, replaces the ASCII lines when binary framing is on):
+#
+#   COBS(body + CRC16) + 0x00
+#
+#   body  = flags:u8 key_id:u8 time count:u8 (sensor stress [seq])*count
+#   time  = i64 little-endian epoch ms      in a key frame (flags & KEY_FRAME)
+#         = varint ms since the key frame   otherwise
+#   sensor, stress = zigzag varints; seq = varint, only if flags & HAS_SEQ
+#   CRC16 is CRC-CCITT (0xFFFF init), big-endian
+#
+# 0x00 only appears as the frame delimiter, so a receiver that joins mid-stream
+# or hits corruption resyncs at the next delimiter. Delta frames refer to the
+# key frame with the same key_id, so losing a delta frame costs only that frame
+# and a lost key frame only drops the deltas until the next key frame.
+KEY_FRAME = 0x01
+HAS_SEQ = 0x02
+MAX_SAMPLES = 255
+MAX_FRAME = 4096
+
+_KEY = struct.Struct("<BBq")
+_CRC = struct.Struct(">H")
+_FLAGS_OK = bytes([TIME_OK | SENSOR_OK | STRESS_OK])
+_FLAGS_SEQ_OK = bytes([TIME_OK | SENSOR_OK | STRESS_OK | SEQ_OK])
+
+
+def cobs_encode(data):
+    """Consistent Overhead Byte Stuffing: returns data without any 0x00 bytes (delimiter not included)."""
+    out = bytearray()
+    for block in bytes(data).split(b"\0"):
+        while len(block) >= 254:
+            out.append(255)
+            out += block[:254]
+            block = block[254:]
+        out.append(len(block) + 1)
+        out += block
+    return bytes(out)
+
+
+def cobs_decode(data):
+    """Inverse of cobs_encode(); raises ValueError on malformed input."""
+    out = bytearray()
+    i = 0
+    n = len(data)
+    while i < n:
+        code = data[i]
+        end = i + code
+        if code == 0 or end > n:
+            raise ValueError("bad COBS code")
+        out += data[i + 1:end]
+        i = end
+        if code < 255 and i < n:
+            out.append(0)
+    return bytes(out)
+
+
+def _put_varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError("varint too long")
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+class FrameEncoder:
+    """Packs (sensor, stress) samples that share a timestamp into binary frames.
+
+    A key frame with the absolute time is sent first, then every key_interval
+    frames and whenever the time moved by key_period_ms or more (or backwards),
+    which also bounds how long a receiver waits to resync. Stresses must be
+    integers. Samples may be (sensor, stress, seq) to carry the SEQ field.
+    """
+
+    def __init__(self, key_interval=32, key_period_ms=1000):
+        self.key_interval = key_interval
+        self.key_period_ms = key_period_ms
+        self.reset()
+
+    def reset(self):
+        self.key_id = -1
+        self.key_time = None
+        self.since_key = 0
+
+    def encode(self, timestamp, samples):
+        """Frames for one timestamp and a list of (sensor, stress[, seq]), as bytes ready to write."""
+        samples = list(samples)
+        return b"".join(self._frame(timestamp, samples[i:i + MAX_SAMPLES])
+                        for i in range(0, len(samples), MAX_SAMPLES))
+
+    def _frame(self, timestamp, samples):
+        with_seq = bool(samples) and len(samples[0]) > 2
+        flags = HAS_SEQ if with_seq else 0
+        delta = timestamp - self.key_time if self.key_time is not None else -1
+        if delta < 0 or delta >= self.key_period_ms or self.since_key >= self.key_interval:
+            self.key_id = (self.key_id + 1) & 0xFF
+            self.key_time = timestamp
+            self.since_key = 0
+            body = bytearray(_KEY.pack(KEY_FRAME | flags, self.key_id, timestamp))
+        else:
+            body = bytearray((flags, self.key_id))
+            _put_varint(body, delta)
+        self.since_key += 1
+
+        body.append(len(samples))
+        for sample in samples:
+            _put_varint(body, _zigzag(sample[0]))
+            _put_varint(body, _zigzag(sample[1]))
+            if with_seq:
+                _put_varint(body, sample[2])
+        body += _CRC.pack(crc_hqx(body, 0xFFFF))
+        return cobs_encode(body) + b"\0"
+
+
+class FrameDecoder:
+    """Stream decoder for FrameEncoder output with resync on corruption.
+
+    feed() takes any slice of the byte stream and appends the samples of every
+    complete, valid frame to a ParsedBatch (the same type parse_chunk()
+    returns). Frames that fail COBS/CRC/length checks, or carry a value that
+    does not fit its column, are dropped and counted; delta frames whose key
+    frame was not seen are counted as unsynced.
+    """
+
+    def __init__(self, max_frame=MAX_FRAME):
+        self.max_frame = max_frame
+        self.pending = bytearray()
+        self.key_id = None
+        self.key_time = 0
+
+        self.frames = 0
+        self.samples = 0
+        self.crc_errors = 0
+        self.bad_frames = 0
+        self.unsynced = 0
+
+    def dropped(self):
+        """Frames discarded so far for any reason."""
+        return self.crc_errors + self.bad_frames + self.unsynced
+
+    def feed(self, data, batch=None):
+        if batch is None:
+            batch = ParsedBatch()
+        pending = self.pending
+        pending += data
+        end = pending.rfind(b"\0")
+        if end < 0:
+            if len(pending) > self.max_frame:
+                # No delimiter for longer than any frame: noise, skip to the next 0x00
+                self.bad_frames += 1
+                pending.clear()
+            return batch
+        raw_frames = bytes(pending[:end]).split(b"\0")
+        del pending[:end + 1]
+        for raw in raw_frames:
+            if raw:
+                self._decode(raw, batch)
+        return batch
+
+    def _decode(self, raw, batch):
+        if len(raw) > self.max_frame:
+            self.bad_frames += 1
+            return
+        try:
+            body = cobs_decode(raw)
+        except ValueError:
+            self.bad_frames += 1
+            return
+        size = len(body) - 2
+        if size < 4 or crc_hqx(body[:size], 0xFFFF) != _CRC.unpack_from(body, size)[0]:
+            self.crc_errors += 1
+            return
+
+        try:
+            if body[0] & KEY_FRAME:
+                _, key_id, timestamp = _KEY.unpack_from(body)
+                pos = _KEY.size
+            else:
+                key_id = body[1]
+                if key_id != self.key_id:
+                    self.unsynced += 1
+                    return
+                delta, pos = _get_varint(body, 2)
+                timestamp = self.key_time + delta
+            count = body[pos]
+            pos += 1
+            with_seq = body[0] & HAS_SEQ
+            sensors = []
+            stresses = []
+            seqs = []
+            for _ in range(count):
+                value, pos = _get_varint(body, pos)
+                sensors.append(_unzigzag(value))
+                value, pos = _get_varint(body, pos)
+                stresses.append(_unzigzag(value))
+                if with_seq:
+                    value, pos = _get_varint(body, pos)
+                    seqs.append(value)
+            if pos != size:
+                raise ValueError("frame length mismatch")
+        except (IndexError, ValueError, struct.error):
+            self.bad_frames += 1
+            return
+
+        rows = len(batch.flags)
+        try:
+            # Values that pass the CRC but do not fit their column are rejected here. fromlist()
+            # leaves an array unchanged when it fails; columns already extended are cut back
+            batch.sensors.fromlist(sensors)
+            batch.times.fromlist([timestamp] * count)
+            batch.stresses.fromlist(stresses)
+            batch.seqs.fromlist(seqs if with_seq else [0] * count)
+        except OverflowError:
+            for column in (batch.times, batch.sensors, batch.stresses, batch.seqs):
+                del column[rows:]
+            self.bad_frames += 1
+            return
+        if body[0] & KEY_FRAME:
+            self.key_id = key_id
+            self.key_time = timestamp
+        self.frames += 1
+        self.samples += count
+        batch.flags.frombytes((_FLAGS_SEQ_OK if with_seq else _FLAGS_OK) * count)
+
+
+def batch_lines(batch):
+    """ASCII lines (bytes, no newline) equivalent to the rows of a batch, as the sender would write them."""
+    return [b"TIME=%d;SENSOR=%d;STRESS=%d;SEQ=%d" % (t, s, v, q) if f & SEQ_OK else b"TIME=%d;SENSOR=%d;STRESS=%d" % (t, s, v)
+            for t, s, v, q, f in zip(batch.times, batch.sensors, map(int, batch.stresses), batch.seqs, batch.flags)]
+
+
+def to_ascii(batch):
+    """The rows of a batch as newline-terminated ASCII, ready to forward."""
+    lines = batch_lines(batch)
+    return b"\n".join(lines) + b"\n" if lines else b""
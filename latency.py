@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+import time
+from array import array
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of non-negative integer values (e.g. microseconds).
+
+    Values below 2**sub_bits are counted exactly; above that every power-of-two
+    range is split into 2**(sub_bits-1) buckets, so the relative error stays
+    below 2**-(sub_bits-1) (about 3% for the default) and memory is constant.
+    record() is meant to be called from a single thread; readers get a
+    consistent-enough view without locking.
+    """
+
+    def __init__(self, sub_bits=6, max_bits=40):
+        self.sub_bits = sub_bits
+        self.half = 1 << (sub_bits - 1)
+        self.limit = (1 << max_bits) - 1
+        self.counts = array('Q', bytes(8 * (max_bits - sub_bits + 3) * self.half))
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def _index(self, value):
+        e = value.bit_length() - self.sub_bits
+        if e <= 0:
+            return value
+        return e * self.half + (value >> e)
+
+    def _value(self, index):
+        """Midpoint of the values that fall into bucket index."""
+        if index < 2 * self.half:
+            return index
+        e = index // self.half - 1
+        m = index - e * self.half
+        return (m << e) + ((1 << e) >> 1)
+
+    def record(self, value):
+        if value < 0:
+            value = 0
+        elif value > self.limit:
+            value = self.limit
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct):
+        if not self.count:
+            return None
+        target = max(1, int(round(pct / 100.0 * self.count)))
+        seen = 0
+        for index, c in enumerate(self.counts):
+            if c:
+                seen += c
+                if seen >= target:
+                    return min(self._value(index), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": self.max if self.count else None,
+        }
+
+    def reset(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+
+class LatencyTracker:
+    """Named per-stage latency histograms (microseconds) with an optional periodic JSON dump."""
+
+    def __init__(self, stages=()):
+        self.histograms = {name: LatencyHistogram() for name in stages}
+        self._dump_thread = None
+        self._dump_stop = threading.Event()
+
+    def record_ns(self, stage, elapsed_ns):
+        hist = self.histograms.get(stage)
+        if hist is None:
+            hist = self.histograms[stage] = LatencyHistogram()
+        hist.record(elapsed_ns // 1000)
+
+    def record_us(self, stage, elapsed_us):
+        hist = self.histograms.get(stage)
+        if hist is None:
+            hist = self.histograms[stage] = LatencyHistogram()
+        hist.record(int(elapsed_us))
+
+    def snapshot(self):
+        return {name: hist.summary() for name, hist in self.histograms.items()}
+
+    def reset(self):
+        for hist in self.histograms.values():
+            hist.reset()
+
+    def dump_json(self, path):
+        report = {"time": time.time(), "unit": "us", "stages": self.snapshot()}
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(report, f, indent=2)
+        # Replace in one step so readers never see a half-written file
+        os.replace(tmp, path)
+
+    def start_dump(self, path, interval=10.0):
+        """Writes the snapshot to path every interval seconds from a background thread."""
+        self.stop_dump()
+        self._dump_stop.clear()
+
+        def loop():
+            while not self._dump_stop.wait(interval):
+                try:
+                    self.dump_json(path)
+                except OSError:
+                    pass
+            self.dump_json(path)
+
+        self._dump_thread = threading.Thread(target=loop, daemon=True)
+        self._dump_thread.start()
+
+    def stop_dump(self):
+        if self._dump_thread:
+            self._dump_stop.set()
+            self._dump_thread.join(5)
+            self._dump_thread = None
+
+
+def format_summary(summary):
+    """p50/p99/max of a histogram summary as a short display string."""
+    if not summary["count"]:
+        return "-"
+    return f"{summary['p50']}/{summary['p99']}/{summary['max']}"
@@ -0,0 +1,221 @@
+import re
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # optional: speeds up bulk integer conversion
+    np = None
+
+# Per-row flags
+TIME_OK = 1
+SENSOR_OK = 2
+STRESS_OK = 4
+STRESS_FLOAT = 8
+SEQ_OK = 16
+
+# Range of the array each integer field is stored in; a value outside it
+# fails the field instead of wrapping around
+_INT32 = (-(1 << 31), 1 << 31)
+_INT64 = (-(1 << 63), 1 << 63)
+
+# The layout the sender and ESP32 firmware produce, without or with the
+# optional SEQ field. Chunks made only of one kind of such lines are
+# converted column-wise in bulk instead of line by line. Numbers are capped
+# at 18 digits so they always fit the int64 columns; longer ones (and
+# sensors outside int32) take the line-by-line path, which reports them.
+_LINE = rb"[ \t]*TIME=-?\d{1,18};SENSOR=-?\d{1,18};STRESS=-?\d{1,18}[ \t\r]*"
+_SEQ_LINE = rb"[ \t]*TIME=-?\d{1,18};SENSOR=-?\d{1,18};STRESS=-?\d{1,18};SEQ=\d{1,18}[ \t\r]*"
+_CANONICAL_CHUNK = re.compile(rb"(?:" + _LINE + rb"\n)*(?:" + _LINE + rb")?")
+_CANONICAL_SEQ_CHUNK = re.compile(rb"(?:" + _SEQ_LINE + rb"\n)*(?:" + _SEQ_LINE + rb")?")
+
+
+class ParsedBatch:
+    """Typed, array-backed result of parse_chunk(): one row per non-empty line.
+
+    times (int ms), sensors (int), stresses (float) and seqs (int) are
+    parallel arrays. flags holds TIME_OK/SENSOR_OK/STRESS_OK/STRESS_FLOAT/
+    SEQ_OK bits per row; a field whose bit is clear was missing or invalid and
+    its array slot is 0, as it is for a value too large for its array. SEQ is
+    optional, so a missing one is not an error.
+    errors lists (row, field, message) for every field that failed.
+    """
+
+    __slots__ = ("times", "sensors", "stresses", "seqs", "flags", "errors")
+
+    def __init__(self):
+        self.times = array('q')
+        self.sensors = array('i')
+        self.stresses = array('d')
+        self.seqs = array('q')
+        self.flags = array('B')
+        self.errors = []
+
+    def __len__(self):
+        return len(self.flags)
+
+    def stress(self, i):
+        """Stress of row i as int, or float if it was sent with a decimal point."""
+        value = self.stresses[i]
+        return value if self.flags[i] & STRESS_FLOAT else int(value)
+
+    def row(self, i):
+        """(sensor, stress, time) of row i, with None for failed fields."""
+        f = self.flags[i]
+        return (self.sensors[i] if f & SENSOR_OK else None,
+                self.stress(i) if f & STRESS_OK else None,
+                self.times[i] if f & TIME_OK else None)
+
+    def csv_fields(self, i):
+        """(sensor, stress, time) of row i in the legacy CSV form, with "N/A" for failed fields."""
+        return tuple("N/A" if v is None else v for v in self.row(i))
+
+    def extend(self, other):
+        offset = len(self)
+        self.times.extend(other.times)
+        self.sensors.extend(other.sensors)
+        self.stresses.extend(other.stresses)
+        self.seqs.extend(other.seqs)
+        self.flags.extend(other.flags)
+        self.errors.extend((row + offset, field, msg) for row, field, msg in other.errors)
+
+
+def _parse_int(raw, limits):
+    value = int(raw)
+    if not limits[0] <= value < limits[1]:
+        raise OverflowError
+    return value
+
+
+def _parse_stress(raw):
+    if b"." in raw or b"e" in raw or b"E" in raw:
+        return float(raw), STRESS_FLOAT
+    value = int(raw)
+    float(value)  # stored as a double: raises OverflowError if it does not fit
+    return value, 0
+
+
+def _parse_line(line, row, batch):
+    if not line.isascii():
+        # Line noise: drop non-ASCII bytes, as the old decode(errors='ignore') did
+        line = line.decode('ascii', errors='ignore').encode('ascii')
+    fields = {}
+    for part in line.split(b";"):
+        key, sep, value = part.partition(b"=")
+        if sep:
+            fields[key.strip()] = value.strip()
+
+    flags = 0
+    time_val = sensor_val = stress_val = seq_val = 0
+    errors = batch.errors
+
+    raw = fields.get(b"TIME")
+    if raw is None:
+        errors.append((row, "TIME", "missing"))
+    else:
+        try:
+            time_val = _parse_int(raw, _INT64)
+            flags |= TIME_OK
+        except ValueError:
+            errors.append((row, "TIME", f"invalid value {raw!r}"))
+        except OverflowError:
+            errors.append((row, "TIME", f"value out of range {raw!r}"))
+
+    raw = fields.get(b"SENSOR")
+    if raw is None:
+        errors.append((row, "SENSOR", "missing"))
+    else:
+        try:
+            sensor_val = _parse_int(raw, _INT32)
+            flags |= SENSOR_OK
+        except ValueError:
+            errors.append((row, "SENSOR", f"invalid value {raw!r}"))
+        except OverflowError:
+            errors.append((row, "SENSOR", f"value out of range {raw!r}"))
+
+    raw = fields.get(b"STRESS")
+    if raw is None:
+        errors.append((row, "STRESS", "missing"))
+    else:
+        try:
+            stress_val, is_float = _parse_stress(raw)
+            flags |= STRESS_OK | is_float
+        except ValueError:
+            errors.append((row, "STRESS", f"invalid value {raw!r}"))
+        except OverflowError:
+            errors.append((row, "STRESS", f"value out of range {raw!r}"))
+
+    raw = fields.get(b"SEQ")
+    if raw is not None:
+        try:
+            seq_val = _parse_int(raw, _INT64)
+            flags |= SEQ_OK
+        except ValueError:
+            errors.append((row, "SEQ", f"invalid value {raw!r}"))
+        except OverflowError:
+            errors.append((row, "SEQ", f"value out of range {raw!r}"))
+
+    batch.times.append(time_val)
+    batch.sensors.append(sensor_val)
+    batch.stresses.append(stress_val)
+    batch.seqs.append(seq_val)
+    batch.flags.append(flags)
+
+
+def _parse_canonical(chunk, batch, with_seq=False):
+    """Bulk-converts a canonical chunk; False (nothing appended) if a sensor does not fit int32."""
+    # Reduce to whitespace-separated integers: time sensor stress [seq] time sensor stress [seq] ...
+    flat = chunk.replace(b"TIME=", b" ").replace(b";SENSOR=", b" ").replace(b";STRESS=", b" ")
+    width = 3
+    if with_seq:
+        flat = flat.replace(b";SEQ=", b" ")
+        width = 4
+    if np is not None:
+        cols = np.fromstring(flat.decode('ascii'), dtype=np.int64, sep=' ').reshape(-1, width)
+        rows = len(cols)
+        if rows and not (_INT32[0] <= cols[:, 1].min() and cols[:, 1].max() < _INT32[1]):
+            return False
+        batch.times.frombytes(cols[:, 0].tobytes())
+        batch.sensors.frombytes(cols[:, 1].astype(np.int32).tobytes())
+        batch.stresses.frombytes(cols[:, 2].astype(np.float64).tobytes())
+        batch.seqs.frombytes(cols[:, 3].tobytes() if with_seq else bytes(8 * rows))
+    else:
+        values = array('q', map(int, flat.split()))
+        sensors = values[1::width]
+        rows = len(sensors)
+        if rows and not (_INT32[0] <= min(sensors) and max(sensors) < _INT32[1]):
+            return False
+        batch.times.extend(values[0::width])
+        batch.sensors.fromlist(sensors.tolist())
+        batch.stresses.fromlist(values[2::width].tolist())
+        batch.seqs.extend(values[3::width] if with_seq else array('q', bytes(8 * rows)))
+    ok = TIME_OK | SENSOR_OK | STRESS_OK | (SEQ_OK if with_seq else 0)
+    batch.flags.frombytes(bytes([ok]) * rows)
+    return True
+
+
+def split_lines(chunk):
+    """Non-empty, whitespace-stripped lines of a chunk, in the same order as parse_chunk() rows."""
+    return [line for line in (raw.strip() for raw in chunk.split(b"\n")) if line]
+
+
+def parse_chunk(chunk, batch=None):
+    """Parses many newline-separated TIME=..;SENSOR=..;STRESS=.. lines of raw bytes in one call.
+
+    A trailing partial line is parsed as a line, so callers that read a stream
+    should pass only complete lines. Appends to batch if given.
+    """
+    if batch is None:
+        batch = ParsedBatch()
+
+    if chunk and _CANONICAL_CHUNK.fullmatch(chunk):
+        if _parse_canonical(chunk, batch):
+            return batch
+    elif chunk and _CANONICAL_SEQ_CHUNK.fullmatch(chunk):
+        if _parse_canonical(chunk, batch, with_seq=True):
+            return batch
+
+    row = len(batch)
+    for line in split_lines(chunk):
+        _parse_line(line, row, batch)
+        row += 1
+    return batch
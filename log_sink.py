@@ -0,0 +1,71 @@
+import collections
+import itertools
+import time
+
+from profiling import counter
+
+SAMPLE_CHOICES = [1, 10, 100, 1000]
+_INSERT = counter("tk_log_insert")
+
+
+class LogSink:
+    """Batched, bounded writer for a Tk text widget (ScrolledText).
+
+    Worker threads call write(); messages go into a deque (append/popleft are
+    thread-safe) and the Tk thread moves them to the widget in one insert per
+    after() tick. Only the last max_lines lines are kept, both in the pending
+    ring buffer and in the widget. With sample_every=K only 1 in K lines is shown.
+    """
+
+    def __init__(self, widget, max_lines=2000, interval_ms=100, sample_every=1):
+        self.widget = widget
+        self.max_lines = max_lines
+        self.interval_ms = interval_ms
+        self.sample_every = sample_every
+
+        self.pending = collections.deque(maxlen=max_lines)
+        self._seq = itertools.count()
+        self._after_id = self.widget.after(self.interval_ms, self.flush)
+
+    def write(self, message, sample=True):
+        """Queues a line for display; safe to call from any thread.
+
+        Status lines should pass sample=False so they are never sampled away.
+        """
+        if sample and self.sample_every > 1 and next(self._seq) % self.sample_every:
+            return
+        self.pending.append(message)
+
+    def flush(self):
+        lines = []
+        try:
+            while True:
+                lines.append(self.pending.popleft())
+        except IndexError:
+            pass
+
+        if lines:
+            t0 = time.perf_counter_ns()
+            text = "\n".join(lines) + "\n"
+            self.widget.config(state='normal')
+            self.widget.insert('end', text)
+            line_count = int(self.widget.index('end-1c').split('.')[0]) - 1
+            excess = line_count - self.max_lines
+            if excess > 0:
+                self.widget.delete('1.0', f"{excess + 1}.0")
+            self.widget.yview('end')
+            self.widget.config(state='disabled')
+            _INSERT.add(len(text), t0)
+
+        self._after_id = self.widget.after(self.interval_ms, self.flush)
+
+    def clear(self):
+        self.pending.clear()
+        self.widget.config(state='normal')
+        self.widget.delete('1.0', 'end')
+        self.widget.config(state='disabled')
+
+    def close(self):
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
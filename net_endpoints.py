@@ -0,0 +1,278 @@
+import selectors
+import socket
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import serial
+
+# Datagrams above ~1400 bytes risk IP fragmentation on a typical 1500-byte MTU
+UDP_DATAGRAM = 1400
+CLIENT_BUFFER = 1 << 20
+
+
+class TcpFanoutServer:
+    """Write-only endpoint that broadcasts everything written to all connected TCP clients.
+
+    A background thread accepts clients and sends with non-blocking sockets;
+    write() only appends to each client's buffer and never blocks. A client
+    whose buffer already holds client_buffer bytes misses that write (counted
+    in its dropped bytes), so a slow client cannot stall the proxy, and it
+    only ever loses whole writes, i.e. whole lines or frames. Clients that
+    close their end are dropped. Anything clients send is ignored.
+    """
+
+    def __init__(self, host="", port=0, client_buffer=CLIENT_BUFFER):
+        self.client_buffer = client_buffer
+        self.sock = socket.create_server((host, port))
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+
+        self.lock = threading.Lock()
+        self.clients = {}  # socket -> [address, buffer, sent, dropped]
+        self.total_clients = 0
+        self.sel = selectors.DefaultSelector()
+        self.sel.register(self.sock, selectors.EVENT_READ, "accept")
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self.sel.register(self._wake_r, selectors.EVENT_READ, "wake")
+
+        self.is_open = True
+        self.thread = threading.Thread(target=self.serve_loop, daemon=True)
+        self.thread.start()
+
+    def write(self, data):
+        with self.lock:
+            for client in self.clients.values():
+                buf = client[1]
+                if len(buf) + len(data) > self.client_buffer:
+                    client[3] += len(data)
+                    continue
+                buf += data
+        try:
+            self._wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass  # a wakeup is already pending
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def readable(self):
+        return False
+
+    def _drop(self, sock):
+        try:
+            self.sel.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+        with self.lock:
+            self.clients.pop(sock, None)
+        sock.close()
+
+    def serve_loop(self):
+        interest = {}
+        while self.is_open:
+            try:
+                events = self.sel.select(0.5)
+            except (OSError, ValueError):
+                break
+            for key, mask in events:
+                if key.data == "accept":
+                    try:
+                        conn, addr = self.sock.accept()
+                    except OSError:
+                        continue
+                    conn.setblocking(False)
+                    conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    with self.lock:
+                        self.clients[conn] = [addr, bytearray(), 0, 0]
+                        self.total_clients += 1
+                    self.sel.register(conn, selectors.EVENT_READ, "client")
+                    interest[conn] = selectors.EVENT_READ
+                elif key.data == "wake":
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                else:
+                    conn = key.fileobj
+                    if mask & selectors.EVENT_READ:
+                        try:
+                            if not conn.recv(4096):
+                                self._drop(conn)
+                                interest.pop(conn, None)
+                                continue
+                        except BlockingIOError:
+                            pass
+                        except OSError:
+                            self._drop(conn)
+                            interest.pop(conn, None)
+                            continue
+            # Send what each client can take right now and watch for writability only where data is left
+            with self.lock:
+                clients = list(self.clients.items())
+            for conn, client in clients:
+                buf = client[1]
+                if buf:
+                    try:
+                        with self.lock:
+                            n = conn.send(buf)
+                            del buf[:n]
+                        client[2] += n
+                    except BlockingIOError:
+                        pass
+                    except OSError:
+                        self._drop(conn)
+                        interest.pop(conn, None)
+                        continue
+                want = selectors.EVENT_READ | (selectors.EVENT_WRITE if buf else 0)
+                if interest.get(conn) != want:
+                    self.sel.modify(conn, want, "client")
+                    interest[conn] = want
+
+    def close(self):
+        if not self.is_open:
+            return
+        self.is_open = False
+        self.thread.join(2.0)
+        with self.lock:
+            clients = list(self.clients)
+            self.clients.clear()
+        for conn in clients:
+            conn.close()
+        self.sel.close()
+        for sock in (self.sock, self._wake_r, self._wake_w):
+            sock.close()
+
+    def snapshot(self):
+        with self.lock:
+            return [{"client": f"{addr[0]}:{addr[1]}", "queued": len(buf), "sent": sent, "dropped": dropped}
+                    for addr, buf, sent, dropped in self.clients.values()]
+
+    def status(self):
+        clients = self.snapshot()
+        return (f"{len(clients)} client(s), sent {sum(c['sent'] for c in clients):,} B, "
+                f"dropped {sum(c['dropped'] for c in clients):,} B")
+
+
+class UdpSink:
+    """Write-only endpoint that sends written lines to host:port as UDP datagrams.
+
+    Lines are packed into datagrams of up to max_datagram bytes, split only
+    at line (or frame) boundaries. A partly filled datagram waits up to
+    linger seconds for more lines, so several lines share a packet even at
+    low rates. Sends never block; a datagram the socket cannot take is
+    dropped and counted, as UDP would lose it anyway.
+    """
+
+    def __init__(self, host, port, max_datagram=UDP_DATAGRAM, linger=0.02):
+        family, _, _, _, addr = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0]
+        self.addr = addr
+        self.max_datagram = max_datagram
+        self.linger = linger
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+        self.pending = bytearray()
+        self.cond = threading.Condition()
+        self.packets = 0
+        self.sent_bytes = 0
+        self.dropped = 0
+
+        self.is_open = True
+        self.thread = threading.Thread(target=self.linger_loop, daemon=True)
+        self.thread.start()
+
+    def _send(self, packet):
+        try:
+            self.sock.sendto(packet, self.addr)
+            self.packets += 1
+            self.sent_bytes += len(packet)
+        except OSError:
+            self.dropped += 1
+
+    def _cut(self, data, start):
+        """End of the longest run of whole lines from start that fits one datagram."""
+        limit = start + self.max_datagram
+        cut = max(data.rfind(b"\n", start, limit), data.rfind(b"\0", start, limit)) + 1
+        if cut > start:
+            return cut
+        # A single line longer than a datagram is sent on its own
+        ends = [i for i in (data.find(b"\n", limit), data.find(b"\0", limit)) if i >= 0]
+        return min(ends) + 1 if ends else len(data)
+
+    def write(self, data):
+        with self.cond:
+            pending = self.pending
+            pending += data
+            start = 0
+            while len(pending) - start >= self.max_datagram:
+                end = self._cut(pending, start)
+                self._send(bytes(pending[start:end]))
+                start = end
+            del pending[:start]
+            if pending:
+                self.cond.notify()
+        return len(data)
+
+    def readable(self):
+        return False
+
+    def flush(self):
+        with self.cond:
+            if self.pending:
+                self._send(bytes(self.pending))
+                self.pending.clear()
+
+    def linger_loop(self):
+        with self.cond:
+            while self.is_open:
+                if not self.pending:
+                    self.cond.wait(0.5)
+                    continue
+                deadline = time.monotonic() + self.linger
+                while self.pending and self.is_open and time.monotonic() < deadline:
+                    self.cond.wait(deadline - time.monotonic())
+                if self.pending:
+                    self._send(bytes(self.pending))
+                    self.pending.clear()
+
+    def close(self):
+        if not self.is_open:
+            return
+        self.flush()
+        with self.cond:
+            self.is_open = False
+            self.cond.notify()
+        self.thread.join(2.0)
+        self.sock.close()
+
+    def status(self):
+        return f"{self.packets:,} datagrams, {self.sent_bytes:,} B, dropped {self.dropped}"
+
+
+def open_endpoint(url, timeout=1):
+    """Opens a network endpoint URL, or returns None for anything else (serial ports, pyserial URLs).
+
+    tcp-server://[HOST]:PORT[?buffer=BYTES]   TcpFanoutServer (output)
+    udp://HOST:PORT[?size=BYTES&linger_ms=MS] UdpSink (output)
+    tcp://HOST:PORT                           TCP client, as pyserial socket:// (input or output)
+    """
+    scheme = url.partition("://")[0].lower() if "://" in url else ""
+    if scheme not in ("tcp-server", "udp", "tcp"):
+        return None
+    parts = urlsplit(url)
+    if parts.port is None:
+        raise serial.SerialException(f"{url}: missing port number")
+    options = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+    if scheme == "tcp-server":
+        return TcpFanoutServer(parts.hostname or "", parts.port, int(options.get("buffer", CLIENT_BUFFER)))
+    if scheme == "udp":
+        if not parts.hostname:
+            raise serial.SerialException(f"{url}: missing host")
+        return UdpSink(parts.hostname, parts.port, int(options.get("size", UDP_DATAGRAM)),
+                       float(options.get("linger_ms", 20)) / 1000)
+    return serial.serial_for_url(f"socket://{parts.hostname}:{parts.port}", timeout=timeout)
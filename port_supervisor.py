@@ -0,0 +1,292 @@
+import os
+import threading
+import time
+
+import serial
+
+try:
+    from serial.tools import list_ports
+except ImportError:  # stripped-down pyserial builds
+    list_ports = None
+
+USB_PREFIX = "usb:"
+
+
+def parse_usb_spec(spec):
+    """Parses usb:VID:PID[:SERIAL] (hex ids, * for any) into (vid, pid, serial_number)."""
+    parts = spec[len(USB_PREFIX):].split(":", 2)
+    if len(parts) < 2:
+        raise ValueError(f"expected usb:VID:PID[:SERIAL], got {spec!r}")
+    vid, pid = (None if p in ("", "*") else int(p, 16) for p in parts[:2])
+    serial_number = parts[2] if len(parts) > 2 and parts[2] not in ("", "*") else None
+    return vid, pid, serial_number
+
+
+def _same_device(a, b):
+    return a == b or os.path.realpath(a) == os.path.realpath(b)
+
+
+def identify(device):
+    """(vid, pid, serial_number) of a USB serial port by device name, or None for other ports."""
+    if list_ports is None:
+        return None
+    for info in list_ports.comports():
+        if info.vid is not None and _same_device(info.device, device):
+            return info.vid, info.pid, info.serial_number
+    return None
+
+
+def find_port(vid=None, pid=None, serial_number=None, prefer=None):
+    """Device name of the USB serial port matching the given ids, or None.
+
+    A serial number picks out one adapter among identical ones; without it the
+    first match wins, preferring `prefer` (the name the port had last time).
+    """
+    if list_ports is None:
+        return None
+    matches = []
+    for info in list_ports.comports():
+        if info.vid is None:
+            continue
+        if vid is not None and info.vid != vid or pid is not None and info.pid != pid:
+            continue
+        if serial_number is not None and (info.serial_number or "").casefold() != serial_number.casefold():
+            continue
+        matches.append(info.device)
+    if prefer in matches:
+        return prefer
+    return matches[0] if matches else None
+
+
+def resolve_port(spec, identity=None, prefer=None):
+    """Device or URL to open for spec.
+
+    usb:VID:PID[:SERIAL] is looked up among the attached adapters. For a plain
+    port name, identity (from identify()) finds the same adapter again after it
+    re-enumerated under another name; if it is not attached the name is used as is.
+    """
+    if spec.lower().startswith(USB_PREFIX):
+        device = find_port(*parse_usb_spec(spec), prefer=prefer)
+        if device is None:
+            raise serial.SerialException(f"no USB serial port matches {spec}")
+        return device
+    if identity:
+        device = find_port(*identity, prefer=spec)
+        if device:
+            return device
+    return spec
+
+
+class Backoff:
+    """Exponential retry delays: initial, initial*factor, ... capped at maximum."""
+
+    def __init__(self, initial=0.5, maximum=30.0, factor=2.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.delay = initial
+
+    def next(self):
+        delay = self.delay
+        self.delay = min(self.delay * self.factor, self.maximum)
+        return delay
+
+    def reset(self):
+        self.delay = self.initial
+
+
+class ErrorLimiter:
+    """Rate-limits repeated error messages.
+
+    report(msg, key) emits the first message for a key, then at most one per
+    interval seconds; the next one that gets through says how many were
+    suppressed in between. key defaults to the message itself.
+    """
+
+    def __init__(self, emit, interval=5.0):
+        self.emit = emit
+        self.interval = interval
+        self.suppressed = 0
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def report(self, msg, key=None):
+        key = msg if key is None else key
+        now = time.monotonic()
+        with self._lock:
+            last, skipped = self._last.get(key, (None, 0))
+            if last is not None and now - last < self.interval:
+                self._last[key] = (last, skipped + 1)
+                self.suppressed += 1
+                return False
+            self._last[key] = (now, 0)
+        if skipped:
+            msg = f"{msg} ({skipped} similar suppressed)"
+        self.emit(msg)
+        return True
+
+    def reset(self):
+        with self._lock:
+            self._last.clear()
+            self.suppressed = 0
+
+
+class PortSupervisor:
+    """Opens one serial port and reopens it with exponential backoff after it is lost.
+
+    The owner keeps using its own port object: open() returns it, and when a
+    read or write fails with a SerialException/OSError the owner calls
+    lost_port() and then either reopen() (blocks, for reader threads) or
+    try_reopen() once due() (non-blocking, for a writer that keeps draining
+    meanwhile). A port
+    given by name is remembered by USB VID/PID/serial number, so an adapter
+    that comes back under another name (COM5 -> COM7, ttyUSB0 -> ttyUSB1) is
+    found again.
+
+    open_fn(device, baud) opens the port; report(msg, key) is an
+    ErrorLimiter.report, so a port that stays away does not flood the log.
+
+    Outage statistics: outages, reconnects, outage_s() (including a current
+    outage) and lost, a line count the owner adds to for data it had to drop.
+    """
+
+    def __init__(self, name, open_fn, report, backoff=None):
+        self.name = name
+        self.open_fn = open_fn
+        self.report = report
+        self.backoff = backoff or Backoff()
+        self.auto = True
+
+        self.spec = None
+        self.baud = None
+        self.device = None
+        self.identity = None
+        self.wanted = False
+        self.down_since = None
+        self.next_try = 0.0
+        self._wake = threading.Event()
+
+        self.outages = 0
+        self.reconnects = 0
+        self.lost = 0
+        self._outage_total = 0.0
+
+    def open(self, spec, baud):
+        device = resolve_port(spec)
+        port = self.open_fn(device, baud)
+        self.spec, self.baud, self.device = spec, baud, device
+        self.identity = identify(device)
+        self.wanted = True
+        self.down_since = None
+        self._wake.clear()
+        return port
+
+    def close(self, port):
+        """Deliberate disconnect: closes port and stops any reconnect attempts."""
+        self.wanted = False
+        self._wake.set()
+        self._end_outage()
+        if port and port.is_open:
+            port.close()
+
+    def wake(self):
+        """Cuts short a reopen() wait, e.g. when the owner is stopping."""
+        self._wake.set()
+
+    @property
+    def down(self):
+        return self.down_since is not None
+
+    def recoverable(self, error):
+        """True if error looks like a lost port that reopening can fix."""
+        return self.auto and self.wanted and self.spec is not None and isinstance(error, (serial.SerialException, OSError))
+
+    def port_failed(self, error):
+        """True if error is a failed read/write on the port itself, whether or not it will be reopened.
+
+        pyserial leaves is_open set on a port whose device went away, so an
+        owner that gets such an error without recoverable() has to close the
+        port and stop instead of reading it again.
+        """
+        return isinstance(error, (serial.SerialException, OSError))
+
+    def lost_port(self, port, error):
+        """Starts an outage after a failed read/write on port and closes it."""
+        if self.down_since is None:
+            self.down_since = time.monotonic()
+            self.outages += 1
+            self.backoff.reset()
+            self.next_try = self.down_since + self.backoff.next()
+            self._wake.clear()
+            self.report(f"[ERROR] {self.name} port {self.spec} lost: {error}; reconnecting", f"{self.name}-lost")
+        try:
+            port.close()
+        except Exception:
+            pass
+
+    def due(self):
+        return self.down and time.monotonic() >= self.next_try
+
+    def try_reopen(self):
+        """One reconnect attempt; returns the new port, or None and schedules the next attempt."""
+        try:
+            device = resolve_port(self.spec, self.identity, prefer=self.device)
+            port = self.open_fn(device, self.baud)
+        except Exception as e:
+            delay = self.backoff.next()
+            self.next_try = time.monotonic() + delay
+            self.report(f"[WARN] {self.name} port {self.spec} unavailable ({e}); next retry in {delay:.1f}s",
+                        f"{self.name}-retry")
+            return None
+        outage = self._end_outage()
+        self.device = device
+        self.reconnects += 1
+        self.report(f"[INFO] {self.name} port reconnected on {device} after {outage:.1f}s", f"{self.name}-up")
+        return port
+
+    def reopen(self, should_run):
+        """Retries until the port is back; None if should_run() turns false or close() is called first."""
+        while should_run() and self.wanted:
+            wait = self.next_try - time.monotonic()
+            if wait > 0:
+                self._wake.wait(wait)
+                continue
+            port = self.try_reopen()
+            if port:
+                return port
+        return None
+
+    def _end_outage(self):
+        if self.down_since is None:
+            return 0.0
+        outage = time.monotonic() - self.down_since
+        self._outage_total += outage
+        self.down_since = None
+        return outage
+
+    def outage_s(self):
+        current = time.monotonic() - self.down_since if self.down_since is not None else 0.0
+        return self._outage_total + current
+
+    def reset_stats(self):
+        self.outages = 0
+        self.reconnects = 0
+        self.lost = 0
+        self._outage_total = 0.0
+
+    def snapshot(self):
+        return {
+            "state": "down" if self.down else ("up" if self.wanted else "closed"),
+            "outages": self.outages,
+            "reconnects": self.reconnects,
+            "outage_s": round(self.outage_s(), 1),
+            "lost": self.lost,
+        }
+
+
+def format_snapshot(snapshot):
+    """One-line display form of PortSupervisor.snapshot()."""
+    text = f"{snapshot['state']}, {snapshot['outages']} outage(s), {snapshot['outage_s']:.1f}s down"
+    if snapshot["lost"]:
+        text += f", {snapshot['lost']} lines lost"
+    return text
@@ -0,0 +1,665 @@
+import argparse
+import collections
+import itertools
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+
+import serial
+
+from binary_recorder import BinaryRecorder
+from csv_recorder import CsvRecorder
+from forward_buffer import BLOCK, DECIMATE, POLICIES, ForwardBuffer, format_snapshot
+from forward_filters import format_snapshot as format_filters
+from forward_filters import parse_pipeline
+from frame_codec import FrameDecoder, batch_lines, to_ascii
+from latency import LatencyTracker
+from line_parser import TIME_OK, parse_chunk, split_lines
+from net_endpoints import open_endpoint
+from port_supervisor import ErrorLimiter, PortSupervisor
+from port_supervisor import format_snapshot as format_link
+from profiling import add_profile_arguments, counter, finish_profile, profiler_from_args
+from profiling import format_snapshot as format_counters
+from profiling import snapshot as counter_snapshot
+from segment_log import COMPRESSIONS, RotationPolicy, parse_interval, parse_size
+from seq_tracker import SeqTracker
+from seq_tracker import format_snapshot as format_seq
+
+CSV_HEADER = ["Local Timestamp", "Sensor", "Stress", "Raw Time"]
+COMBINED_CSV_HEADER = CSV_HEADER + ["Forwarded"]
+CHUNK_SIZE = 4096
+# Most queued lines/chunks joined into one write to the output port
+WRITE_BATCH = 512
+
+_SENSOR = re.compile(rb"SENSOR=(-?\d+)")
+
+# Always-on hot-path counters (see profiling.py)
+_READ = counter("serial_read")
+_PARSE = counter("parse")
+_DECODE = counter("frame_decode")
+_WRITE = counter("serial_write")
+_RECORD = counter("record")
+
+# Latency stages, all measured from read completion except sender_to_read,
+# which compares the sender's TIME field (epoch ms) with the wall clock at read.
+LATENCY_STAGES = ("sender_to_read", "read_to_forward", "read_to_parse", "read_to_record")
+
+
+def parse_serial_line(line: str):
+    """Parses serial line into (sensor, stress, time)"""
+    try:
+        fields = dict(part.split('=') for part in line.split(';') if '=' in part)
+        sensor = fields.get("SENSOR", "N/A")
+        stress = fields.get("STRESS", "N/A")
+        timestamp = fields.get("TIME", "N/A")
+        return sensor, stress, timestamp
+    except Exception:
+        return "N/A", "N/A", "N/A"
+
+
+def open_serial(port, baud, timeout=1):
+    """Opens a serial port by name or pyserial URL (loop://, socket://, ...), or a network endpoint (see net_endpoints)"""
+    endpoint = open_endpoint(port, timeout)
+    if endpoint is not None:
+        return endpoint
+    return serial.serial_for_url(port, baudrate=baud, timeout=timeout)
+
+
+class ProxyEngine:
+    """Headless serial forwarder: reads lines from the input port and writes them to the output port.
+
+    The worker thread blocks in readline() (bounded by the port timeout), so an idle
+    link costs no CPU. Front-ends hook in through the on_input/on_forward/on_error
+    callbacks, which are called from a worker thread.
+
+    Reading and writing run on separate threads joined by a ForwardBuffer of
+    buffer_size lines (chunks in transparent/binary mode), so a slow output port
+    never stalls the input. overflow picks what happens when it fills up (see
+    forward_buffer.POLICIES); forward_buffer.snapshot() has the live counters.
+
+    In transparent mode the reader forwards byte chunks as soon as they arrive,
+    unmodified, and hands a copy to a consumer thread that does the line
+    splitting, parsing, logging and CSV recording off the forwarding path.
+
+    With binary=True the input carries frame_codec frames. They are read in
+    chunks as in transparent mode and forwarded unchanged, or, with
+    translate=True, decoded on the reader thread and forwarded as ASCII lines.
+    Logging and CSV recording see the decoded samples either way.
+
+    A lost input or output port (USB adapter unplugged, driver glitch) is
+    reopened with exponential backoff by input_link/output_link (see
+    port_supervisor) instead of failing every read; with input_link.auto off a
+    lost input is closed and the proxy stops, and with output_link.auto off a
+    lost output is closed and what was still queued for it is counted in
+    output_link.lost. While the output is down
+    the writer moves queued data into a hold buffer of outage_size lines
+    (oldest dropped first, counted in output_link.lost) and flushes it once the
+    port is back. Repeated errors are rate-limited through errors.
+
+    pipeline (a forward_filters.Pipeline) filters and rewrites what is
+    forwarded: lines are then parsed before forwarding, and recorded with
+    Forwarded = 0 when no stage let them through. It needs line mode or
+    binary+translate; transparent chunks are forwarded as they are.
+
+    stats, if set to a sensor_stats.SensorStats, is fed every parsed batch.
+
+    latency holds per-stage histograms (microseconds) fed from monotonic
+    timestamps taken at read completion, forward write, parse and CSV enqueue.
+    """
+
+    def __init__(self, on_input=None, on_forward=None, on_error=None, transparent=False, binary=False, translate=False,
+                 buffer_size=10000, overflow=BLOCK, decimate=4, outage_size=50000, pipeline=None):
+        self.on_input = on_input
+        self.on_forward = on_forward
+        self.on_error = on_error
+        self.transparent = transparent
+        self.binary = binary
+        self.translate = translate
+        self.decoder = FrameDecoder()
+        self._reported_drops = 0
+        self.buffer_size = buffer_size
+        self.overflow = overflow
+        self.decimate = decimate
+        self.pipeline = pipeline
+        self.forward_buffer = ForwardBuffer(buffer_size, overflow, decimate)
+        self.outage_size = outage_size
+        self.held = collections.deque()
+        self.held_lines = 0
+
+        self.errors = ErrorLimiter(lambda msg: self._emit(self.on_error, msg))
+        self.input_link = PortSupervisor("Input", open_serial, self.errors.report)
+        self.output_link = PortSupervisor("Output", open_serial, self.errors.report)
+
+        self.input_ser = None
+        self.output_ser = None
+        self.running = False
+        self.thread = None
+        self.writer_thread = None
+        self.consumer_thread = None
+        self.rx_queue = queue.Queue()
+        self.latency = LatencyTracker(LATENCY_STAGES)
+        self.stats = None
+        self.sequence = SeqTracker()
+
+        self.input_recorder = None
+        self.forwarded_recorder = None
+        self.combined_recorder = None
+        self.binary_recorder = None
+
+    # === Ports ===
+    def connect_input(self, port, baud):
+        """Opens the input by name, pyserial URL, usb:VID:PID[:SERIAL] or tcp://HOST:PORT."""
+        ser = self.input_link.open(port, baud)
+        if not ser.readable():
+            self.input_link.close(ser)
+            raise ValueError(f"{port} is output-only")
+        self.input_ser = ser
+        return ser
+
+    def connect_output(self, port, baud):
+        self.output_ser = self.output_link.open(port, baud)
+        return self.output_ser
+
+    def disconnect_input(self):
+        self.input_link.close(self.input_ser)
+
+    def disconnect_output(self):
+        self.output_link.close(self.output_ser)
+
+    def input_connected(self):
+        return bool(self.input_ser and self.input_ser.is_open)
+
+    def output_connected(self):
+        return bool(self.output_ser and self.output_ser.is_open)
+
+    def output_accepting(self):
+        """True while forwarded data has somewhere to go: the output is open or being reconnected."""
+        return self.output_connected() or self.output_link.down
+
+    def reconnect_input(self, error):
+        """Reopens a lost input port; False if it is gone for good or the proxy is stopping."""
+        self.input_link.lost_port(self.input_ser, error)
+        port = self.input_link.reopen(lambda: self.running)
+        if port is None:
+            return False
+        self.input_ser = port
+        return True
+
+    # === CSV ===
+    def open_csv(self, input_path=None, forwarded_path=None, combined_path=None, fsync=False, rotation=None):
+        """Starts background CSV recording.
+
+        combined_path writes a single file with a Forwarded column instead of the
+        separate input/forwarded files, whose rows are otherwise identical. With
+        a segment_log.RotationPolicy each path names a rolling log of segments.
+        """
+        if combined_path:
+            self.combined_recorder = CsvRecorder(combined_path, COMBINED_CSV_HEADER, fsync=fsync, rotation=rotation)
+            return
+        if input_path:
+            self.input_recorder = CsvRecorder(input_path, CSV_HEADER, fsync=fsync, rotation=rotation)
+        if forwarded_path:
+            self.forwarded_recorder = CsvRecorder(forwarded_path, CSV_HEADER, fsync=fsync, rotation=rotation)
+
+    def open_binary(self, path, fsync=False):
+        """Starts recording to an append-only binary file (see binary_recorder) instead of CSV."""
+        self.binary_recorder = BinaryRecorder(path, fsync=fsync)
+
+    def close_csv(self):
+        """Closes every recorder, CSV and binary."""
+        for recorder in (self.input_recorder, self.forwarded_recorder, self.combined_recorder, self.binary_recorder):
+            if recorder:
+                recorder.close()
+                if recorder.error:
+                    self._emit(self.on_error, f"[ERROR] CSV write failed ({recorder.path}): {recorder.error}")
+        self.input_recorder = None
+        self.forwarded_recorder = None
+        self.combined_recorder = None
+        self.binary_recorder = None
+
+    # === Run control ===
+    def start(self):
+        if self.running:
+            return
+        if self.pipeline and (self.transparent or self.binary) and not self.translate:
+            raise ValueError("Forwarding filters need line mode or translated binary frames, not raw chunks")
+        self.running = True
+        self.forward_buffer = ForwardBuffer(self.buffer_size, self.overflow, self.decimate)
+        self.held.clear()
+        self.held_lines = 0
+        self.errors.reset()
+        self.sequence.reset()
+        self.writer_thread = threading.Thread(target=self.writer_loop, daemon=True)
+        self.writer_thread.start()
+        if self.transparent or self.binary:
+            self.decoder = FrameDecoder()
+            self._reported_drops = 0
+            self.rx_queue = queue.Queue()
+            self.consumer_thread = threading.Thread(target=self.consumer_loop, daemon=True)
+            self.consumer_thread.start()
+            self.thread = threading.Thread(target=self.transparent_loop, daemon=True)
+        else:
+            self.thread = threading.Thread(target=self.proxy_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2.0):
+        self.running = False
+        self.input_link.wake()
+        # Wake a readline() that is blocked waiting for data
+        cancel_read = getattr(self.input_ser, "cancel_read", None)
+        if cancel_read and self.input_connected():
+            try:
+                cancel_read()
+            except Exception:
+                pass
+        # Closing the buffer releases a reader blocked on a full buffer; the writer drains what is queued
+        self.forward_buffer.close()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        self.thread = None
+        if self.writer_thread:
+            self.writer_thread.join(timeout)
+            self.writer_thread = None
+        if self.consumer_thread:
+            self.rx_queue.put(None)
+            self.consumer_thread.join(timeout)
+            self.consumer_thread = None
+        self.close_csv()
+
+    def _emit(self, callback, msg):
+        if callback:
+            callback(msg)
+
+    def record_line(self, raw_line, fields, forwarded):
+        """Logs and records one line; fields is (sensor, stress, time) from the parser."""
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        row = [now, *fields]
+
+        self._emit(self.on_input, f"Received: {raw_line}")
+        if self.combined_recorder:
+            self.combined_recorder.record(row + [1 if forwarded else 0])
+        if self.input_recorder:
+            self.input_recorder.record(row)
+
+        if forwarded:
+            self._emit(self.on_forward, f"Forwarded: {raw_line}")
+            if self.forwarded_recorder:
+                self.forwarded_recorder.record(row)
+
+    def record_chunk(self, complete, forwarded, read_ns, read_wall_ms, batch=None):
+        """Parses (unless already parsed into batch), logs and records the complete lines of one read."""
+        if batch is None:
+            t0 = time.perf_counter_ns()
+            batch = parse_chunk(complete)
+            _PARSE.add(len(complete), t0)
+            self.latency.record_ns("read_to_parse", time.monotonic_ns() - read_ns)
+        self.record_batch(batch, split_lines(complete), forwarded, read_ns, read_wall_ms)
+
+    def record_batch(self, batch, raw_lines, forwarded, read_ns, read_wall_ms):
+        """Logs and records parsed rows; raw_lines are the matching lines as bytes.
+
+        forwarded is one bool for all rows, or a list with one per row.
+        """
+        t0 = time.perf_counter_ns()
+        latency = self.latency
+        if self.stats:
+            self.stats.add_batch(batch)
+        self.sequence.add_batch(batch)
+        if self.binary_recorder:
+            self.binary_recorder.record_batch(read_wall_ms, batch, forwarded)
+        for i in range(len(batch)):
+            if batch.flags[i] & TIME_OK:
+                latency.record_us("sender_to_read", (read_wall_ms - batch.times[i]) * 1000)
+        per_row = forwarded if isinstance(forwarded, list) else itertools.repeat(forwarded)
+        for i, (raw, fwd) in enumerate(zip(raw_lines, per_row)):
+            self.record_line(raw.decode(errors='ignore'), batch.csv_fields(i), fwd)
+        latency.record_ns("read_to_record", time.monotonic_ns() - read_ns)
+        _RECORD.add(0, t0)
+
+    def record_frames(self, batch, forwarded, read_ns, read_wall_ms):
+        """record_batch() for decoded binary frames; also reports newly dropped frames."""
+        dropped = self.decoder.dropped()
+        if dropped != self._reported_drops:
+            self._emit(self.on_error, f"[WARN] Dropped {dropped - self._reported_drops} corrupt binary frame(s) "
+                                      f"(total {dropped}, CRC {self.decoder.crc_errors})")
+            self._reported_drops = dropped
+        if len(batch):
+            self.record_batch(batch, batch_lines(batch), forwarded, read_ns, read_wall_ms)
+
+    def proxy_loop(self):
+        while self.running:
+            try:
+                t0 = time.perf_counter_ns()
+                raw = self.input_ser.readline()
+                _READ.add(len(raw), t0)
+                if not raw:
+                    continue
+                read_ns = time.monotonic_ns()
+                read_wall_ms = time.time_ns() // 1_000_000
+                raw_line = raw.decode(errors='ignore').strip()
+                forwarded = self.output_accepting()
+                batch = None
+                if forwarded:
+                    data = (raw_line + "\n").encode()
+                    if self.pipeline:
+                        # Stages work on the parsed fields, so the line is parsed before forwarding
+                        t0 = time.perf_counter_ns()
+                        batch = parse_chunk(raw)
+                        _PARSE.add(len(raw), t0)
+                        self.latency.record_ns("read_to_parse", time.monotonic_ns() - read_ns)
+                        data, _ = self.pipeline.apply(batch, split_lines(raw))
+                    sensor = None
+                    if self.overflow == DECIMATE:
+                        m = _SENSOR.search(data)
+                        sensor = int(m.group(1)) if m else None
+                    forwarded = bool(data) and self.forward_buffer.put(data, sensor, read_ns)
+                if raw_line:
+                    self.record_chunk(raw, forwarded, read_ns, read_wall_ms, batch)
+            except Exception as e:
+                if self.running and self.input_link.recoverable(e):
+                    if self.reconnect_input(e):
+                        continue
+                    break
+                if not self.running or not self.input_connected():
+                    break
+                if self.input_link.port_failed(e):
+                    self.errors.report(f"[ERROR] Input port lost: {e}", "input-lost")
+                    self.disconnect_input()
+                    break
+                self.errors.report(f"[ERROR] Proxy error: {e}", "proxy")
+        self.running = False
+
+    def transparent_loop(self):
+        buf = bytearray(CHUNK_SIZE)
+        view = memoryview(buf)
+        sep = b"\0" if self.binary and not self.translate else b"\n"
+        # A policy that may drop items needs them to end on a line/frame boundary,
+        # so a drop never leaves half a line in the output
+        aligned = self.overflow != BLOCK and not self.translate
+        carry = b""
+        while self.running:
+            try:
+                # Block for the first byte, then take whatever else is already waiting
+                t0 = time.perf_counter_ns()
+                want = min(max(1, self.input_ser.in_waiting), CHUNK_SIZE)
+                n = self.input_ser.readinto(view[:want])
+                _READ.add(n or 0, t0)
+                if not n:
+                    continue
+                read_ns = time.monotonic_ns()
+                forwarded = self.output_accepting()
+                passed = None
+                if self.translate:
+                    # Decoded here because the ASCII form is what gets forwarded
+                    t0 = time.perf_counter_ns()
+                    item = self.decoder.feed(bytes(view[:n]))
+                    _DECODE.add(n, t0)
+                    self.latency.record_ns("read_to_parse", time.monotonic_ns() - read_ns)
+                    if self.pipeline:
+                        out, passed = self.pipeline.apply(item, batch_lines(item))
+                    else:
+                        out = to_ascii(item)
+                else:
+                    item = bytes(view[:n])
+                    out = view[:n]
+                if aligned:
+                    data = carry + out
+                    end = data.rfind(sep) + 1
+                    carry = data[end:]
+                    out = data[:end]
+                if forwarded and out:
+                    out = bytes(out)
+                    forwarded = self.forward_buffer.put(out, None, read_ns, max(1, out.count(sep)))
+                    if forwarded and passed is not None:
+                        forwarded = passed  # per row: the ones the stages dropped were not forwarded
+                elif self.translate:
+                    forwarded = False
+                self.rx_queue.put((item, forwarded, read_ns, time.time_ns() // 1_000_000))
+            except Exception as e:
+                if self.running and self.input_link.recoverable(e):
+                    # A partial line from before the outage would be glued to the first one after it
+                    carry = b""
+                    if self.reconnect_input(e):
+                        continue
+                    break
+                if not self.running or not self.input_connected():
+                    break
+                if self.input_link.port_failed(e):
+                    self.errors.report(f"[ERROR] Input port lost: {e}", "input-lost")
+                    self.disconnect_input()
+                    break
+                self.errors.report(f"[ERROR] Proxy error: {e}", "proxy")
+        self.running = False
+
+    def write_batch(self, batch):
+        t0 = time.perf_counter_ns()
+        data = b"".join(item[0] for item in batch)
+        self.output_ser.write(data)
+        _WRITE.add(len(data), t0)
+        now = time.monotonic_ns()
+        for _, read_ns, _ in batch:
+            self.latency.record_ns("read_to_forward", now - read_ns)
+
+    def hold(self, batch):
+        """Keeps batch for after the output outage, dropping the oldest held items beyond outage_size lines."""
+        held = self.held
+        held.extend(batch)
+        self.held_lines += sum(item[2] for item in batch)
+        while self.held_lines > self.outage_size and len(held) > 1:
+            self.held_lines -= held[0][2]
+            self.output_link.lost += held.popleft()[2]
+
+    def flush_held(self):
+        """Writes what was held during the outage; returns False (keeping it) if the output fails again."""
+        held = self.held
+        while held:
+            batch = [held.popleft() for _ in range(min(WRITE_BATCH, len(held)))]
+            try:
+                self.write_batch(batch)
+            except Exception as e:
+                held.extendleft(reversed(batch))
+                if not self.output_link.recoverable(e):
+                    raise
+                self.output_link.lost_port(self.output_ser, e)
+                return False
+            self.held_lines -= sum(item[2] for item in batch)
+        return True
+
+    def writer_loop(self):
+        buf = self.forward_buffer
+        link = self.output_link
+        while True:
+            batch = buf.get_batch(WRITE_BATCH)
+            if link.down:
+                # Keep draining so the reader is not held up, and retry the port on schedule
+                self.hold(batch)
+                if link.due():
+                    port = link.try_reopen()
+                    if port:
+                        self.output_ser = port
+                        try:
+                            self.flush_held()
+                        except Exception as e:
+                            self.errors.report(f"[ERROR] Forward error: {e}", "forward")
+                if not batch and buf.closed:
+                    break
+                continue
+            if not batch:
+                if buf.closed:
+                    break
+                continue
+            try:
+                if self.output_connected():
+                    if self.held and not self.flush_held():
+                        self.hold(batch)
+                        continue
+                    self.write_batch(batch)
+                else:
+                    # Queued before the output was closed; it has nowhere to go now
+                    link.lost += sum(item[2] for item in batch)
+                    if self.held:
+                        self.drop_held()
+            except Exception as e:
+                if link.recoverable(e):
+                    link.lost_port(self.output_ser, e)
+                    self.hold(batch)
+                    continue
+                if not self.output_connected():
+                    link.lost += sum(item[2] for item in batch)
+                    continue
+                if link.port_failed(e):
+                    self.errors.report(f"[ERROR] Output port lost: {e}", "output-lost")
+                    self.disconnect_output()
+                    link.lost += sum(item[2] for item in batch)
+                    self.drop_held()
+                    continue
+                self.errors.report(f"[ERROR] Forward error: {e}", "forward")
+        self.drop_held()
+
+    def drop_held(self):
+        if self.held_lines:
+            self.output_link.lost += self.held_lines
+            self._emit(self.on_error, f"[WARN] Discarded {self.held_lines} lines held for the lost output port")
+        self.held.clear()
+        self.held_lines = 0
+
+    def consumer_loop(self):
+        pending = bytearray()
+        while True:
+            item = self.rx_queue.get()
+            if item is None:
+                break
+            chunk, forwarded, read_ns, read_wall_ms = item
+            if self.binary:
+                try:
+                    if self.translate:
+                        batch = chunk
+                    else:
+                        t0 = time.perf_counter_ns()
+                        batch = self.decoder.feed(chunk)
+                        _DECODE.add(len(chunk), t0)
+                        self.latency.record_ns("read_to_parse", time.monotonic_ns() - read_ns)
+                    self.record_frames(batch, forwarded, read_ns, read_wall_ms)
+                except Exception as e:
+                    self._emit(self.on_error, f"[ERROR] Record error: {e}")
+                continue
+            pending += chunk
+            end = pending.rfind(b"\n") + 1
+            if not end:
+                continue
+            complete = bytes(pending[:end])
+            del pending[:end]
+            try:
+                self.record_chunk(complete, forwarded, read_ns, read_wall_ms)
+            except Exception as e:
+                self._emit(self.on_error, f"[ERROR] Record error: {e}")
+
+
+def print_stats(engine):
+    print(f"[STATS] Forward buffer: {format_snapshot(engine.forward_buffer.snapshot())}")
+    if engine.pipeline:
+        print(f"[STATS] Filters: {format_filters(engine.pipeline.snapshot())}")
+    status = getattr(engine.output_ser, "status", None)
+    if status:
+        print(f"[STATS] Network output: {status()}")
+    sequence = engine.sequence.snapshot()
+    if sequence["received"]:
+        print(f"[STATS] Sequence: {format_seq(sequence)}")
+    print(f"[STATS] Hot path: {format_counters(counter_snapshot())}")
+    print(f"[STATS] Input: {format_link(engine.input_link.snapshot())}; "
+          f"output: {format_link(engine.output_link.snapshot())}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless serial proxy (no display required)")
+    parser.add_argument("--input", required=True,
+                        help="Input port, pyserial URL or usb:VID:PID[:SERIAL] (e.g., COM5, usb:0403:6001, tcp://10.0.0.7:4000)")
+    parser.add_argument("--output", required=True,
+                        help="Output port, pyserial URL or network endpoint (e.g., COM9, tcp-server://:5000, udp://10.0.0.5:5001)")
+    parser.add_argument("--input-baud", type=int, default=9600)
+    parser.add_argument("--output-baud", type=int, default=9600)
+    parser.add_argument("--input-csv", help="Path of the input CSV log")
+    parser.add_argument("--forwarded-csv", help="Path of the forwarded CSV log")
+    parser.add_argument("--csv", help="Single CSV log with a Forwarded column (replaces --input-csv/--forwarded-csv)")
+    parser.add_argument("--record", help="Record to this append-only binary file instead of CSV (see binary_recorder.py)")
+    parser.add_argument("--fsync", action="store_true", help="fsync each CSV batch or binary chunk to disk")
+    parser.add_argument("--roll-size", help="Start a new CSV segment at this size (e.g. 100M); see segment_log.py")
+    parser.add_argument("--roll-interval", help="Start a new CSV segment every interval of wall-clock time (e.g. 1h)")
+    parser.add_argument("--compress", choices=list(COMPRESSIONS), default="gzip",
+                        help="Compression of closed CSV segments")
+    parser.add_argument("--transparent", action="store_true",
+                        help="Forward raw byte chunks unmodified; parse/log/record on a separate thread")
+    parser.add_argument("--binary", action="store_true", help="Input carries binary frames (COBS + CRC) instead of ASCII lines")
+    parser.add_argument("--translate", action="store_true", help="With --binary, forward the decoded samples as ASCII lines")
+    parser.add_argument("--buffer", type=int, default=10000, help="Forward buffer size in lines (chunks in transparent/binary mode)")
+    parser.add_argument("--overflow", choices=POLICIES, default=BLOCK, help="What to do when the forward buffer is full")
+    parser.add_argument("--decimate", type=int, default=4, help="With --overflow decimate, keep 1 in N lines per sensor")
+    parser.add_argument("--outage-buffer", type=int, default=50000,
+                        help="Lines held while the output port is being reconnected")
+    parser.add_argument("--no-reconnect", action="store_true", help="Stop instead of reconnecting a lost port")
+    parser.add_argument("--filter", help='Forwarding filter stages, e.g. "sensors:1,2 | deadband:0.5 | decimate:4"')
+    parser.add_argument("--latency-json", help="Periodically write per-stage latency percentiles to this JSON file")
+    parser.add_argument("--latency-interval", type=float, default=10.0, help="Seconds between latency JSON dumps")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="Seconds between forward buffer and port reports (0 = off)")
+    parser.add_argument("--quiet", action="store_true", help="Do not echo lines to stdout")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.translate and not args.binary:
+        parser.error("--translate requires --binary")
+    pipeline = None
+    if args.filter:
+        if (args.transparent or args.binary) and not args.translate:
+            parser.error("--filter needs line mode or --binary --translate")
+        try:
+            pipeline = parse_pipeline(args.filter)
+        except ValueError as e:
+            parser.error(str(e))
+    try:
+        rotation = RotationPolicy(parse_size(args.roll_size), parse_interval(args.roll_interval), args.compress)
+    except ValueError as e:
+        parser.error(str(e))
+    if rotation and args.record:
+        parser.error("--roll-size/--roll-interval apply to CSV logs, not --record")
+
+    echo = None if args.quiet else print
+    engine = ProxyEngine(on_input=echo, on_forward=echo, on_error=print, transparent=args.transparent,
+                         binary=args.binary, translate=args.translate,
+                         buffer_size=args.buffer, overflow=args.overflow, decimate=args.decimate,
+                         outage_size=args.outage_buffer, pipeline=pipeline)
+    engine.input_link.auto = engine.output_link.auto = not args.no_reconnect
+    engine.connect_input(args.input, args.input_baud)
+    engine.connect_output(args.output, args.output_baud)
+    if args.record:
+        engine.open_binary(args.record, fsync=args.fsync)
+    else:
+        engine.open_csv(args.input_csv, args.forwarded_csv, args.csv, fsync=args.fsync, rotation=rotation)
+    print(f"[INFO] Proxy {args.input} @ {args.input_baud} -> {args.output} @ {args.output_baud}. Ctrl+C to stop.")
+
+    if args.latency_json:
+        engine.latency.start_dump(args.latency_json, args.latency_interval)
+    profiler = profiler_from_args(args)
+    engine.start()
+    next_stats = time.monotonic() + args.stats_interval
+    try:
+        while engine.running:
+            engine.thread.join(0.5)
+            if args.stats_interval > 0 and time.monotonic() >= next_stats:
+                next_stats += args.stats_interval
+                print_stats(engine)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        finish_profile(profiler, args.profile)
+        print_stats(engine)
+        engine.latency.stop_dump()
+        engine.disconnect_input()
+        engine.disconnect_output()
+        print("[INFO] Proxy stopped.")
+
+
+if __name__ == "__main__":
+    main()
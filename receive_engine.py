@@ -0,0 +1,230 @@
+import argparse
+import threading
+import time
+
+from frame_codec import FrameDecoder, batch_lines
+from line_parser import parse_chunk, split_lines
+from port_supervisor import ErrorLimiter, PortSupervisor
+from port_supervisor import format_snapshot as format_link
+from profiling import add_profile_arguments, counter, finish_profile, profiler_from_args
+from profiling import format_snapshot as format_counters
+from profiling import snapshot as counter_snapshot
+from proxy_engine import open_serial
+from seq_tracker import SeqTracker
+from seq_tracker import format_snapshot as format_seq
+
+CHUNK_SIZE = 65536
+
+# Always-on hot-path counters (see profiling.py)
+_READ = counter("serial_read")
+_DECODE = counter("frame_decode")
+_DELIVER = counter("deliver")
+
+
+class ReceiveEngine:
+    """Headless serial receiver that drains the port and delivers lines in batches.
+
+    Each wakeup reads everything the port has buffered (up to chunk_size), splits
+    the complete lines in one pass and hands them to on_lines(lines) as a list of
+    stripped bytes. It only blocks (bounded by the port timeout) when the port is
+    empty. Totals are kept for rate reporting through rates().
+
+    With binary=True the stream is decoded as frame_codec frames instead; the
+    samples go to on_batch(batch) as a ParsedBatch, or to on_lines as their
+    ASCII form when no on_batch is given. total_lines then counts samples.
+
+    A lost port is reopened with backoff by link (see port_supervisor), or
+    closed and the loop stopped when link.auto is off; repeated errors are
+    rate-limited through errors.
+    """
+
+    def __init__(self, on_lines=None, on_error=None, chunk_size=CHUNK_SIZE, binary=False, on_batch=None):
+        self.on_lines = on_lines
+        self.on_error = on_error
+        self.on_batch = on_batch
+        self.chunk_size = chunk_size
+        self.binary = binary
+        self.decoder = FrameDecoder()
+        self.errors = ErrorLimiter(self._error)
+        self.link = PortSupervisor("Input", open_serial, self.errors.report)
+
+        self.ser = None
+        self.running = False
+        self.thread = None
+
+        self.total_lines = 0
+        self.total_bytes = 0
+        self._rate_mark = (time.monotonic(), 0, 0)
+
+    def connect(self, port, baud):
+        """Opens a port by name, pyserial URL, usb:VID:PID[:SERIAL] or tcp://HOST:PORT."""
+        ser = self.link.open(port, baud)
+        if not ser.readable():
+            self.link.close(ser)
+            raise ValueError(f"{port} is output-only")
+        self.ser = ser
+        return ser
+
+    def disconnect(self):
+        self.link.close(self.ser)
+
+    def connected(self):
+        return bool(self.ser and self.ser.is_open)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.decoder = FrameDecoder()
+        self.errors.reset()
+        self.thread = threading.Thread(target=self.read_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2.0):
+        self.running = False
+        self.link.wake()
+        cancel_read = getattr(self.ser, "cancel_read", None)
+        if cancel_read and self.connected():
+            try:
+                cancel_read()
+            except Exception:
+                pass
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        self.thread = None
+
+    def _error(self, msg):
+        if self.on_error:
+            self.on_error(msg)
+
+    def rates(self):
+        """(lines/s, bytes/s) since the previous call."""
+        now = time.monotonic()
+        then, lines, nbytes = self._rate_mark
+        self._rate_mark = (now, self.total_lines, self.total_bytes)
+        elapsed = max(now - then, 1e-9)
+        return (self.total_lines - lines) / elapsed, (self.total_bytes - nbytes) / elapsed
+
+    def handle_frames(self, data):
+        dropped = self.decoder.dropped()
+        t0 = time.perf_counter_ns()
+        batch = self.decoder.feed(data)
+        _DECODE.add(len(data), t0)
+        if self.decoder.dropped() != dropped and self.on_error:
+            self.on_error(f"[WARN] Dropped {self.decoder.dropped() - dropped} corrupt binary frame(s) "
+                          f"(total {self.decoder.dropped()})")
+        if not len(batch):
+            return
+        self.total_lines += len(batch)
+        t0 = time.perf_counter_ns()
+        if self.on_batch:
+            self.on_batch(batch)
+        elif self.on_lines:
+            self.on_lines(batch_lines(batch))
+        _DELIVER.add(len(data), t0)
+
+    def read_loop(self):
+        pending = bytearray()
+        while self.running:
+            try:
+                # Take everything buffered; wait for one byte only when the port is empty
+                t0 = time.perf_counter_ns()
+                waiting = self.ser.in_waiting
+                data = self.ser.read(min(waiting, self.chunk_size) if waiting else 1)
+                _READ.add(len(data), t0)
+                if not data:
+                    continue
+                self.total_bytes += len(data)
+                if self.binary:
+                    self.handle_frames(data)
+                    continue
+                pending += data
+                end = pending.rfind(b"\n") + 1
+                if not end:
+                    continue
+                lines = split_lines(bytes(pending[:end]))
+                del pending[:end]
+                self.total_lines += len(lines)
+                if lines and self.on_lines:
+                    t0 = time.perf_counter_ns()
+                    self.on_lines(lines)
+                    _DELIVER.add(end, t0)
+            except Exception as e:
+                if self.running and self.link.recoverable(e):
+                    self.link.lost_port(self.ser, e)
+                    port = self.link.reopen(lambda: self.running)
+                    if port is None:
+                        break
+                    self.ser = port
+                    pending.clear()
+                    continue
+                if not self.running or not self.connected():
+                    break
+                if self.link.port_failed(e):
+                    self.errors.report(f"[ERROR] Port lost: {e}", "lost")
+                    self.disconnect()
+                    break
+                self.errors.report(f"[ERROR] {e}", "read")
+        self.running = False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless serial receiver with throughput report")
+    parser.add_argument("--port", required=True,
+                        help="Port, pyserial URL or usb:VID:PID[:SERIAL] (e.g., COM9, usb:0403:6001, tcp://10.0.0.7:4000)")
+    parser.add_argument("--baud", type=int, default=9600)
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between rate reports")
+    parser.add_argument("--echo", action="store_true", help="Print every received line")
+    parser.add_argument("--binary", action="store_true", help="Decode binary frames (COBS + CRC) instead of ASCII lines")
+    parser.add_argument("--no-reconnect", action="store_true", help="Stop instead of reconnecting a lost port")
+    parser.add_argument("--seq", action="store_true",
+                        help="Track the sender's SEQ field and report missing/duplicate/reordered packets")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    sequence = SeqTracker() if args.seq else None
+
+    def echo(lines):
+        for line in lines:
+            print(line.decode(errors='ignore'))
+
+    def take_lines(lines):
+        if args.echo:
+            echo(lines)
+        sequence.add_batch(parse_chunk(b"\n".join(lines)))
+
+    def take_batch(batch):
+        sequence.add_batch(batch)
+        if args.echo:
+            echo(batch_lines(batch))
+
+    if sequence:
+        engine = ReceiveEngine(on_lines=take_lines, on_error=print, binary=args.binary, on_batch=take_batch)
+    else:
+        engine = ReceiveEngine(on_lines=echo if args.echo else None, on_error=print, binary=args.binary)
+    engine.link.auto = not args.no_reconnect
+    engine.connect(args.port, args.baud)
+    engine.start()
+    print(f"[INFO] Receiving on {args.port} @ {args.baud}. Ctrl+C to stop.")
+    profiler = profiler_from_args(args)
+    try:
+        while engine.running:
+            time.sleep(args.interval)
+            lines_per_s, bytes_per_s = engine.rates()
+            print(f"[RATE] {lines_per_s:,.0f} lines/s  {bytes_per_s:,.0f} B/s  (total {engine.total_lines:,} lines)")
+            if sequence:
+                print(f"[SEQ] {format_seq(sequence.snapshot())}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        finish_profile(profiler, args.profile)
+        print(f"[STATS] Hot path: {format_counters(counter_snapshot())}")
+        print(f"[STATS] Port: {format_link(engine.link.snapshot())}")
+        if sequence:
+            print(f"[STATS] Sequence: {format_seq(sequence.snapshot())}")
+        engine.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import argparse
+import re
+import selectors
+import threading
+import time
+
+import serial
+
+from port_supervisor import ErrorLimiter
+from proxy_engine import open_serial
+
+_SENSOR = re.compile(rb"SENSOR=(-?\d+)")
+
+
+class PortCounters:
+    """Throughput counters for one port."""
+
+    __slots__ = ("lines_in", "bytes_in", "lines_out", "bytes_out", "errors")
+
+    def __init__(self):
+        self.lines_in = 0
+        self.bytes_in = 0
+        self.lines_out = 0
+        self.bytes_out = 0
+        self.errors = 0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class RoutingProxy:
+    """Forwards lines from N named input ports to M named output ports.
+
+    routes maps a SENSOR id to the names of the outputs that receive its lines;
+    lines whose sensor has no route (or that carry no SENSOR field) go to the
+    default outputs (all outputs when default is None). Lines from one wakeup
+    are grouped so each output gets a single write().
+
+    On POSIX, every input that exposes fileno() is served by one selector loop
+    on a single thread. Inputs without a file descriptor (pyserial loop://,
+    Windows COM ports) each get a blocking reader thread instead; none of them
+    spin while idle. An input whose port fails (adapter unplugged) is closed
+    and no longer read; the other inputs keep going. Repeated errors are
+    rate-limited through errors.
+    """
+
+    def __init__(self, routes=None, default=None, on_error=None):
+        self.routes = {int(k): list(v) for k, v in (routes or {}).items()}
+        self.default = default
+        self.on_error = on_error
+        self.errors = ErrorLimiter(self._error)
+
+        self.inputs = {}
+        self.outputs = {}
+        self.counters = {}
+        self.running = False
+        self.threads = []
+        self.write_lock = threading.Lock()
+        self._pending = {}
+
+    # === Ports ===
+    def add_input(self, name, port, baud=9600):
+        return self.attach_input(name, open_serial(port, baud))
+
+    def add_output(self, name, port, baud=9600):
+        return self.attach_output(name, open_serial(port, baud))
+
+    def attach_input(self, name, ser):
+        self.inputs[name] = ser
+        self.counters[name] = PortCounters()
+        self._pending[name] = bytearray()
+        return ser
+
+    def attach_output(self, name, ser):
+        self.outputs[name] = ser
+        self.counters[name] = PortCounters()
+        return ser
+
+    def close(self):
+        self.stop()
+        for ser in list(self.inputs.values()) + list(self.outputs.values()):
+            if ser.is_open:
+                ser.close()
+
+    # === Routing ===
+    def targets_for(self, line):
+        m = _SENSOR.search(line)
+        if m:
+            targets = self.routes.get(int(m.group(1)))
+            if targets is not None:
+                return targets
+        return self.default if self.default is not None else list(self.outputs)
+
+    def handle_data(self, name, data):
+        counters = self.counters[name]
+        counters.bytes_in += len(data)
+        pending = self._pending[name]
+        pending += data
+        end = pending.rfind(b"\n") + 1
+        if not end:
+            return
+        lines = bytes(pending[:end]).split(b"\n")[:-1]
+        del pending[:end]
+        counters.lines_in += len(lines)
+
+        batches = {}
+        for line in lines:
+            for target in self.targets_for(line):
+                batches.setdefault(target, []).append(line)
+        with self.write_lock:
+            for target, out_lines in batches.items():
+                self.write_lines(target, out_lines)
+
+    def write_lines(self, target, lines):
+        ser = self.outputs.get(target)
+        counters = self.counters.get(target)
+        if ser is None:
+            return
+        payload = b"\n".join(lines) + b"\n"
+        try:
+            ser.write(payload)
+            counters.lines_out += len(lines)
+            counters.bytes_out += len(payload)
+        except Exception as e:
+            counters.errors += 1
+            self.errors.report(f"[ERROR] Write to {target} failed: {e}", f"write-{target}")
+
+    def _error(self, msg):
+        if self.on_error:
+            self.on_error(msg)
+
+    # === Run control ===
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.errors.reset()
+        selectable = {}
+        for name, ser in self.inputs.items():
+            try:
+                selectable[name] = ser.fileno()
+            except (AttributeError, NotImplementedError, OSError):
+                self._start_thread(self.reader_loop, name)
+        if selectable:
+            self._start_thread(self.selector_loop, selectable)
+
+    def _start_thread(self, target, *args):
+        t = threading.Thread(target=target, args=args, daemon=True)
+        t.start()
+        self.threads.append(t)
+
+    def stop(self, timeout=2.0):
+        self.running = False
+        for ser in self.inputs.values():
+            cancel_read = getattr(ser, "cancel_read", None)
+            if cancel_read and ser.is_open:
+                try:
+                    cancel_read()
+                except Exception:
+                    pass
+        for t in self.threads:
+            if t is not threading.current_thread():
+                t.join(timeout)
+        self.threads = []
+
+    def selector_loop(self, fds):
+        sel = selectors.DefaultSelector()
+        for name, fd in fds.items():
+            sel.register(fd, selectors.EVENT_READ, name)
+        try:
+            while self.running and sel.get_map():
+                for key, _ in sel.select(timeout=0.5):
+                    name = key.data
+                    ser = self.inputs[name]
+                    try:
+                        data = ser.read(max(1, ser.in_waiting))
+                        if data:
+                            self.handle_data(name, data)
+                    except Exception as e:
+                        self.counters[name].errors += 1
+                        if self._lost_input(name, ser, e) or not ser.is_open:
+                            sel.unregister(key.fd)
+                        else:
+                            self.errors.report(f"[ERROR] Read from {name} failed: {e}", f"read-{name}")
+        finally:
+            sel.close()
+
+    def reader_loop(self, name):
+        ser = self.inputs[name]
+        while self.running:
+            try:
+                data = ser.read(max(1, ser.in_waiting))
+                if data:
+                    self.handle_data(name, data)
+            except Exception as e:
+                if not self.running or not ser.is_open:
+                    break
+                self.counters[name].errors += 1
+                if self._lost_input(name, ser, e):
+                    break
+                self.errors.report(f"[ERROR] Read from {name} failed: {e}", f"read-{name}")
+
+    def _lost_input(self, name, ser, error):
+        """Closes an input whose port failed (pyserial keeps is_open set); False for other errors."""
+        if not isinstance(error, (serial.SerialException, OSError)):
+            return False
+        self.errors.report(f"[ERROR] Input {name} lost: {error}; no longer reading it", f"lost-{name}")
+        try:
+            ser.close()
+        except Exception:
+            pass
+        return True
+
+    def snapshot(self):
+        return {name: c.as_dict() for name, c in self.counters.items()}
+
+
+def parse_port_spec(spec, default_baud):
+    """NAME=PORT[@BAUD] -> (name, port, baud)"""
+    name, _, port = spec.partition("=")
+    if not port:
+        raise argparse.ArgumentTypeError(f"expected NAME=PORT[@BAUD], got {spec!r}")
+    port, _, baud = port.rpartition("@") if "@" in port else (port, "", "")
+    return name, port, int(baud) if baud else default_baud
+
+
+def parse_route_spec(spec):
+    """SENSOR=OUT[,OUT...] -> (sensor, [outputs])"""
+    sensor, _, outputs = spec.partition("=")
+    return int(sensor), [o for o in outputs.split(",") if o]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-port fan-in/fan-out serial proxy with per-sensor routing")
+    parser.add_argument("--input", action="append", default=[], metavar="NAME=PORT[@BAUD]", help="Input port (repeatable)")
+    parser.add_argument("--output", action="append", default=[], metavar="NAME=PORT[@BAUD]", help="Output port (repeatable)")
+    parser.add_argument("--route", action="append", default=[], metavar="SENSOR=OUT[,OUT]", help="Route a sensor id to outputs (repeatable)")
+    parser.add_argument("--default", help="Comma-separated outputs for unrouted lines (default: all outputs)")
+    parser.add_argument("--baud", type=int, default=9600, help="Baud rate for ports without @BAUD")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between counter reports")
+    args = parser.parse_args(argv)
+
+    if not args.input or not args.output:
+        parser.error("at least one --input and one --output are required")
+
+    routes = dict(parse_route_spec(r) for r in args.route)
+    default = [o for o in args.default.split(",") if o] if args.default is not None else None
+    outputs = [parse_port_spec(spec, args.baud) for spec in args.output]
+    names = {name for name, _, _ in outputs}
+    for sensor, targets in routes.items():
+        unknown = [t for t in targets if t not in names]
+        if unknown:
+            parser.error(f"--route {sensor} names unknown output(s) {', '.join(unknown)} "
+                         f"(outputs: {', '.join(sorted(names))})")
+    unknown = [t for t in default or [] if t not in names]
+    if unknown:
+        parser.error(f"--default names unknown output(s) {', '.join(unknown)} (outputs: {', '.join(sorted(names))})")
+
+    proxy = RoutingProxy(routes=routes, default=default, on_error=print)
+    for spec in args.input:
+        proxy.add_input(*parse_port_spec(spec, args.baud))
+    for name, port, baud in outputs:
+        proxy.add_output(name, port, baud)
+
+    proxy.start()
+    print(f"[INFO] Routing {', '.join(proxy.inputs)} -> {', '.join(proxy.outputs)}. Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(args.interval)
+            for name, c in proxy.snapshot().items():
+                print(f"[STATS] {name}: in {c['lines_in']} lines/{c['bytes_in']} B, "
+                      f"out {c['lines_out']} lines/{c['bytes_out']} B, errors {c['errors']}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proxy.close()
+        print("[INFO] Routing proxy stopped.")
+
+
+if __name__ == "__main__":
+    main()
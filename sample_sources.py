@@ -0,0 +1,138 @@
+import csv
+import mmap
+import random
+
+try:
+    import numpy as np
+except ImportError:  # only BlockSource needs it
+    np = None
+
+PROFILES = ["uniform", "gaussian", "ramp", "step"]
+SOURCES = ["Random", "Block (NumPy)", "Replay CSV"]
+
+# Column names that carry the ESP32/sender timestamp in the csv/ formats
+_TIME_COLUMNS = ("Timestamp(ms)", "Raw Time", "ESP32_Timestamp")
+
+
+def encode_fields(sensor, stress):
+    """Packet bytes after the TIME field."""
+    return b";SENSOR=%d;STRESS=%d\n" % (sensor, stress)
+
+
+class RandomSource:
+    """Uniform random integers per packet, as the sender always produced."""
+
+    timed = False
+
+    def take(self, s):
+        stress = random.randint(s.min_val, s.max_val)
+        return stress, encode_fields(s.sensor, stress)
+
+
+class BlockSource:
+    """Generates stress values in NumPy blocks and pre-encodes them per packet.
+
+    profiles maps a sensor id to one of PROFILES (default uniform). period is the
+    number of samples per ramp cycle or per step level. A sensor's block is
+    regenerated when its min/max/profile change.
+    """
+
+    timed = False
+
+    def __init__(self, profiles=None, block_size=4096, period=100, seed=None):
+        if np is None:
+            raise RuntimeError("NumPy is required for the block source (pip install numpy)")
+        self.profiles = dict(profiles or {})
+        self.block_size = block_size
+        self.period = period
+        self.rng = np.random.default_rng(seed)
+        self._blocks = {}  # sensor -> [key, values, encoded, position, phase]
+
+    def _generate(self, s, profile, phase):
+        n = self.block_size
+        lo, hi = s.min_val, s.max_val
+        if profile == "gaussian":
+            values = self.rng.normal((lo + hi) / 2.0, max(hi - lo, 1) / 6.0, n)
+        elif profile == "ramp":
+            values = lo + (hi - lo) * ((np.arange(phase, phase + n) % self.period) / max(self.period - 1, 1))
+        elif profile == "step":
+            values = np.where((np.arange(phase, phase + n) // self.period) % 2, hi, lo)
+        else:
+            values = self.rng.integers(lo, hi, n, endpoint=True)
+        values = np.clip(np.rint(values), lo, hi).astype(np.int64)
+        text = np.char.add(f";SENSOR={s.sensor};STRESS=", values.astype(str))
+        encoded = np.char.encode(np.char.add(text, "\n"), "ascii").tolist()
+        return values.tolist(), encoded
+
+    def take(self, s):
+        profile = self.profiles.get(s.sensor, "uniform")
+        key = (s.min_val, s.max_val, profile)
+        block = self._blocks.get(s.sensor)
+        if block is None or block[0] != key or block[3] >= len(block[1]):
+            phase = block[4] if block and block[0] == key else 0
+            values, encoded = self._generate(s, profile, phase)
+            block = self._blocks[s.sensor] = [key, values, encoded, 0, phase + len(values)]
+        i = block[3]
+        block[3] = i + 1
+        return block[1][i], block[2][i]
+
+
+def iter_csv_lines(path):
+    """Yields decoded lines of a file through a read-only memory map (no full read into memory)."""
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return
+        with mm:
+            pos = 0
+            size = len(mm)
+            while pos < size:
+                end = mm.find(b"\n", pos)
+                if end < 0:
+                    end = size
+                yield mm[pos:end].decode("utf-8", errors="ignore")
+                pos = end + 1
+
+
+class CsvReplaySource:
+    """Replays a recording in one of the csv/ layouts (send.csv, input_*.csv, receiver export).
+
+    events() yields (offset_s, sensor, stress) with offsets taken from the
+    recording's millisecond timestamp column. speed scales the original timing
+    (2.0 = twice as fast); speed=None replays as fast as possible. Rows with
+    missing or non-numeric values are skipped.
+    """
+
+    timed = True
+
+    def __init__(self, path, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self.skipped = 0
+
+    def events(self):
+        reader = csv.reader(iter_csv_lines(self.path))
+        header = next(reader, None)
+        if not header:
+            return
+        header = [h.strip() for h in header]
+        try:
+            sensor_col = header.index("Sensor")
+            stress_col = header.index("Stress")
+        except ValueError:
+            raise ValueError(f"{self.path}: expected Sensor and Stress columns, got {header}")
+        time_col = next((header.index(c) for c in _TIME_COLUMNS if c in header), None)
+
+        first = None
+        for row in reader:
+            try:
+                sensor = int(row[sensor_col])
+                stress = int(float(row[stress_col]))
+                t = int(row[time_col]) if time_col is not None else 0
+            except (ValueError, IndexError):
+                self.skipped += 1
+                continue
+            if first is None:
+                first = t
+            yield (t - first) / 1000.0, sensor, stress
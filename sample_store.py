@@ -0,0 +1,156 @@
+import csv
+import struct
+import tempfile
+import threading
+from array import array
+from datetime import datetime
+
+from line_parser import SENSOR_OK, STRESS_FLOAT, STRESS_OK, TIME_OK
+
+EXPORT_HEADER = ["Time", "Sensor", "Stress", "ESP32_Timestamp"]
+
+_CHUNK_HEADER = struct.Struct("<I")
+
+
+class _Columns:
+    """One chunk of samples as parallel typed arrays."""
+
+    __slots__ = ("recv_ms", "times", "sensors", "stresses", "flags")
+
+    def __init__(self):
+        self.recv_ms = array('q')
+        self.times = array('q')
+        self.sensors = array('i')
+        self.stresses = array('d')
+        self.flags = array('B')
+
+    def __len__(self):
+        return len(self.flags)
+
+    def arrays(self):
+        return (self.recv_ms, self.times, self.sensors, self.stresses, self.flags)
+
+    def copy(self):
+        other = _Columns()
+        for src, dst in zip(self.arrays(), other.arrays()):
+            dst.extend(src)
+        return other
+
+
+class SampleStore:
+    """Columnar in-memory store of received samples with spill-to-disk.
+
+    Rows hold receive time (epoch ms), sensor, stress, ESP32 timestamp and the
+    parser's field flags. Once chunk_rows rows are buffered, the chunk is written
+    as raw column bytes to a temporary spill file, so memory stays bounded no
+    matter how long the session runs. Appends and exports may run on different
+    threads; an export reads the samples stored when it started, and a clear()
+    meanwhile only closes the spill file it reads once the export is done.
+    """
+
+    def __init__(self, chunk_rows=100_000, spill_dir=None):
+        self.chunk_rows = chunk_rows
+        self.spill_dir = spill_dir
+
+        self.lock = threading.Lock()
+        self.current = _Columns()
+        self.spill_file = None
+        self.spilled = []  # (offset, rows) per spilled chunk
+        self._readers = 0
+        self._retired = []  # spill files cleared while a reader still had them
+
+    def __len__(self):
+        with self.lock:
+            return sum(rows for _, rows in self.spilled) + len(self.current)
+
+    def append_batch(self, recv_ms, batch):
+        """Adds every row of a line_parser.ParsedBatch, all stamped with recv_ms."""
+        n = len(batch)
+        if not n:
+            return
+        with self.lock:
+            cur = self.current
+            cur.recv_ms.extend(array('q', [recv_ms]) * n)
+            cur.times.extend(batch.times)
+            cur.sensors.extend(batch.sensors)
+            cur.stresses.extend(batch.stresses)
+            cur.flags.extend(batch.flags)
+            if len(cur) >= self.chunk_rows:
+                self._spill()
+
+    def clear(self):
+        with self.lock:
+            self.current = _Columns()
+            self.spilled = []
+            if self.spill_file:
+                if self._readers:
+                    self._retired.append(self.spill_file)
+                else:
+                    self.spill_file.close()
+                self.spill_file = None
+
+    def _spill(self):
+        if self.spill_file is None:
+            self.spill_file = tempfile.TemporaryFile(prefix="samples_", suffix=".bin", dir=self.spill_dir)
+        f = self.spill_file
+        f.seek(0, 2)
+        offset = f.tell()
+        f.write(_CHUNK_HEADER.pack(len(self.current)))
+        for column in self.current.arrays():
+            column.tofile(f)
+        f.flush()
+        self.spilled.append((offset, len(self.current)))
+        self.current = _Columns()
+
+    def _read_chunk(self, f, offset, rows):
+        chunk = _Columns()
+        with self.lock:
+            f.seek(offset + _CHUNK_HEADER.size)
+            for column in chunk.arrays():
+                column.fromfile(f, rows)
+        return chunk
+
+    def chunks(self):
+        """Yields the stored chunks in order, one in memory at a time."""
+        with self.lock:
+            spilled = list(self.spilled)
+            tail = self.current.copy()
+            f = self.spill_file
+            self._readers += 1
+        try:
+            for offset, rows in spilled:
+                yield self._read_chunk(f, offset, rows)
+            if len(tail):
+                yield tail
+        finally:
+            with self.lock:
+                self._readers -= 1
+                if not self._readers:
+                    for retired in self._retired:
+                        retired.close()
+                    self._retired = []
+
+    def export_csv(self, path):
+        """Streams all samples to a CSV file in the receiver export layout; returns rows written."""
+        written = 0
+        last_second = None
+        label = ""
+        with open(path, mode='w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(EXPORT_HEADER)
+            for chunk in self.chunks():
+                rows = []
+                for recv_ms, t, sensor, stress, flags in zip(*chunk.arrays()):
+                    second = recv_ms // 1000
+                    if second != last_second:
+                        last_second = second
+                        label = datetime.fromtimestamp(second).strftime("%H:%M:%S")
+                    rows.append((
+                        label,
+                        sensor if flags & SENSOR_OK else "N/A",
+                        (stress if flags & STRESS_FLOAT else int(stress)) if flags & STRESS_OK else "N/A",
+                        t if flags & TIME_OK else "N/A",
+                    ))
+                writer.writerows(rows)
+                written += len(rows)
+        return written
@@ -0,0 +1,302 @@
+import argparse
+import gzip
+import io
+import json
+import lzma
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Manifest (PATH_STEM.manifest.json), rewritten atomically on every change:
+#
+#   {"segments": [{"file": "input_20261018_120000.csv.gz", "start_ms": ..., "end_ms": ...,
+#                  "rows": ..., "bytes": ..., "open": false, "compression": "gzip"}, ...]}
+#
+# file is relative to the manifest's directory and always names the file as it
+# currently exists (the compressed name once compression finished). start_ms and
+# end_ms are the epoch ms of the first and last write to the segment; rows are
+# written up to the recorder's flush interval after they were recorded. An open
+# segment's end_ms is only updated when it closes, so a reader takes it as "now".
+COMPRESSIONS = {"none": "", "gzip": ".gz", "lzma": ".xz", "zstd": ".zst"}
+COPY_BLOCK = 1 << 20
+_STOP = object()
+_UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+_SECONDS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_size(text):
+    """Bytes from e.g. "500k", "100M", "2G" or a plain number; empty or 0 means no size limit."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?\s*", text or "0", re.IGNORECASE)
+    if not match:
+        raise ValueError(f"bad size {text!r} (expected e.g. 100M)")
+    return int(float(match.group(1)) * _UNITS[match.group(2).lower()])
+
+
+def parse_interval(text):
+    """Seconds from e.g. "90s", "30m", "6h", "1d" or a plain number of seconds; empty or 0 means none."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*", text or "0", re.IGNORECASE)
+    if not match:
+        raise ValueError(f"bad interval {text!r} (expected e.g. 1h)")
+    return float(match.group(1)) * _SECONDS[match.group(2).lower()]
+
+
+def _open_compressed(path, compression):
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=6)
+    if compression == "lzma":
+        return lzma.open(path, "wb", preset=6)
+    return zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"))
+
+
+def open_segment(path):
+    """Opens a segment for reading as text, decompressing by file extension."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", newline="", encoding="utf-8")
+    if path.endswith(".xz"):
+        return lzma.open(path, "rt", newline="", encoding="utf-8")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("Reading .zst segments needs the zstandard package (pip install zstandard)")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb")),
+                                encoding="utf-8", newline="")
+    return open(path, newline="", encoding="utf-8")
+
+
+class RotationPolicy:
+    """When a rolling log starts a new segment, and how closed segments are compressed.
+
+    A segment is closed once it reaches max_bytes or when the wall clock
+    crosses a multiple of interval_s (so hourly segments start on the hour);
+    0 disables either limit.
+    """
+
+    def __init__(self, max_bytes=0, interval_s=0, compress="gzip"):
+        if compress not in COMPRESSIONS:
+            raise ValueError(f"unknown compression {compress!r} (expected one of {', '.join(COMPRESSIONS)})")
+        if compress == "zstd" and zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package (pip install zstandard)")
+        self.max_bytes = max_bytes
+        self.interval_s = interval_s
+        self.compress = compress
+
+    def __bool__(self):
+        return bool(self.max_bytes or self.interval_s)
+
+    def describe(self):
+        limits = [f"{self.max_bytes / (1 << 20):g} MB" if self.max_bytes else "",
+                  f"{self.interval_s:g} s" if self.interval_s else ""]
+        return f"roll at {' or '.join(l for l in limits if l)}, {self.compress}"
+
+
+class SegmentLog:
+    """Segment files, manifest and background compression of one rolling log.
+
+    For path "dir/input.csv" the segments are "dir/input_YYYYmmdd_HHMMSS.csv",
+    named by the local time they were opened, listed in
+    "dir/input.manifest.json". An existing manifest is continued, so several
+    runs to the same path share it.
+
+    The recorder's writer thread calls open()/written()/due()/roll()/finish(),
+    and postpone() for a segment whose interval ended before it got a row.
+    Closed segments are compressed one at a time on a separate thread at low
+    OS priority where supported; gzip/lzma/zstd release the GIL while they
+    compress, so the serial threads are not held up. A segment that fails to
+    compress stays uncompressed, with the error in its manifest entry.
+    """
+
+    def __init__(self, path, policy):
+        self.policy = policy
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self.stem, self.ext = os.path.splitext(os.path.basename(path))
+        self.manifest_path = os.path.join(self.directory, self.stem + ".manifest.json")
+        self.lock = threading.Lock()
+        self.entries = read_manifest(self.manifest_path) if os.path.exists(self.manifest_path) else []
+        for entry in self.entries:
+            entry["open"] = False  # left open by a run that did not close it
+        self.entry = None
+        self.deadline = None
+        self.pending = queue.SimpleQueue()
+        self.compressor = None
+
+    # === Manifest ===
+    def _save(self):
+        with self.lock:
+            tmp = self.manifest_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"segments": self.entries}, f, indent=1)
+            os.replace(tmp, self.manifest_path)
+
+    # === Writer side ===
+    def open(self):
+        """Starts a new segment; returns its file, opened for CSV writing."""
+        now = time.time()
+        name = self.stem + datetime.fromtimestamp(now).strftime("_%Y%m%d_%H%M%S")
+        taken = {e["file"] for e in self.entries}
+        candidate, n = name, 1
+        while any(candidate + self.ext + suffix in taken for suffix in COMPRESSIONS.values()) or \
+                os.path.exists(os.path.join(self.directory, candidate + self.ext)):
+            candidate, n = f"{name}_{n}", n + 1
+        interval = self.policy.interval_s
+        self.deadline = (now // interval + 1) * interval if interval else None
+        self.entry = {"file": candidate + self.ext, "start_ms": None, "end_ms": None, "rows": 0,
+                      "bytes": 0, "open": True, "compression": None}
+        with self.lock:
+            self.entries.append(self.entry)
+        f = open(os.path.join(self.directory, self.entry["file"]), "w", newline="", encoding="utf-8")
+        self._save()
+        return f
+
+    def written(self, rows):
+        now_ms = time.time_ns() // 1_000_000
+        entry = self.entry
+        with self.lock:
+            if entry["start_ms"] is None:
+                entry["start_ms"] = now_ms
+            entry["end_ms"] = now_ms
+            entry["rows"] += rows
+
+    def due(self, size):
+        """Whether the current segment, now size bytes long, should be closed."""
+        return bool((self.policy.max_bytes and size >= self.policy.max_bytes)
+                    or (self.deadline is not None and time.time() >= self.deadline))
+
+    def postpone(self):
+        """Moves the interval deadline on to the next boundary; for a segment that is still empty."""
+        interval = self.policy.interval_s
+        self.deadline = (time.time() // interval + 1) * interval if interval else None
+
+    def roll(self, f):
+        """Closes the current segment and returns the file of the next one."""
+        self.finish(f)
+        return self.open()
+
+    def finish(self, f):
+        """Closes the current segment and queues it for compression."""
+        entry = self.entry
+        size = f.tell()
+        f.close()
+        with self.lock:
+            entry["bytes"] = size
+            entry["open"] = False
+        self.entry = None
+        self._save()
+        if self.policy.compress != "none":
+            self.pending.put(entry)
+            if self.compressor is None:
+                self.compressor = threading.Thread(target=self._compress_loop, name="segment-compressor")
+                self.compressor.start()
+
+    def close(self):
+        """Lets the compressor finish the queued segments and exit; does not wait for it."""
+        if self.compressor is not None:
+            self.pending.put(_STOP)
+            self.compressor = None
+
+    # === Compression ===
+    def _compress_loop(self):
+        if hasattr(os, "setpriority"):
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)  # this thread only, on Linux
+            except OSError:
+                pass
+        while True:
+            entry = self.pending.get()
+            if entry is _STOP:
+                return
+            self._compress(entry)
+
+    def _compress(self, entry):
+        compression = self.policy.compress
+        source = os.path.join(self.directory, entry["file"])
+        target = source + COMPRESSIONS[compression]
+        tmp = target + ".part"
+        try:
+            with open(source, "rb") as src, _open_compressed(tmp, compression) as dst:
+                while True:
+                    block = src.read(COPY_BLOCK)
+                    if not block:
+                        break
+                    dst.write(block)
+            os.replace(tmp, target)
+        except Exception as e:
+            with self.lock:
+                entry["error"] = str(e)
+            self._save()
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        with self.lock:
+            entry["file"] = os.path.basename(target)
+            entry["compression"] = compression
+            entry["compressed_bytes"] = os.path.getsize(target)
+        self._save()
+        os.remove(source)
+
+
+def read_manifest(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["segments"]
+
+
+def segments_between(manifest_path, start_ms=None, end_ms=None):
+    """Paths of the segments whose time range overlaps [start_ms, end_ms], oldest first.
+
+    Segments that never received a row are skipped; an open one is taken to
+    run until now.
+    """
+    directory = os.path.dirname(os.path.abspath(manifest_path))
+    now_ms = time.time_ns() // 1_000_000
+    paths = []
+    for entry in sorted(read_manifest(manifest_path), key=lambda e: e["start_ms"] or 0):
+        if entry["start_ms"] is None:
+            continue
+        last = now_ms if entry["open"] else entry["end_ms"]
+        if (end_ms is None or entry["start_ms"] <= end_ms) and (start_ms is None or last >= start_ms):
+            paths.append(os.path.join(directory, entry["file"]))
+    return paths
+
+
+def parse_time(text):
+    """Epoch ms from an integer or an ISO 'YYYY-MM-DD HH:MM:SS' local time; None passes through."""
+    if text is None:
+        return None
+    if text.strip().lstrip("-").isdigit():
+        return int(text)
+    return int(datetime.fromisoformat(text).timestamp() * 1000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List or join the segments of a rolling CSV log")
+    parser.add_argument("manifest", help="The log's .manifest.json")
+    parser.add_argument("--start", help="Start of the time range (epoch ms or 'YYYY-MM-DD HH:MM:SS')")
+    parser.add_argument("--end", help="End of the time range (epoch ms or 'YYYY-MM-DD HH:MM:SS')")
+    parser.add_argument("--csv", help="Join the selected segments into this CSV file (one header)")
+    args = parser.parse_args(argv)
+
+    paths = segments_between(args.manifest, parse_time(args.start), parse_time(args.end))
+    for path in paths:
+        print(path)
+    if args.csv:
+        rows = 0
+        with open(args.csv, "w", newline="", encoding="utf-8") as out:
+            for i, path in enumerate(paths):
+                with open_segment(path) as f:
+                    header = f.readline()
+                    if i == 0:
+                        out.write(header)
+                    for line in f:
+                        out.write(line)
+                        rows += 1
+        print(f"[INFO] Wrote {rows:,} rows from {len(paths)} segment(s) to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+import threading
+import time
+from datetime import datetime
+
+from frame_codec import FrameEncoder
+from latency import LatencyHistogram
+from profiling import counter
+from sample_sources import RandomSource, encode_fields
+
+# Packets that are this far (seconds) behind schedule are skipped instead of sent in a burst
+MAX_CATCHUP = 1.0
+# Largest number of packets joined into one write when replaying as fast as possible
+REPLAY_BATCH = 256
+
+# Always-on hot-path counters (see profiling.py)
+_SOURCE = counter("source")
+_WRITE = counter("serial_write")
+_RECORD = counter("record")
+
+
+class SensorConfig:
+    """Plain snapshot of one sensor's GUI settings, safe to read from the send thread."""
+
+    __slots__ = ("sensor", "enabled", "min_val", "max_val", "rate_hz")
+
+    def __init__(self, sensor, enabled=True, min_val=0, max_val=100, rate_hz=1.0):
+        self.sensor = sensor
+        self.enabled = enabled
+        self.min_val = min_val
+        self.max_val = max_val
+        self.rate_hz = rate_hz
+
+    def active(self):
+        return self.enabled and self.rate_hz > 0
+
+    def __eq__(self, other):
+        if not isinstance(other, SensorConfig):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
+
+
+class Schedule:
+    """Absolute per-sensor send schedule: a sensor's k-th packet is due at start + k / rate_hz.
+
+    Deadlines are computed from the start time rather than from the previous
+    send, so time spent writing does not accumulate as drift. A sensor that
+    falls more than MAX_CATCHUP seconds behind skips the packets it missed.
+    """
+
+    def __init__(self, sensors, now):
+        self.sensors = tuple(sensors)
+        self.base = [now] * len(self.sensors)
+        self.counts = [0] * len(self.sensors)
+
+    def update(self, sensors, now):
+        """Switches to new settings. A sensor that stays active at the same rate keeps its
+        place in the schedule; any other one starts over at now."""
+        kept = {s.sensor: (s, base, count) for s, base, count in zip(self.sensors, self.base, self.counts)}
+        self.sensors = tuple(sensors)
+        self.base = []
+        self.counts = []
+        for s in self.sensors:
+            old, base, count = kept.get(s.sensor, (None, now, 0))
+            if old is None or not (old.active() and s.active() and old.rate_hz == s.rate_hz):
+                base, count = now, 0
+            self.base.append(base)
+            self.counts.append(count)
+
+    def due(self, now):
+        """(packets, next_wake, skipped): the (deadline, SensorConfig) pairs due by now in
+        deadline order, the next deadline (None if no sensor is active) and the packets skipped."""
+        base, counts = self.base, self.counts
+        packets = []
+        next_wake = None
+        skipped = 0
+        for i, s in enumerate(self.sensors):
+            if not s.active():
+                continue
+            period = 1.0 / s.rate_hz
+            due = base[i] + counts[i] * period
+            if now - due > MAX_CATCHUP:
+                late = int((now - due) / period)
+                counts[i] += late
+                skipped += late
+                due = base[i] + counts[i] * period
+            while due <= now:
+                packets.append((due, s))
+                counts[i] += 1
+                due = base[i] + counts[i] * period
+            if next_wake is None or due < next_wake:
+                next_wake = due
+        packets.sort(key=lambda p: p[0])
+        return packets, next_wake, skipped
+
+
+def encode_packets(timestamp, values, encoder=None, seqs=None):
+    """The bytes of one write for values of (due, sensor, stress, fields).
+
+    With a frame_codec.FrameEncoder the packets become binary frames, otherwise
+    TIME=timestamp lines; seqs adds each packet's SEQ number.
+    """
+    if encoder is not None:
+        samples = ([(v[1], v[2], n) for v, n in zip(values, seqs)] if seqs
+                   else [(v[1], v[2]) for v in values])
+        return encoder.encode(timestamp, samples)
+    prefix = b"TIME=%d" % timestamp
+    if seqs:
+        return b"".join(prefix + v[3][:-1] + b";SEQ=%d\n" % n for v, n in zip(values, seqs))
+    return b"".join(prefix + v[3] for v in values)
+
+
+class SenderEngine:
+    """Rate-controlled packet sender scheduled against the monotonic clock.
+
+    Each sensor has a rate in Hz and an absolute schedule (start + k / rate), so
+    time spent writing, logging or recording does not accumulate as drift. All
+    packets due at a wakeup are joined into one write(). Configuration is
+    replaced as a whole via configure(); the send thread never touches Tk
+    variables. Lateness of every packet against its deadline is kept in a
+    histogram (microseconds) as the jitter measure.
+
+    Stress values come from source (see sample_sources). A timed source, such as
+    a CSV replay, brings its own schedule and replaces the per-sensor rates.
+
+    With binary=True the packets of one write are packed into frame_codec
+    frames instead of ASCII lines. With seq=True every packet carries a
+    per-sensor sequence number (;SEQ=n, counting from 0 at start()) so a
+    receiver can tell lost, duplicated and reordered packets apart; a packet
+    whose write fails still uses up its number.
+    """
+
+    def __init__(self, on_sent=None, on_error=None, recorder=None, source=None, on_done=None, binary=False,
+                 seq=False):
+        self.on_sent = on_sent
+        self.on_error = on_error
+        self.on_done = on_done
+        self.recorder = recorder
+        self.source = source or RandomSource()
+        self.binary = binary
+        self.seq = seq
+        self.encoder = FrameEncoder()
+        self.next_seq = {}
+
+        self.ser = None
+        self.sensors = ()
+        self.running = False
+        self.thread = None
+        self._wake = threading.Event()
+        self._config_version = 0
+
+        self.sent = {}
+        self.missed = 0
+        self.jitter = LatencyHistogram()
+        self._rate_mark = (time.monotonic(), {})
+
+    def configure(self, sensors):
+        """Replaces the sensor settings (an iterable of SensorConfig); takes effect at the next wakeup.
+
+        Settings equal to the current ones are ignored, and sensors whose rate did
+        not change keep their schedule (see Schedule.update)."""
+        sensors = tuple(sensors)
+        if sensors == self.sensors:
+            return
+        self.sensors = sensors
+        self._config_version += 1
+        self._wake.set()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.sent = {s.sensor: 0 for s in self.sensors}
+        self.missed = 0
+        self.next_seq = {}
+        self.jitter.reset()
+        self.encoder.reset()
+        self._rate_mark = (time.monotonic(), dict(self.sent))
+        target = self.replay_loop if getattr(self.source, "timed", False) else self.send_loop
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2.0):
+        self.running = False
+        self._wake.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        self.thread = None
+
+    def rates(self):
+        """Achieved packets/s per sensor since the previous call."""
+        now = time.monotonic()
+        then, counts = self._rate_mark
+        current = dict(self.sent)
+        self._rate_mark = (now, current)
+        elapsed = max(now - then, 1e-9)
+        return {sensor: (n - counts.get(sensor, 0)) / elapsed for sensor, n in current.items()}
+
+    def _emit(self, callback, msg):
+        if callback:
+            callback(msg)
+
+    def send_loop(self):
+        version = None
+        schedule = None
+        while self.running:
+            self._wake.clear()
+            now = time.monotonic()
+            if version != self._config_version:
+                version = self._config_version
+                if schedule is None:
+                    schedule = Schedule(self.sensors, now)
+                else:
+                    schedule.update(self.sensors, now)
+                for s in schedule.sensors:
+                    self.sent.setdefault(s.sensor, 0)
+
+            due_packets, next_wake, skipped = schedule.due(now)
+            self.missed += skipped
+            if due_packets:
+                self._send(due_packets, now)
+
+            if next_wake is None:
+                self._wake.wait(0.5)
+            else:
+                delay = next_wake - time.monotonic()
+                if delay > 0:
+                    self._wake.wait(delay)
+
+    def replay_loop(self):
+        source = self.source
+        speed = source.speed
+        events = source.events()
+        t0 = time.monotonic()
+        upcoming = None
+        try:
+            while self.running:
+                self._wake.clear()
+                now = time.monotonic()
+                due_packets = []
+                while len(due_packets) < REPLAY_BATCH:
+                    if upcoming is None:
+                        event = next(events, None)
+                        if event is None:
+                            break
+                        offset, sensor, stress = event
+                        due = t0 + offset / speed if speed else now
+                        upcoming = (due, sensor, stress)
+                    if upcoming[0] > now:
+                        break
+                    due_packets.append(upcoming)
+                    upcoming = None
+                if due_packets:
+                    self._send_values(due_packets, now)
+                if upcoming is None and not due_packets:
+                    break
+                if upcoming is not None:
+                    delay = upcoming[0] - time.monotonic()
+                    if delay > 0:
+                        self._wake.wait(delay)
+        except Exception as e:
+            self._emit(self.on_error, f"[ERROR] Replay failed: {e}")
+        self.running = False
+        self._emit(self.on_done, f"[INFO] Replay finished ({sum(self.sent.values())} packets, {source.skipped} rows skipped).")
+
+    def _send(self, due_packets, now):
+        take = self.source.take
+        values = []
+        t0 = time.perf_counter_ns()
+        for due, s in due_packets:
+            stress, fields = take(s)
+            values.append((due, s.sensor, stress, fields))
+        _SOURCE.add(0, t0)
+        self._send_encoded(values, now)
+
+    def _send_values(self, due_packets, now):
+        self._send_encoded([(due, sensor, stress, encode_fields(sensor, stress))
+                            for due, sensor, stress in due_packets], now)
+
+    def _number(self, values):
+        """Next SEQ of each packet's sensor, in packet order."""
+        next_seq = self.next_seq
+        seqs = []
+        for _, sensor, _, _ in values:
+            n = next_seq.get(sensor, 0)
+            next_seq[sensor] = n + 1
+            seqs.append(n)
+        return seqs
+
+    def _send_encoded(self, values, now):
+        timestamp = int(time.time() * 1000)
+        prefix = b"TIME=%d" % timestamp
+        for due, _, _, _ in values:
+            self.jitter.record(int((now - due) * 1_000_000))
+        seqs = self._number(values) if self.seq else None
+        try:
+            if self.ser and self.ser.is_open:
+                t0 = time.perf_counter_ns()
+                data = encode_packets(timestamp, values, self.encoder if self.binary else None, seqs)
+                self.ser.write(data)
+                _WRITE.add(len(data), t0)
+        except Exception as e:
+            self._emit(self.on_error, f"Error sending: {e}")
+            return
+
+        t0 = time.perf_counter_ns()
+        recorder = self.recorder
+        human_time = datetime.now().strftime("%A, %B %d, %Y %H:%M:%S.%f")[:-3] if recorder else None
+        sent = self.sent
+        for i, (_, sensor, stress, fields) in enumerate(values):
+            sent[sensor] = sent.get(sensor, 0) + 1
+            if self.on_sent:
+                line = (prefix + fields).decode().strip()
+                self.on_sent(f"{line};SEQ={seqs[i]}" if seqs else line)
+            if recorder:
+                recorder.record([timestamp, human_time, sensor, stress])
+        _RECORD.add(0, t0)
@@ -0,0 +1,229 @@
+import math
+import threading
+import time
+from array import array
+
+from line_parser import SENSOR_OK, STRESS_OK
+
+_VALID = SENSOR_OK | STRESS_OK
+
+
+class QuantileSketch:
+    """Fixed-memory quantile sketch with relative error (DDSketch-style).
+
+    A value x is counted in bucket ceil(log_gamma(|x|)), gamma = (1+a)/(1-a),
+    separately for positive and negative values, so every quantile is within
+    relative accuracy a of the true one. Once more than max_buckets buckets
+    exist the ones closest to zero are merged, which only affects the
+    smallest magnitudes. add() is O(1).
+    """
+
+    def __init__(self, accuracy=0.01, max_buckets=1024, min_value=1e-9):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.min_value = min_value
+        self.pos = {}
+        self.neg = {}
+        self.zero = 0
+        self.count = 0
+
+    def add(self, x):
+        if x > self.min_value:
+            k = math.ceil(math.log(x) / self.log_gamma)
+            self.pos[k] = self.pos.get(k, 0) + 1
+        elif x < -self.min_value:
+            k = math.ceil(math.log(-x) / self.log_gamma)
+            self.neg[k] = self.neg.get(k, 0) + 1
+        else:
+            self.zero += 1
+        self.count += 1
+        if len(self.pos) + len(self.neg) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        buckets = self.pos if len(self.pos) >= len(self.neg) else self.neg
+        low = min(buckets)
+        n = buckets.pop(low)
+        if buckets:
+            nxt = min(buckets)
+            buckets[nxt] += n
+        else:
+            self.zero += n
+
+    def _value(self, k):
+        return 2 * self.gamma ** k / (self.gamma + 1)
+
+    def quantile(self, q):
+        """Approximate q-quantile (0..1), or None when empty."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for k in sorted(self.neg, reverse=True):
+            seen += self.neg[k]
+            if seen > rank:
+                return -self._value(k)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for k in sorted(self.pos):
+            seen += self.pos[k]
+            if seen > rank:
+                return self._value(k)
+        return self._value(max(self.pos)) if self.pos else 0.0
+
+
+class StreamStats:
+    """Running count/min/max/mean/stddev (Welford) plus a QuantileSketch of one sensor's stress."""
+
+    __slots__ = ("count", "mean", "m2", "min", "max", "sketch")
+
+    def __init__(self, accuracy=0.01):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = QuantileSketch(accuracy)
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        self.sketch.add(x)
+
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def quantile(self, q):
+        """Sketch quantile clamped to the exact min/max (a bucket midpoint can lie outside them)."""
+        value = self.sketch.quantile(q)
+        return None if value is None else min(max(value, self.min), self.max)
+
+
+class MinMaxSeries:
+    """Min and max of a signal per time bin over a sliding window.
+
+    bins slots of bin_ms each form a ring indexed by time, so memory and the
+    cost of reading the window are fixed however many samples arrive.
+    """
+
+    def __init__(self, bins=600, bin_ms=100):
+        self.bins = bins
+        self.bin_ms = bin_ms
+        self.slots = array('q', [-1]) * bins
+        self.mins = array('d', [0.0]) * bins
+        self.maxs = array('d', [0.0]) * bins
+
+    def add(self, t_ms, lo, hi):
+        slot = t_ms // self.bin_ms
+        i = slot % self.bins
+        if self.slots[i] != slot:
+            self.slots[i] = slot
+            self.mins[i] = lo
+            self.maxs[i] = hi
+            return
+        if lo < self.mins[i]:
+            self.mins[i] = lo
+        if hi > self.maxs[i]:
+            self.maxs[i] = hi
+
+    def window(self, now_ms):
+        """(min, max) per bin, oldest first, ending at now_ms; None for bins without samples."""
+        last = now_ms // self.bin_ms
+        out = []
+        for slot in range(last - self.bins + 1, last + 1):
+            i = slot % self.bins
+            out.append((self.mins[i], self.maxs[i]) if self.slots[i] == slot else None)
+        return out
+
+
+class SensorStats:
+    """Per-SENSOR streaming aggregates of the parsed stream, for live display.
+
+    add_batch() takes a line_parser.ParsedBatch (rows without a valid sensor
+    or stress are skipped) and costs O(1) per sample: a StreamStats update
+    plus one MinMaxSeries update per sensor per batch. It may run on a worker
+    thread while the GUI reads snapshot()/series(). The plot window is
+    window_s seconds wide in `bins` bins, by local receive time.
+    """
+
+    def __init__(self, window_s=60.0, bins=600, accuracy=0.01):
+        self.bins = bins
+        self.bin_ms = max(1, int(window_s * 1000 / bins))
+        self.accuracy = accuracy
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.series_by_sensor = {}
+        self._rate_mark = (time.monotonic(), {})
+
+    def _sensor(self, sensor):
+        stats = self.stats[sensor] = StreamStats(self.accuracy)
+        self.series_by_sensor[sensor] = MinMaxSeries(self.bins, self.bin_ms)
+        return stats
+
+    def add_batch(self, batch, now_ms=None):
+        if not len(batch):
+            return
+        if now_ms is None:
+            now_ms = time.monotonic_ns() // 1_000_000
+        ranges = {}
+        with self.lock:
+            all_stats = self.stats
+            for sensor, stress, flags in zip(batch.sensors, batch.stresses, batch.flags):
+                if flags & _VALID != _VALID:
+                    continue
+                stats = all_stats.get(sensor) or self._sensor(sensor)
+                stats.add(stress)
+                r = ranges.get(sensor)
+                if r is None:
+                    ranges[sensor] = [stress, stress]
+                elif stress < r[0]:
+                    r[0] = stress
+                elif stress > r[1]:
+                    r[1] = stress
+            for sensor, (lo, hi) in ranges.items():
+                self.series_by_sensor[sensor].add(now_ms, lo, hi)
+
+    def snapshot(self):
+        """One dict per sensor (sorted by id) with count, rate/s since the previous call, min/max/mean/std and p50/p90/p99."""
+        now = time.monotonic()
+        then, counts = self._rate_mark
+        elapsed = max(now - then, 1e-9)
+        rows = []
+        with self.lock:
+            for sensor in sorted(self.stats):
+                s = self.stats[sensor]
+                rows.append({
+                    "sensor": sensor,
+                    "count": s.count,
+                    "rate": (s.count - counts.get(sensor, 0)) / elapsed,
+                    "min": s.min,
+                    "max": s.max,
+                    "mean": s.mean,
+                    "std": s.std(),
+                    "p50": s.quantile(0.5),
+                    "p90": s.quantile(0.9),
+                    "p99": s.quantile(0.99),
+                })
+        self._rate_mark = (now, {row["sensor"]: row["count"] for row in rows})
+        return rows
+
+    def series(self, now_ms=None):
+        """{sensor: MinMaxSeries.window()} for the plot."""
+        if now_ms is None:
+            now_ms = time.monotonic_ns() // 1_000_000
+        with self.lock:
+            return {sensor: series.window(now_ms) for sensor, series in sorted(self.series_by_sensor.items())}
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+            self.series_by_sensor = {}
+        self._rate_mark = (time.monotonic(), {})
@@ -0,0 +1,161 @@
+import collections
+import threading
+import time
+from array import array
+
+from line_parser import SENSOR_OK, SEQ_OK
+
+_VALID = SENSOR_OK | SEQ_OK
+
+
+class _SensorSeq:
+    """Gap-detector state of one sensor; ring[seq % window] holds the last seq seen in that slot."""
+
+    __slots__ = ("expected", "ring", "received", "missing", "duplicates", "reordered", "resets")
+
+    def __init__(self, window):
+        self.expected = None
+        self.ring = array('q', [-1]) * window
+        self.received = 0
+        self.missing = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.resets = 0
+
+
+class SeqTracker:
+    """Per-sensor SEQ gap detector with sliding-window loss and throughput.
+
+    For each sensor the next expected SEQ is the highest seen + 1. A higher
+    SEQ counts the skipped numbers as missing; a lower one inside the last
+    `window` numbers is a duplicate if it was already seen, and otherwise a
+    late (reordered) packet that takes one back off missing. A SEQ 0 that was
+    already seen, or a small SEQ (below window) further back than the window,
+    is taken as the sender restarting and starts the sensor's window afresh;
+    any other SEQ further back is a duplicate. Each row costs O(1) except a
+    restart.
+
+    Received and missing counts also go into buckets of window_s/buckets
+    seconds, so loss rate and throughput can be read over the last window_s
+    seconds as well as since the start. Rows without SEQ are ignored.
+    add_batch() may run on a worker thread while the GUI reads snapshot().
+    """
+
+    def __init__(self, window=1024, window_s=10.0, buckets=10):
+        self.window = window
+        self.window_s = window_s
+        self.bucket_s = window_s / buckets
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.sensors = {}
+            self.recent = collections.deque()  # [bucket, received, missing]
+            self.started = time.monotonic()
+
+    def add(self, sensor, seq):
+        """Accounts one packet (caller holds the lock); returns the change in missing it caused."""
+        st = self.sensors.get(sensor)
+        if st is None:
+            st = self.sensors[sensor] = _SensorSeq(self.window)
+        window = self.window
+        ring = st.ring
+        expected = st.expected
+        if expected is None or seq >= expected:
+            gap = seq - expected if expected is not None else 0
+            ring[seq % window] = seq
+            st.expected = seq + 1
+            st.received += 1
+            st.missing += gap
+            return gap
+        # A sender counts from 0 again when restarted, even before it got a window ahead
+        restarted = seq == 0 and ring[0] == 0
+        if seq >= expected - window and not restarted:
+            if ring[seq % window] == seq:
+                st.duplicates += 1
+                return 0
+            ring[seq % window] = seq
+            st.received += 1
+            st.reordered += 1
+            if st.missing <= 0:
+                return 0  # late arrival of a packet sent before the first one seen
+            st.missing -= 1
+            return -1
+        if seq < window:
+            st.resets += 1
+            st.expected = seq + 1
+            ring = st.ring = array('q', [-1]) * window
+            ring[seq % window] = seq
+            st.received += 1
+            return 0
+        st.duplicates += 1
+        return 0
+
+    def add_batch(self, batch, now=None):
+        """Accounts every row of a ParsedBatch that carries a sensor and a SEQ."""
+        add = self.add
+        received = missing = 0
+        with self.lock:
+            for sensor, seq, flags in zip(batch.sensors, batch.seqs, batch.flags):
+                if flags & _VALID == _VALID:
+                    missing += add(sensor, seq)
+                    received += 1
+            if received:
+                self._count(received, missing, time.monotonic() if now is None else now)
+
+    def _count(self, received, missing, now):
+        bucket = int(now / self.bucket_s)
+        recent = self.recent
+        if recent and recent[-1][0] == bucket:
+            recent[-1][1] += received
+            recent[-1][2] += missing
+        else:
+            recent.append([bucket, received, missing])
+            while recent[0][0] <= bucket - self.buckets:
+                recent.popleft()
+
+    def window_rates(self, now=None):
+        """(loss fraction, received packets/s) over the last window_s seconds."""
+        now = time.monotonic() if now is None else now
+        first = int(now / self.bucket_s) - self.buckets + 1
+        received = missing = 0
+        with self.lock:
+            for bucket, r, m in self.recent:
+                if bucket >= first:
+                    received += r
+                    missing += m
+        missing = max(missing, 0)
+        span = min(self.window_s, max(now - self.started, 1e-9))
+        expected = received + missing
+        return (missing / expected if expected else 0.0), received / span
+
+    def snapshot(self):
+        """Totals, window loss/throughput and a dict per sensor (sorted by id)."""
+        with self.lock:
+            rows = [{"sensor": sensor, "received": st.received, "missing": st.missing,
+                     "duplicates": st.duplicates, "reordered": st.reordered, "resets": st.resets}
+                    for sensor, st in sorted(self.sensors.items())]
+        received = sum(r["received"] for r in rows)
+        missing = sum(r["missing"] for r in rows)
+        loss, rate = self.window_rates()
+        return {
+            "received": received,
+            "missing": missing,
+            "duplicates": sum(r["duplicates"] for r in rows),
+            "reordered": sum(r["reordered"] for r in rows),
+            "loss": missing / (received + missing) if received + missing else 0.0,
+            "window_loss": loss,
+            "window_rate": rate,
+            "sensors": rows,
+        }
+
+
+def format_snapshot(snapshot):
+    """One-line display form of SeqTracker.snapshot()."""
+    if not snapshot["received"]:
+        return "no SEQ seen"
+    return (f"{snapshot['received']:,} received, {snapshot['missing']:,} missing ({snapshot['loss']:.2%}), "
+            f"{snapshot['duplicates']} dup, {snapshot['reordered']} reordered; "
+            f"last window {snapshot['window_loss']:.2%} loss at {snapshot['window_rate']:,.0f}/s")
@@ -0,0 +1,117 @@
+import tkinter as tk
+from tkinter import ttk
+
+COLUMNS = ("sensor", "count", "rate", "min", "max", "mean", "std", "p50", "p90", "p99")
+HEADINGS = ("Sensor", "Count", "Rate/s", "Min", "Max", "Mean", "Std", "p50", "p90", "p99")
+COLORS = ("#1f77b4", "#d62728", "#2ca02c", "#ff7f0e", "#9467bd", "#8c564b", "#e377c2", "#17becf")
+
+
+def _fmt(value):
+    if value is None:
+        return "-"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return f"{value:,.2f}"
+
+
+class StatsWindow:
+    """Toplevel with a per-sensor table and a min/max plot of a sensor_stats.SensorStats.
+
+    Redraws every interval_ms. The plot draws one polyline per sensor through
+    the min and max of every bin, so each redraw costs the same whatever the
+    sample rate; table rows are coloured like their plot line. on_close is
+    called when the window is closed.
+    """
+
+    def __init__(self, root, stats, title="Sensor Statistics", interval_ms=500, on_close=None):
+        self.stats = stats
+        self.interval_ms = interval_ms
+        self.on_close = on_close
+
+        self.window = tk.Toplevel(root)
+        self.window.title(title)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.table = ttk.Treeview(self.window, columns=COLUMNS, show="headings", height=8)
+        for column, heading in zip(COLUMNS, HEADINGS):
+            self.table.heading(column, text=heading)
+            self.table.column(column, width=70, anchor="e")
+        self.table.pack(fill="x", padx=5, pady=5)
+
+        self.canvas = tk.Canvas(self.window, width=stats.bins, height=250, background="white")
+        self.canvas.pack(fill="both", expand=True, padx=5)
+        self.range_label = ttk.Label(self.window, text="")
+        self.range_label.pack()
+
+        ttk.Button(self.window, text="Reset", command=self.reset).pack(pady=5)
+
+        self.rows = {}
+        self.lines = {}
+        self.colors = {}
+        self._after_id = self.window.after(self.interval_ms, self.refresh)
+
+    def color(self, sensor):
+        color = self.colors.get(sensor)
+        if color is None:
+            color = self.colors[sensor] = COLORS[len(self.colors) % len(COLORS)]
+            self.table.tag_configure(f"s{sensor}", foreground=color)
+        return color
+
+    def refresh(self):
+        for row in self.stats.snapshot():
+            values = [_fmt(row[column]) for column in COLUMNS]
+            item = self.rows.get(row["sensor"])
+            if item is None:
+                self.color(row["sensor"])
+                self.rows[row["sensor"]] = self.table.insert("", "end", values=values, tags=(f"s{row['sensor']}",))
+            else:
+                self.table.item(item, values=values)
+        self.draw(self.stats.series())
+        self._after_id = self.window.after(self.interval_ms, self.refresh)
+
+    def draw(self, series):
+        width = max(self.canvas.winfo_width(), 2)
+        height = max(self.canvas.winfo_height(), 2)
+        bins = [b for window in series.values() for b in window if b]
+        if not bins:
+            return
+        lo = min(b[0] for b in bins)
+        hi = max(b[1] for b in bins)
+        span = (hi - lo) or 1.0
+        scale_y = (height - 10) / span
+        for sensor, window in series.items():
+            step = width / len(window)
+            coords = []
+            for i, b in enumerate(window):
+                if b:
+                    x = i * step
+                    coords += (x, height - 5 - (b[0] - lo) * scale_y, x, height - 5 - (b[1] - lo) * scale_y)
+            line = self.lines.get(sensor)
+            if line is None:
+                line = self.lines[sensor] = self.canvas.create_line(0, 0, 0, 0, fill=self.color(sensor))
+            # A line needs at least two points
+            self.canvas.coords(line, *(coords if len(coords) >= 4 else (0, 0, 0, 0)))
+        self.range_label.config(text=f"Stress {lo:,.2f} .. {hi:,.2f} over the last "
+                                     f"{self.stats.bins * self.stats.bin_ms / 1000:.0f} s")
+
+    def reset(self):
+        self.stats.reset()
+        children = self.table.get_children()
+        if children:
+            self.table.delete(*children)
+        self.canvas.delete("all")
+        self.rows = {}
+        self.lines = {}
+        self.colors = {}
+
+    def lift(self):
+        self.window.deiconify()
+        self.window.lift()
+
+    def close(self):
+        if self._after_id is not None:
+            self.window.after_cancel(self._after_id)
+            self._after_id = None
+        self.window.destroy()
+        if self.on_close:
+            self.on_close()
@@ -0,0 +1,17 @@
+import time
+
+from csv_recorder import CsvRecorder
+from segment_log import RotationPolicy, read_manifest
+
+
+def test_idle_segment_closes_at_its_interval(tmp_path):
+    recorder = CsvRecorder(str(tmp_path / "log.csv"), ["A"], flush_interval=0.1,
+                           rotation=RotationPolicy(interval_s=1, compress="none"))
+    try:
+        recorder.record([1])
+        time.sleep(2.3)
+        entries = read_manifest(str(tmp_path / "log.manifest.json"))
+        # The first segment closed on time with no further rows; the empty one after it stays open
+        assert [(e["rows"], e["open"]) for e in entries] == [(1, False), (0, True)]
+    finally:
+        recorder.close()
@@ -0,0 +1,60 @@
+import csv
+import os
+import pty
+import time
+import tty
+
+from forward_filters import parse_pipeline
+from frame_codec import FrameEncoder
+from line_parser import parse_chunk, split_lines
+from proxy_engine import ProxyEngine
+
+LINES = b"TIME=1;SENSOR=1;STRESS=10\nTIME=2;SENSOR=2;STRESS=20\nTIME=3;SENSOR=1;STRESS=30\n"
+
+
+def make_pty():
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    return master, os.ttyname(slave), slave
+
+
+def test_apply_reports_passed_rows():
+    pipeline = parse_pipeline("sensors:1")
+    data, passed = pipeline.apply(parse_chunk(LINES), split_lines(LINES))
+    assert data == b"TIME=1;SENSOR=1;STRESS=10\nTIME=3;SENSOR=1;STRESS=30\n"
+    assert passed == [True, False, True]
+
+
+def test_apply_marks_nothing_passed_when_all_dropped():
+    pipeline = parse_pipeline("sensors:9")
+    assert pipeline.apply(parse_chunk(LINES), split_lines(LINES)) == (b"", [False, False, False])
+
+
+def test_apply_credits_average_to_the_row_that_closed_the_window():
+    pipeline = parse_pipeline("rewrite:scale=2 | average:2")
+    data, passed = pipeline.apply(parse_chunk(LINES), split_lines(LINES))
+    # Sensor 1: window 0 holds TIME=1 and is closed by TIME=3 (window 1)
+    assert data == b"TIME=0;SENSOR=1;STRESS=20\n"
+    assert passed == [False, False, True]
+
+
+def test_translate_pipeline_records_forwarded_per_row(tmp_path):
+    in_master, in_name, in_slave = make_pty()
+    out_master, out_name, out_slave = make_pty()
+    path = str(tmp_path / "combined.csv")
+    engine = ProxyEngine(binary=True, translate=True, pipeline=parse_pipeline("sensors:1"))
+    engine.connect_input(in_name, 115200)
+    engine.connect_output(out_name, 115200)
+    engine.open_csv(combined_path=path)
+    engine.start()
+    try:
+        encoder = FrameEncoder()
+        os.write(in_master, encoder.encode(1000, [(1, 10), (2, 20)]) + encoder.encode(1001, [(2, 30)]))
+        time.sleep(0.5)
+    finally:
+        engine.stop()
+        for fd in (in_master, in_slave, out_master, out_slave):
+            os.close(fd)
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))[1:]
+    assert [(r[1], r[4]) for r in rows] == [("1", "1"), ("2", "0"), ("2", "0")]
@@ -0,0 +1,32 @@
+import pytest
+
+from frame_codec import FrameDecoder, FrameEncoder
+
+
+def column_lengths(batch):
+    return {len(batch.times), len(batch.sensors), len(batch.stresses), len(batch.seqs), len(batch.flags)}
+
+
+@pytest.mark.parametrize("timestamp, samples", [
+    (1000, [(1, 5, 0), (1 << 40, 5, 1)]),      # sensor beyond int32
+    (1000, [(1, 5, 1 << 64)]),                  # seq beyond int64
+    (1000, [(1, 1 << 1100, 0)]),                # stress beyond a double
+])
+def test_value_out_of_range_drops_the_whole_frame(timestamp, samples):
+    encoder = FrameEncoder()
+    decoder = FrameDecoder()
+    data = encoder.encode(timestamp, [(7, 1, 0)]) + encoder.encode(timestamp, samples) + encoder.encode(timestamp, [(8, 2, 1)])
+    batch = decoder.feed(data)
+    assert list(batch.sensors) == [7, 8]
+    assert column_lengths(batch) == {2}
+    assert decoder.bad_frames == 1
+
+
+def test_delta_time_beyond_int64_drops_the_frame():
+    encoder = FrameEncoder()
+    decoder = FrameDecoder()
+    top = (1 << 63) - 10
+    batch = decoder.feed(encoder.encode(top, [(1, 1)]) + encoder.encode(top + 20, [(2, 2)]))
+    assert list(batch.sensors) == [1]
+    assert column_lengths(batch) == {1}
+    assert decoder.bad_frames == 1
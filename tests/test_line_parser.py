@@ -0,0 +1,56 @@
+import pytest
+
+import line_parser
+from line_parser import SENSOR_OK, STRESS_OK, TIME_OK, ParsedBatch, parse_chunk, split_lines
+
+CHUNKS = [
+    b"TIME=1;SENSOR=3;STRESS=-7\nTIME=2;SENSOR=4;STRESS=8\n",
+    b"TIME=1;SENSOR=3;STRESS=-7;SEQ=0\nTIME=2;SENSOR=4;STRESS=8;SEQ=1\n",
+    b"TIME=1;SENSOR=99999999999;STRESS=5\n",
+    b"TIME=1;SENSOR=2147483648;STRESS=5\nTIME=2;SENSOR=1;STRESS=5\n",
+    b"TIME=1;SENSOR=-2147483648;STRESS=5\n",
+    b"TIME=99999999999999999999;SENSOR=1;STRESS=5\n",
+    b"TIME=-9223372036854775808;SENSOR=1;STRESS=5\n",
+    b"TIME=9223372036854775808;SENSOR=1;STRESS=5\n",
+    b"TIME=1;SENSOR=1;STRESS=99999999999999999999\n",
+    b"TIME=1;SENSOR=1;STRESS=5;SEQ=99999999999999999999\n",
+]
+
+
+def slow_parse(chunk):
+    batch = ParsedBatch()
+    for row, line in enumerate(split_lines(chunk)):
+        line_parser._parse_line(line, row, batch)
+    return batch
+
+
+def columns(batch):
+    return (list(batch.times), list(batch.sensors), list(batch.stresses), list(batch.seqs),
+            list(batch.flags), batch.errors)
+
+
+@pytest.fixture(params=["numpy", "pure"])
+def bulk_path(request, monkeypatch):
+    if request.param == "numpy":
+        if line_parser.np is None:
+            pytest.skip("numpy not installed")
+    else:
+        monkeypatch.setattr(line_parser, "np", None)
+    return request.param
+
+
+@pytest.mark.parametrize("chunk", CHUNKS)
+def test_bulk_and_line_paths_agree(bulk_path, chunk):
+    assert columns(parse_chunk(chunk)) == columns(slow_parse(chunk))
+
+
+def test_out_of_range_sensor_clears_its_flag():
+    batch = parse_chunk(b"TIME=1;SENSOR=99999999999;STRESS=x\n")
+    assert batch.flags[0] == TIME_OK
+    assert batch.errors == [(0, "SENSOR", "value out of range b'99999999999'"), (0, "STRESS", "invalid value b'x'")]
+
+
+def test_out_of_range_row_does_not_affect_its_neighbours(bulk_path):
+    batch = parse_chunk(b"TIME=1;SENSOR=1;STRESS=5\nTIME=2;SENSOR=4294967296;STRESS=6\n")
+    assert list(batch.flags) == [TIME_OK | SENSOR_OK | STRESS_OK, TIME_OK | STRESS_OK]
+    assert list(batch.sensors) == [1, 0]
@@ -0,0 +1,89 @@
+import os
+import pty
+import time
+import tty
+
+import pytest
+
+from proxy_engine import ProxyEngine
+from receive_engine import ReceiveEngine
+
+
+def make_pty():
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    return master, os.ttyname(slave), slave
+
+
+def wait_stopped(engine, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while engine.running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return not engine.running
+
+
+@pytest.mark.parametrize("transparent", [False, True])
+def test_proxy_stops_on_lost_input_without_reconnect(transparent):
+    errors = []
+    master, name, slave = make_pty()
+    engine = ProxyEngine(on_error=errors.append, transparent=transparent)
+    engine.input_link.auto = False
+    engine.connect_input(name, 115200)
+    os.close(slave)
+    engine.start()
+    try:
+        os.write(master, b"TIME=1;SENSOR=1;STRESS=1\n")
+        time.sleep(0.1)
+        os.close(master)  # the device goes away; pyserial keeps is_open set
+        assert wait_stopped(engine)
+        assert not engine.input_connected()
+        assert sum("lost" in e for e in errors) == 1
+    finally:
+        engine.stop()
+
+
+def test_receiver_stops_on_lost_port_without_reconnect():
+    errors = []
+    master, name, slave = make_pty()
+    engine = ReceiveEngine(on_error=errors.append)
+    engine.link.auto = False
+    engine.connect(name, 115200)
+    os.close(slave)
+    engine.start()
+    try:
+        os.close(master)
+        assert wait_stopped(engine)
+        assert not engine.connected()
+        assert sum("lost" in e for e in errors) == 1
+    finally:
+        engine.stop()
+
+
+@pytest.mark.parametrize("transparent", [False, True])
+def test_proxy_closes_lost_output_without_reconnect(transparent):
+    errors = []
+    in_master, in_name, in_slave = make_pty()
+    out_master, out_name, out_slave = make_pty()
+    engine = ProxyEngine(on_error=errors.append, transparent=transparent)
+    engine.output_link.auto = False
+    engine.connect_input(in_name, 115200)
+    engine.connect_output(out_name, 115200)
+    os.close(in_slave)
+    os.close(out_slave)
+    engine.start()
+    try:
+        os.close(out_master)  # the output device goes away
+        for i in range(20):
+            os.write(in_master, b"TIME=%d;SENSOR=1;STRESS=1\n" % i)
+            time.sleep(0.01)
+        deadline = time.monotonic() + 3.0
+        while engine.output_connected() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not engine.output_connected()
+        assert engine.running
+        assert engine.output_link.lost >= 1
+        assert sum("Output port lost" in e for e in errors) == 1
+        assert not any("Forward error" in e for e in errors)
+    finally:
+        engine.stop()
+        os.close(in_master)
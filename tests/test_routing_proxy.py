@@ -0,0 +1,46 @@
+import os
+import pty
+import time
+import tty
+
+import pytest
+
+import routing_proxy
+from routing_proxy import RoutingProxy
+
+
+def make_pty():
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    return master, os.ttyname(slave), slave
+
+
+def test_lost_input_is_closed_and_reported_once():
+    errors = []
+    in_master, in_name, in_slave = make_pty()
+    out_master, out_name, out_slave = make_pty()
+    proxy = RoutingProxy(on_error=errors.append)
+    proxy.add_input("a", in_name, 115200)
+    proxy.add_output("x", out_name, 115200)
+    proxy.start()
+    try:
+        os.write(in_master, b"TIME=1;SENSOR=1;STRESS=1\n")
+        time.sleep(0.2)
+        os.close(in_master)  # the device goes away; pyserial keeps is_open set
+        time.sleep(0.5)
+        assert not proxy.inputs["a"].is_open
+        assert not any(t.is_alive() for t in proxy.threads)
+        assert len(errors) == 1 and "lost" in errors[0]
+        assert os.read(out_master, 100) == b"TIME=1;SENSOR=1;STRESS=1\n"
+    finally:
+        proxy.close()
+        for fd in (in_slave, out_master, out_slave):
+            os.close(fd)
+
+
+@pytest.mark.parametrize("option", [["--route", "1=x,nope"], ["--default", "nope"]])
+def test_unknown_route_target_is_a_usage_error(option, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        routing_proxy.main(["--input", "a=loop://", "--output", "x=loop://", *option])
+    assert exit_info.value.code == 2
+    assert "unknown output(s) nope" in capsys.readouterr().err
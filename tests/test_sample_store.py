@@ -0,0 +1,32 @@
+import csv
+
+from line_parser import parse_chunk
+from sample_store import SampleStore
+
+
+def filled_store(rows=50, chunk_rows=10):
+    store = SampleStore(chunk_rows=chunk_rows)
+    for i in range(rows):
+        store.append_batch(1_700_000_000_000, parse_chunk(b"TIME=%d;SENSOR=1;STRESS=%d\n" % (i, i)))
+    return store
+
+
+def test_clear_during_export_keeps_the_export_whole():
+    store = filled_store()
+    chunks = store.chunks()
+    first = next(chunks)
+    store.clear()
+    assert len(store) == 0
+    rest = list(chunks)
+    assert [t for chunk in [first, *rest] for t in chunk.times] == list(range(50))
+    assert store._retired == []
+
+
+def test_export_after_clear_sees_only_new_samples(tmp_path):
+    store = filled_store()
+    store.clear()
+    store.append_batch(1_700_000_000_000, parse_chunk(b"TIME=7;SENSOR=2;STRESS=3\n" * 25))
+    path = tmp_path / "out.csv"
+    assert store.export_csv(str(path)) == 25
+    with open(path, newline="") as f:
+        assert list(csv.reader(f))[1][1:] == ["2", "3", "7"]
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from aio_serial import run_sender
+from frame_codec import FrameDecoder
+from line_parser import parse_chunk
+from routing_proxy import PortCounters
+from sender_engine import MAX_CATCHUP, Schedule, SensorConfig
+
+
+def test_schedule_is_absolute_and_ordered():
+    schedule = Schedule([SensorConfig(1, rate_hz=10), SensorConfig(2, rate_hz=4)], 100.0)
+    packets, next_wake, skipped = schedule.due(100.25)
+    assert [(round(due - 100, 2), s.sensor) for due, s in packets] == [(0.0, 1), (0.0, 2), (0.1, 1), (0.2, 1),
+                                                                       (0.25, 2)]
+    assert next_wake == pytest.approx(100.3)
+    assert skipped == 0
+    packets, _, _ = schedule.due(100.5)
+    assert [(round(due - 100, 2), s.sensor) for due, s in packets] == [(0.3, 1), (0.4, 1), (0.5, 1), (0.5, 2)]
+
+
+def test_schedule_skips_packets_beyond_catchup():
+    schedule = Schedule([SensorConfig(1, rate_hz=10)], 0.0)
+    now = MAX_CATCHUP + 2.0
+    packets, _, skipped = schedule.due(now)
+    # Late packets are skipped up to the present, not sent in a burst
+    assert skipped + len(packets) == round(now * 10) + 1
+    assert 1 <= len(packets) <= 2
+
+
+def test_schedule_ignores_inactive_sensors():
+    schedule = Schedule([SensorConfig(1, enabled=False, rate_hz=10)], 0.0)
+    assert schedule.due(5.0) == ([], None, 0)
+
+
+class ListPort:
+    def __init__(self):
+        self.data = bytearray()
+
+    async def write(self, data):
+        self.data += data
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_run_sender_writes_scheduled_packets(binary):
+    port = ListPort()
+    counters = PortCounters()
+
+    async def run():
+        task = asyncio.create_task(run_sender(port, [SensorConfig(1, rate_hz=100), SensorConfig(2, rate_hz=50)],
+                                              binary=binary, counters=counters))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    batch = FrameDecoder().feed(bytes(port.data)) if binary else parse_chunk(bytes(port.data))
+    assert len(batch) == counters.lines_out
+    assert 20 <= list(batch.sensors).count(1) <= 22
+    assert 10 <= list(batch.sensors).count(2) <= 11
+    assert counters.bytes_out == len(port.data)
+
+
+def test_schedule_update_keeps_phase_of_unchanged_sensors():
+    schedule = Schedule([SensorConfig(1, rate_hz=10), SensorConfig(2, rate_hz=4)], 100.0)
+    schedule.due(100.25)
+    schedule.update([SensorConfig(1, min_val=5, rate_hz=10), SensorConfig(2, rate_hz=5)], 100.27)
+    packets, next_wake, _ = schedule.due(100.27)
+    # Sensor 1 only changed its range and stays on its 100.3 slot; sensor 2 changed rate and starts over
+    assert [(round(due - 100, 2), s.sensor) for due, s in packets] == [(0.27, 2)]
+    assert next_wake == pytest.approx(100.3)
+
+
+def test_schedule_update_restarts_reenabled_sensor():
+    schedule = Schedule([SensorConfig(1, rate_hz=10)], 0.0)
+    schedule.due(0.5)
+    schedule.update([SensorConfig(1, enabled=False, rate_hz=10)], 0.55)
+    schedule.update([SensorConfig(1, rate_hz=10)], 5.0)
+    packets, _, skipped = schedule.due(5.0)
+    assert [due for due, _ in packets] == [5.0]
+    assert skipped == 0
+
+
+def test_sensor_config_equality():
+    assert SensorConfig(1, rate_hz=10) == SensorConfig(1, rate_hz=10.0)
+    assert SensorConfig(1, rate_hz=10) != SensorConfig(1, rate_hz=20)
@@ -0,0 +1,47 @@
+from line_parser import parse_chunk
+from seq_tracker import SeqTracker
+
+
+def feed(tracker, sensor, seqs):
+    data = b"".join(b"TIME=1;SENSOR=%d;STRESS=1;SEQ=%d\n" % (sensor, n) for n in seqs)
+    tracker.add_batch(parse_chunk(data), now=0.0)
+
+
+def sensor_row(tracker, sensor=1):
+    return next(r for r in tracker.snapshot()["sensors"] if r["sensor"] == sensor)
+
+
+def test_counts_gaps_duplicates_and_reordering():
+    tracker = SeqTracker(window=16)
+    feed(tracker, 1, [0, 1, 2, 5, 3, 3, 6])
+    row = sensor_row(tracker)
+    assert (row["received"], row["missing"], row["duplicates"], row["reordered"]) == (6, 1, 1, 1)
+
+
+def test_restart_within_window_is_not_counted_as_duplicates():
+    tracker = SeqTracker(window=1024)
+    feed(tracker, 1, range(10))
+    feed(tracker, 1, range(5))  # the sender restarted before getting a window ahead
+    row = sensor_row(tracker)
+    assert row["resets"] == 1
+    assert row["duplicates"] == 0
+    assert row["received"] == 15
+    assert row["missing"] == 0
+
+
+def test_late_first_packet_is_not_a_restart():
+    tracker = SeqTracker(window=16)
+    feed(tracker, 1, [1, 2, 0, 3])
+    row = sensor_row(tracker)
+    assert row["resets"] == 0
+    assert row["reordered"] == 1
+
+
+def test_restart_far_behind_window():
+    tracker = SeqTracker(window=16)
+    feed(tracker, 1, range(100))
+    feed(tracker, 1, [2, 3, 3])  # restarted, first two packets lost
+    row = sensor_row(tracker)
+    assert row["resets"] == 1
+    assert row["duplicates"] == 1
+    assert row["received"] == 102